@@ -30,7 +30,7 @@ DNS_SD_MODE = 'multicast'
 # Number of seconds to wait after a DNS-SD advert is created for a client to notice and perform an action
 DNS_SD_ADVERT_TIMEOUT = 30
 
-# Number of seconds to wait after browsing for a DNS-SD advert before checking the results
+# Maximum number of seconds to wait after browsing for the expected DNS-SD advert before checking the results
 DNS_SD_BROWSE_TIMEOUT = 2
 
 # Number of seconds expected between heartbeats for an IS-04 Node
@@ -54,9 +54,18 @@ API_PROCESSING_TIMEOUT = 1
 QUERY_API_HOST = "127.0.0.1"
 QUERY_API_PORT = 80
 
+# Serve a Query API from each mock registry, including WebSocket subscriptions on port `PORT_BASE` + 150.
+# When `ENABLE_DNS_SD` is `False`, the IS-04 Node tests then use the primary mock registry (port `PORT_BASE` + 101)
+# in place of `QUERY_API_HOST` and `QUERY_API_PORT`, so the Node under test should be configured to register with it.
+ENABLE_MOCK_QUERY_API = False
+
 # Path to store the specification file cache in. Relative to the base of the testing repository.
 CACHE_PATH = 'cache'
 
+# Path of an SQLite database in which to store the results of every test run, or None to disable it.
+# The history of runs can then be queried using `nmos-test.py results` or the `/results` endpoint
+RESULTS_DATABASE = None
+
 # Timeout for any HTTP requests
 HTTP_TIMEOUT = 1
 
@@ -64,6 +73,32 @@ HTTP_TIMEOUT = 1
 # 0 = unlimited for a really thorough test!
 MAX_TEST_ITERATIONS = 0
 
+# Number of sample Nodes to register when testing traversal of many pages of IS-04 Query API results
+# Only used in full when the Registration API includes the X-Paging-Timestamp debugging header, as otherwise each
+# registration must be delayed, which limits the number that can be made before garbage collection
+PAGING_SAMPLE_NODES = 200
+
+# Number of sample Node registrations to make concurrently when testing IS-04 Query API pagination
+# Only used when the Registration API includes the X-Paging-Timestamp debugging header
+PAGING_REGISTRATION_WORKERS = 10
+
+# Number of virtual Nodes, each with a Device, Source, Flow, Sender and Receiver, to register in the IS-04 Registry
+# APIs Load Benchmark
+LOAD_TEST_NODES = 100
+
+# Number of concurrent requests to make in the IS-04 Registry APIs Load Benchmark
+LOAD_TEST_WORKERS = 20
+
+# Number of seconds to run each of the heartbeat and query phases of the IS-04 Registry APIs Load Benchmark
+LOAD_TEST_DURATION = 30
+
+# Number of Query API WebSocket subscriptions to open in the IS-04 Registry APIs Load Benchmark
+LOAD_TEST_SUBSCRIPTIONS = 200
+
+# Number of resource updates per second to make while the subscriptions are open in the IS-04 Registry APIs Load
+# Benchmark
+LOAD_TEST_UPDATE_RATE = 10
+
 # Test using HTTPS rather than HTTP as per AMWA BCP-003-01
 ENABLE_HTTPS = False
 
@@ -152,6 +187,14 @@ MQTT_PASSWORD = None
 # Bash shell to use for running testssl.sh
 TEST_SSL_BASH = "bash"
 
+# Number of testssl.sh processes to run concurrently when testing BCP-003-01
+# With 1, the checks required by all of the selected tests are combined into a single scan
+TEST_SSL_CONCURRENT_SCANS = 1
+
+# Whether to store testssl.sh reports in the CACHE_PATH and re-use them in later runs against the same host, port
+# and server certificate
+TEST_SSL_REPORT_CACHE = False
+
 # Definition of each API specification and its versions.
 SPECIFICATIONS = {
     "is-04": {
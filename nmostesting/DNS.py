@@ -12,38 +12,118 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import time
+
+from dnslib import QTYPE, RR
 from dnslib.server import DNSServer
 from dnslib.zoneresolver import ZoneResolver
+from collections import deque
 from jinja2 import Template
-from threading import Event
+from threading import Condition
 
 from .TestHelper import get_default_ip
 from . import Config as CONFIG
 
+# Maximum number of queries kept in the query log
+QUERY_LOG_LENGTH = 10000
+
+
+class QueryLog(object):
+    """A bounded, timestamped log of DNS queries, indexed by record type, record name and client"""
+
+    def __init__(self, max_length=QUERY_LOG_LENGTH):
+        self.max_length = max_length
+        self.entries = deque()
+        # Query times for each (record type, record name), for each client IP address
+        self.index = {}
+        self.condition = Condition()
+
+    def add(self, record_type, record_name, client, latency):
+        with self.condition:
+            query_time = time.time()
+            self.entries.append((query_time, record_type, record_name, client, latency))
+            self.index.setdefault((record_type, record_name), {}).setdefault(client, deque()).append(query_time)
+            if len(self.entries) > self.max_length:
+                # The oldest entry is also the oldest of the query times indexed under its key
+                _, old_type, old_name, old_client, _ = self.entries.popleft()
+                clients = self.index[(old_type, old_name)]
+                clients[old_client].popleft()
+                if not clients[old_client]:
+                    del clients[old_client]
+                    if not clients:
+                        del self.index[(old_type, old_name)]
+            self.condition.notify_all()
+
+    def last_query(self, record_type, record_names, client=None):
+        """Get the time of the most recent query for any of the records, optionally from a specific client"""
+        last_time = None
+        with self.condition:
+            for record_name in record_names:
+                for query_client, query_times in self.index.get((record_type, record_name), {}).items():
+                    if client is None or query_client == client:
+                        if last_time is None or query_times[-1] > last_time:
+                            last_time = query_times[-1]
+        return last_time
+
+    def wait_for_query(self, record_type, record_names, timeout, since=None, client=None):
+        """Wait for a query for any of the records at or after 'since', which defaults to the time of this call,
+        so that only queries made from now on satisfy the wait; pass an earlier 'since' to also accept queries
+        which have already been made. Returns the time of the most recent query, or None if there was none
+        before the timeout"""
+        if since is None:
+            since = time.time()
+
+        def queried():
+            last_time = self.last_query(record_type, record_names, client)
+            return last_time if last_time is not None and last_time >= since else None
+
+        with self.condition:
+            return self.condition.wait_for(queried, timeout)
+
+    def get_client_summary(self, since=None):
+        """Summarise the queries made by each client at or after 'since', including the query rate
+        and the time taken to resolve each query"""
+        clients = {}
+        with self.condition:
+            for query_time, _, _, client, latency in self.entries:
+                if since is None or query_time >= since:
+                    clients.setdefault(client, []).append((query_time, latency))
+        summary = {}
+        for client, queries in clients.items():
+            first_time, last_time = queries[0][0], queries[-1][0]
+            latencies = [latency for _, latency in queries]
+            summary[client] = {
+                "queries": len(queries),
+                "first_query": first_time,
+                "last_query": last_time,
+                "query_rate_per_s": round((len(queries) - 1) / (last_time - first_time), 3)
+                if last_time > first_time else None,
+                "latency_mean_ms": round(1000 * sum(latencies) / len(latencies), 3),
+                "latency_max_ms": round(1000 * max(latencies), 3)
+            }
+        return summary
+
 
 class WatchingResolver(ZoneResolver):
-    def __init__(self, zone, glob=False):
-        ZoneResolver.__init__(self, zone, glob)
-        self.watching = {}
-
-    def wait_for_query(self, record_type, record_names, timeout):
-        wait_event = Event()
-        if record_type not in self.watching:
-            self.watching[record_type] = {}
-        for record_name in record_names:
-            self.watching[record_type][record_name] = wait_event
-        wait_event.wait(timeout)
-        for record_name in record_names:
-            self.watching[record_type][record_name] = None
+    def __init__(self, zone, glob=False, query_log=None):
+        if isinstance(zone, list):
+            # Records which have already been parsed, in the form used by ZoneResolver
+            ZoneResolver.__init__(self, "", glob)
+            self.zone = zone
+        else:
+            ZoneResolver.__init__(self, zone, glob)
+        # The query log may be shared between resolvers, so that it survives a change of zone
+        self.query_log = query_log if query_log is not None else QueryLog()
+
+    def wait_for_query(self, record_type, record_names, timeout, since=None):
+        return self.query_log.wait_for_query(record_type, record_names, timeout, since)
 
     def resolve(self, request, handler):
-        qtype = request.q.qtype
-        qname = str(request.q.qname)
-        try:
-            self.watching[qtype][qname].set()
-        except (KeyError, AttributeError):
-            pass
-        return ZoneResolver.resolve(self, request, handler)
+        start_time = time.perf_counter()
+        reply = ZoneResolver.resolve(self, request, handler)
+        self.query_log.add(request.q.qtype, str(request.q.qname), handler.client_address[0],
+                           time.perf_counter() - start_time)
+        return reply
 
 
 class DNS(object):
@@ -52,25 +132,50 @@ class DNS(object):
         self.resolver = None
         self.server = None
         self.base_zone_data = None
+        self.query_log = QueryLog()
+        # Compiled templates by zone file name, and parsed records by zone data
+        self.templates = {}
+        self.records = {}
         self.reset()
 
-    def wait_for_query(self, record_type, record_name, timeout):
-        self.resolver.wait_for_query(record_type, record_name, timeout)
+    def wait_for_query(self, record_type, record_name, timeout, since=None):
+        return self.resolver.wait_for_query(record_type, record_name, timeout, since)
+
+    def get_client_summary(self, since=None):
+        return self.query_log.get_client_summary(since)
+
+    def get_template(self, zone_name):
+        if zone_name not in self.templates:
+            with open(zone_name) as zone_file:
+                self.templates[zone_name] = Template(zone_file.read())
+        return self.templates[zone_name]
+
+    def get_records(self, key, render):
+        """Get the parsed records for a zone, only rendering and parsing it the first time it is used"""
+        if key not in self.records:
+            zone_data = render()
+            self.records[key] = [(rr.rname, QTYPE[rr.rtype], rr) for rr in RR.fromZone(zone_data)]
+        return self.records[key]
+
+    def set_resolver(self, resolver):
+        self.resolver = resolver
+        if self.server:
+            # The running server looks up its resolver for each request, so it can be swapped without a restart
+            self.server.server.resolver = resolver
+        else:
+            self.start()
 
     def load_zone(self, api_version, api_protocol, api_authorization, zone_name, port_base):
-        zone_file = open(zone_name).read()
-        template = Template(zone_file)
-        zone_data = template.render(ip_address=self.default_ip, api_ver=api_version, api_proto=api_protocol,
-                                    api_auth=str(api_authorization).lower(), domain=CONFIG.DNS_DOMAIN,
-                                    port_base=port_base)
-        self.resolver = WatchingResolver(self.base_zone_data + zone_data)
-        self.stop()
+        template = self.get_template(zone_name)
+        key = (self.base_zone_data, zone_name, api_version, api_protocol, api_authorization, port_base)
+        records = self.get_records(key, lambda: self.base_zone_data + template.render(
+            ip_address=self.default_ip, api_ver=api_version, api_proto=api_protocol,
+            api_auth=str(api_authorization).lower(), domain=CONFIG.DNS_DOMAIN, port_base=port_base))
         print(" * Loading DNS zone file '{}' with api_ver={}".format(zone_name, api_version))
-        self.start()
+        self.set_resolver(WatchingResolver(records, query_log=self.query_log))
 
     def reset(self):
-        zone_file = open("test_data/core/dns_base.zone").read()
-        template = Template(zone_file)
+        template = self.get_template("test_data/core/dns_base.zone")
 
         extra_services = {}
         if CONFIG.ENABLE_AUTH:
@@ -91,10 +196,9 @@ class DNS(object):
 
         self.base_zone_data = template.render(ip_address=self.default_ip, domain=CONFIG.DNS_DOMAIN,
                                               extra_services=extra_services)
-        self.resolver = WatchingResolver(self.base_zone_data)
-        self.stop()
+        records = self.get_records((self.base_zone_data,), lambda: self.base_zone_data)
         print(" * Loading DNS zone base file")
-        self.start()
+        self.set_resolver(WatchingResolver(records, query_log=self.query_log))
 
     def start(self):
         if not self.server:
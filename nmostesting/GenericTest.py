@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import os
+import fnmatch
 from requests.compat import json
 import git
 import jsonschema
@@ -41,9 +42,59 @@ def test_depends(func):
             return func(self, test)
     invalid.__name__ = func.__name__
     invalid.__doc__ = func.__doc__
+    invalid.tags = getattr(func, "tags", [])
     return invalid
 
 
+def test_tags(*tags):
+    """Decorator to tag a test, e.g. "dns-sd", "auth", "websocket" or "slow", so that it can be selected by tag"""
+    def decorator(func):
+        func.tags = list(getattr(func, "tags", [])) + [tag for tag in tags if tag not in getattr(func, "tags", [])]
+        return func
+    return decorator
+
+
+def get_test_names(class_def):
+    """Get the names of the manually defined tests of a test class, in the order in which they are run"""
+    return [name for name in dir(class_def) if name.startswith("test_") and callable(getattr(class_def, name))]
+
+
+def get_test_tags(class_def):
+    """Get the names of the tests of a test class with each tag"""
+    tags = {}
+    for test_name in get_test_names(class_def):
+        for tag in getattr(getattr(class_def, test_name), "tags", []):
+            tags.setdefault(tag, []).append(test_name)
+    return tags
+
+
+def select_tests(class_def, selection):
+    """
+    Resolve a selection of tests into a list of 'all', 'auto' and test names, without duplicates and in the order
+    in which the tests would be run by 'all'. Each item of the selection may be 'all', 'auto', a test name, a glob
+    pattern matching test names (e.g. 'test_1*') or a tag declared via test_tags.
+    Raises a ValueError for any item which doesn't match a test
+    """
+    if isinstance(selection, str):
+        selection = [selection]
+    test_names = get_test_names(class_def)
+    tags = get_test_tags(class_def)
+    selected = set()
+    for item in selection:
+        if item in ["all", "auto"] or item in test_names:
+            matches = [item]
+        elif any(char in item for char in "*?["):
+            matches = fnmatch.filter(test_names, item)
+        else:
+            matches = tags.get(item, [])
+        if not matches:
+            raise ValueError("No test, pattern or tag matches '{}'".format(item))
+        selected.update(matches)
+    if "all" in selected:
+        return ["all"]
+    return [name for name in ["auto"] + test_names if name in selected]
+
+
 class NMOSTestException(Exception):
     """Provides a way to exit a single test, by providing the TestResult return statement as the first exception
        parameter"""
@@ -66,6 +117,7 @@ class GenericTest(object):
         self.auto_test_count = 0
         self.test_individual = False
         self.result = list()
+        self.result_writer = None
         self.protocol = "http"
         self.ws_protocol = "ws"
         if CONFIG.ENABLE_HTTPS:
@@ -105,13 +157,17 @@ class GenericTest(object):
 
             api_data["spec_branch"] = spec_branch
 
+            spec_commit = repo.head.commit.hexsha
             repo.git.reset('--hard')
             repo.git.checkout(spec_branch)
             repo.git.rebase("origin/" + spec_branch)
+            # Resolved schemas may include files from the previous checkout which are otherwise still cached
+            if repo.head.commit.hexsha != spec_commit:
+                TestHelper.clear_schema_cache()
 
         self.parse_RAML()
 
-        self.result.append(test.NA(""))
+        self.record_result(test.NA(""))
 
     def parse_RAML(self):
         """Create a Specification object for each API defined in this object"""
@@ -124,7 +180,8 @@ class GenericTest(object):
     def execute_tests(self, test_names):
         """Perform tests defined within this class"""
 
-        for test_name in test_names:
+        # Run each selected test once, so that the prerequisites shared between tests are also done only once
+        for test_name in select_tests(type(self), test_names):
             self.execute_test(test_name)
 
     def execute_test(self, test_name):
@@ -134,7 +191,8 @@ class GenericTest(object):
         # Run automatically defined tests
         if test_name in ["auto", "all"] and not self.disable_auto:
             print(" * Running basic API tests")
-            self.result += self.basics()
+            for result in self.basics():
+                self.record_result(result)
 
         # Run manually defined tests
         if test_name == "all":
@@ -145,11 +203,11 @@ class GenericTest(object):
                         print(" * Running " + method_name)
                         test = Test(inspect.getdoc(method), method_name)
                         try:
-                            self.result.append(method(test))
+                            self.record_result(method(test))
                         except NMOSTestException as e:
-                            self.result.append(e.args[0])
+                            self.record_result(e.args[0])
                         except Exception as e:
-                            self.result.append(self.uncaught_exception(method_name, e))
+                            self.record_result(self.uncaught_exception(method_name, e))
 
         # Run a single test
         if test_name != "auto" and test_name != "all":
@@ -158,11 +216,23 @@ class GenericTest(object):
                 print(" * Running " + test_name)
                 test = Test(inspect.getdoc(method), test_name)
                 try:
-                    self.result.append(method(test))
+                    self.record_result(method(test))
                 except NMOSTestException as e:
-                    self.result.append(e.args[0])
+                    self.record_result(e.args[0])
                 except Exception as e:
-                    self.result.append(self.uncaught_exception(test_name, e))
+                    self.record_result(self.uncaught_exception(test_name, e))
+
+    def record_result(self, result):
+        """Add a result to the results of this suite, and pass it on to the result writer, if any"""
+        self.result.append(result)
+        if self.result_writer is not None:
+            self.result_writer.write(result)
+
+    def attach_dns_metrics(self, dns_server, test_name, since=None):
+        """Attach a summary of the DNS queries made by each client since a given time to the result of a test"""
+        for result in self.result:
+            if result.name == test_name:
+                result.metrics = {"dns_clients": dns_server.get_client_summary(since)}
 
     def uncaught_exception(self, test_name, exception):
         """Print a traceback and provide a test FAIL result for uncaught exceptions"""
@@ -179,8 +249,14 @@ class GenericTest(object):
         """Called after a set of tests is run. Override this method with teardown code."""
         pass
 
-    def run_tests(self, test_name=["all"]):
-        """Perform tests and return the results as a list"""
+    def run_tests(self, test_name=["all"], result_writer=None):
+        """Perform tests and return the results as a list. If a result writer is specified, each result is also
+        written to it as soon as it is available"""
+
+        self.result_writer = result_writer
+        if self.result_writer is not None:
+            for result in self.result:
+                self.result_writer.write(result)
 
         # Set up
         test = Test("Test setup", "set_up_tests")
@@ -206,7 +282,7 @@ class GenericTest(object):
                                                                                                  response.status_code))
 
         self.set_up_tests()
-        self.result.append(test.NA(""))
+        self.record_result(test.NA(""))
 
         # Run tests
         self.execute_tests(test_name)
@@ -214,7 +290,7 @@ class GenericTest(object):
         # Tear down
         test = Test("Test teardown", "tear_down_tests")
         self.tear_down_tests()
-        self.result.append(test.NA(""))
+        self.record_result(test.NA(""))
 
         return self.result
 
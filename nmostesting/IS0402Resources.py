@@ -0,0 +1,292 @@
+# Copyright (C) 2021 Advanced Media Workflow Association
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from copy import deepcopy
+from requests.compat import json
+from urllib.parse import urlparse
+
+from . import Config as CONFIG
+from .GenericTest import NMOSTestException
+
+REG_API_KEY = "registration"
+QUERY_API_KEY = "query"
+
+
+class IS0402Resources(object):
+    """
+    Mixin for the test suites of the IS-04 Registration and Query APIs, which registers resources from the test data
+    and creates subscriptions. The suite must set 'reg_url', 'query_url', 'is04_reg_utils' and 'is04_query_utils',
+    and load 'test_data' and 'subscription_data' using load_resource_data() and load_subscription_request_data()
+    """
+    def load_resource_data(self):
+        """Loads test data from files"""
+        api = self.apis[REG_API_KEY]
+        result_data = dict()
+        resources = ["node", "device", "source", "flow", "sender", "receiver"]
+        for resource in resources:
+            with open("test_data/IS0402/v1.3_{}.json".format(resource)) as resource_data:
+                resource_json = json.load(resource_data)
+                if self.is04_reg_utils.compare_api_version(api["version"], "v1.3") < 0:
+                    resource_json = self.downgrade_resource(resource, resource_json,
+                                                            api["version"])
+
+                result_data[resource] = resource_json
+        return result_data
+
+    def load_subscription_request_data(self):
+        """Loads subscription request data"""
+        api = self.apis[QUERY_API_KEY]
+        with open("test_data/IS0402/subscriptions_request.json") as resource_data:
+            resource_json = json.load(resource_data)
+            if self.is04_reg_utils.compare_api_version(api["version"], "v1.3") < 0:
+                return self.downgrade_resource("subscription", resource_json, api["version"])
+            return resource_json
+
+    def downgrade_resource(self, resource_type, data, requested_version):
+        """Downgrades given resource data to requested version"""
+        version_major, version_minor = [int(x) for x in requested_version[1:].split(".")]
+
+        if version_major == 1:
+            if resource_type == "node":
+                if version_minor <= 2:
+                    if "interfaces" in data:
+                        key = "attached_network_device"
+                        for interface in data["interfaces"]:
+                            if key in interface:
+                                del interface[key]
+                    key = "authorization"
+                    for service in data["services"]:
+                        if key in service:
+                            del service[key]
+                    if "api" in data and "endpoints" in data["api"]:
+                        for endpoint in data["api"]["endpoints"]:
+                            if key in endpoint:
+                                del endpoint[key]
+                if version_minor <= 1:
+                    keys_to_remove = [
+                        "interfaces"
+                    ]
+                    for key in keys_to_remove:
+                        if key in data:
+                            del data[key]
+                if version_minor == 0:
+                    keys_to_remove = [
+                        "api",
+                        "clocks",
+                        "description",
+                        "tags"
+                    ]
+                    for key in keys_to_remove:
+                        if key in data:
+                            del data[key]
+                return data
+
+            elif resource_type == "device":
+                if version_minor <= 2:
+                    key = "authorization"
+                    if "controls" in data:
+                        for control in data["controls"]:
+                            if key in control:
+                                del control[key]
+                if version_minor <= 1:
+                    pass
+                if version_minor == 0:
+                    keys_to_remove = [
+                        "controls",
+                        "description",
+                        "tags"
+                    ]
+                    for key in keys_to_remove:
+                        if key in data:
+                            del data[key]
+                return data
+
+            elif resource_type == "sender":
+                if version_minor <= 2:
+                    pass
+                if version_minor <= 1:
+                    keys_to_remove = [
+                        "caps",
+                        "interface_bindings",
+                        "subscription"
+                    ]
+                    for key in keys_to_remove:
+                        if key in data:
+                            del data[key]
+                if version_minor == 0:
+                    pass
+                return data
+
+            elif resource_type == "receiver":
+                if version_minor <= 2:
+                    pass
+                if version_minor <= 1:
+                    keys_to_remove = [
+                        "interface_bindings"
+                    ]
+                    for key in keys_to_remove:
+                        if key in data:
+                            del data[key]
+                    if "subscription" in data and "active" in data["subscription"]:
+                        del data["subscription"]["active"]
+                if version_minor == 0:
+                    pass
+                return data
+
+            elif resource_type == "source":
+                if version_minor <= 2:
+                    keys_to_remove = [
+                        "event_type"
+                    ]
+                    for key in keys_to_remove:
+                        if key in data:
+                            del data[key]
+                if version_minor <= 1:
+                    pass
+                if version_minor == 0:
+                    keys_to_remove = [
+                        "channels",
+                        "clock_name",
+                        "grain_rate"
+                    ]
+                    for key in keys_to_remove:
+                        if key in data:
+                            del data[key]
+                return data
+
+            elif resource_type == "flow":
+                if version_minor <= 2:
+                    keys_to_remove = [
+                        "event_type"
+                    ]
+                    for key in keys_to_remove:
+                        if key in data:
+                            del data[key]
+                if version_minor <= 1:
+                    pass
+                if version_minor == 0:
+                    keys_to_remove = [
+                        "bit_depth",
+                        "colorspace",
+                        "components",
+                        "device_id",
+                        "DID_SDID",
+                        "frame_height",
+                        "frame_width",
+                        "grain_rate",
+                        "interlace_mode",
+                        "media_type",
+                        "sample_rate",
+                        "transfer_characteristic"
+                    ]
+                    for key in keys_to_remove:
+                        if key in data:
+                            del data[key]
+                return data
+
+            elif resource_type == "subscription":
+                if version_minor <= 2:
+                    keys_to_remove = [
+                        "authorization"
+                    ]
+                    for key in keys_to_remove:
+                        if key in data:
+                            del data[key]
+                if version_minor <= 1:
+                    pass
+                if version_minor == 0:
+                    keys_to_remove = [
+                        "secure"
+                    ]
+                    for key in keys_to_remove:
+                        if key in data:
+                            del data[key]
+                return data
+
+        # Invalid request
+        return None
+
+    def copy_resource(self, type, api_ver=None):
+        """Make a clone of the test data for the requested type and API version"""
+        if api_ver is None:
+            api_ver = self.apis[REG_API_KEY]["version"]
+        data = deepcopy(self.test_data[type])
+        if self.is04_reg_utils.compare_api_version(api_ver, "v1.3") < 0:
+            data = self.downgrade_resource(type, data, api_ver)
+        return data
+
+    def bump_resource_version(self, resource):
+        """Bump version timestamp of the given resource"""
+        resource["version"] = self.is04_reg_utils.get_TAI_time()
+
+    def prepare_subscription(self, resource_path, params=None, api_ver=None):
+        """Prepare an object ready to send as the request body for a Query API subscription"""
+        if params is None:
+            params = {}
+        if api_ver is None:
+            api_ver = self.apis[QUERY_API_KEY]["version"]
+        sub_json = deepcopy(self.subscription_data)
+        sub_json["resource_path"] = resource_path
+        sub_json["params"] = params
+        sub_json["secure"] = CONFIG.ENABLE_HTTPS
+        if self.is04_query_utils.compare_api_version(api_ver, "v1.3") < 0:
+            sub_json = self.downgrade_resource("subscription", sub_json, api_ver)
+        return sub_json
+
+    def post_subscription(self, test, sub_json, query_url=None):
+        """Perform a POST request to a Query API to create a subscription"""
+        if query_url is None:
+            query_url = self.query_url
+
+        api_ver = query_url.rstrip("/").rsplit("/", 1)[-1]
+
+        valid, r = self.do_request("POST", "{}subscriptions".format(query_url), json=sub_json)
+
+        if not valid:
+            raise NMOSTestException(test.FAIL("Query API returned an unexpected response: {}".format(r)))
+
+        if r.status_code in [200, 201]:
+            if self.is04_query_utils.compare_api_version(api_ver, "v1.3") >= 0:
+                if "Location" not in r.headers:
+                    raise NMOSTestException(test.FAIL("Query API failed to return a 'Location' response header"))
+                path = "{}subscriptions/".format(urlparse(query_url).path)
+                location = r.headers["Location"]
+                if path not in location:
+                    raise NMOSTestException(test.FAIL("Query API 'Location' response header is incorrect: "
+                                                      "Location: {}".format(location)))
+                if not location.startswith("/") and not location.startswith(self.protocol + "://"):
+                    raise NMOSTestException(test.FAIL("Query API 'Location' response header is invalid for the "
+                                                      "current protocol: Location: {}".format(location)))
+        elif r.status_code in [400, 501]:
+            raise NMOSTestException(test.FAIL("Query API signalled that it does not support the requested "
+                                              "subscription parameters: {} {}".format(r.status_code, sub_json)))
+        else:
+            raise NMOSTestException(test.FAIL("Query API returned an unexpected response: "
+                                              "{} {}".format(r.status_code, r.text)))
+
+        # Currently can only validate schema for the API version under test
+        if query_url == self.query_url:
+            schema = self.get_schema(QUERY_API_KEY, "POST", "/subscriptions", r.status_code)
+            valid, message = self.check_response(schema, "POST", r)
+            if valid:
+                # if message:
+                #     return WARNING somehow...
+                pass
+            else:
+                raise NMOSTestException(test.FAIL(message))
+
+        try:
+            return r.json()
+        except json.JSONDecodeError:
+            raise NMOSTestException(test.FAIL("Non-JSON response returned for Query API subscription request"))
@@ -15,10 +15,10 @@
 # limitations under the License.
 
 import re
-import time
 
 from random import randint
 from . import TestHelper
+from . import SDPUtils
 from .NMOSUtils import NMOSUtils
 from . import Config as CONFIG
 
@@ -30,6 +30,7 @@ SCHEDULED_RELATIVE_ACTIVATION = 'activate_scheduled_relative'
 class IS05Utils(NMOSUtils):
     def __init__(self, url):
         NMOSUtils.__init__(self, url)
+        self.activation_metrics = []
 
     def get_valid_transports(self, api_version):
         """Identify the valid transport types for a given version of IS-05"""
@@ -133,10 +134,12 @@ class IS05Utils(NMOSUtils):
         return self.checkCleanRequestJSON("PATCH", stagedUrl, data=data, code=code)
 
     def _check_perform_activation(self, port, portId, stagedParams, changedParam, activationName="immediate",
-                                  activateMode=IMMEDIATE_ACTIVATION, activateTime=None, activateSleep=0):
+                                  activateMode=IMMEDIATE_ACTIVATION, activateTime=None, activateTolerance=0):
         stagedUrl = "single/" + port + "s/" + portId + "/staged"
         activeUrl = "single/" + port + "s/" + portId + "/active"
         valid, response = self.perform_activation(port, portId, activateMode, activateTime)
+        # Relative activations are scheduled from when the API received the request, which was no later than now
+        requestTime = self.get_TAI_seconds()
         if valid:
             # Check the values in the /staged PATCH response
 
@@ -173,18 +176,28 @@ class IS05Utils(NMOSUtils):
                 if not validImmediate:
                     return False, responseImmediate
 
-            if activateSleep > 0:
-                time.sleep(activateSleep)
-
             # Check the values now on /active
 
-            # API and Testing Tool clocks need to be synchronized to test absolute scheduled activations
-            # so allow a couple of retries for scheduled activations and report late activations as a WARNING
-            maxTries = 1 if activateMode == IMMEDIATE_ACTIVATION else 3
+            # For scheduled activations, wait for the TAI time at which the activation is due and then poll
+            # with increasing intervals, reporting activations which were not seen by the first poll and were
+            # later than the tolerance as a WARNING as the API and Testing Tool clocks need to be synchronized
+            # to test absolute scheduled activations
+            if activateMode == SCHEDULED_ABSOLUTE_ACTIVATION:
+                activateTarget = self.TAI_to_seconds(activateTime)
+            elif activateMode == SCHEDULED_RELATIVE_ACTIVATION:
+                activateTarget = requestTime + self.TAI_to_seconds(activateTime)
+            else:
+                activateTarget = None
+
+            if activateTarget is None:
+                polls = [0]
+            else:
+                polls = self.poll_TAI_deadline(activateTarget,
+                                               activateTolerance + 2 * CONFIG.API_PROCESSING_TIMEOUT)
             tries = 0
             ready = False
 
-            while tries < maxTries:
+            for late in polls:
                 tries = tries + 1
                 valid2, activeParams = self.checkCleanRequestJSON("GET", activeUrl)
                 if valid2:
@@ -226,16 +239,17 @@ class IS05Utils(NMOSUtils):
 
                         if activeMode == activateMode and activeRequested == activateTime \
                                 and self.compare_resource_version(activeActivation, stagedActivation) >= 0:
-                            if tries > 1:
+                            if activateTarget is not None:
+                                self._record_activation_metrics(activateMode, activateTarget, late, activeParams)
+                            if tries > 1 and late > activateTolerance:
                                 # True with a message means WARNING!
-                                return True, "Activation entries were set at {} later than expected. " \
+                                return True, "Activation entries were set at {} {:.3f}s later than expected. " \
                                              "This could just indicate the API and Testing Tool clocks are " \
-                                             "not synchronized. (Tries: {})".format(activeUrl, tries)
+                                             "not synchronized. (Tries: {})".format(activeUrl, late, tries)
                             else:
                                 return True, ""
                 else:
                     return False, activeParams
-                time.sleep(CONFIG.API_PROCESSING_TIMEOUT)
             if ready:
                 return False, "Activation entries were not set at {} after {} activation{}" \
                               .format(activeUrl, activationName, " (Tries: {})".format(tries) if tries > 1 else "")
@@ -244,13 +258,35 @@ class IS05Utils(NMOSUtils):
         else:
             return False, response
 
+    def _record_activation_metrics(self, activateMode, activateTarget, latency, activeParams):
+        """Record the observed latency of a scheduled activation, and the skew of the reported activation time"""
+        try:
+            skew = self.TAI_to_seconds(activeParams['activation']['activation_time']) - activateTarget
+        except (KeyError, TypeError, AttributeError, ValueError):
+            skew = None
+        self.activation_metrics.append({"mode": activateMode, "latency": latency, "skew": skew})
+
+    def pop_activation_metrics(self):
+        """Summarise and clear the latency and skew recorded for scheduled activations"""
+        metrics = self.activation_metrics
+        self.activation_metrics = []
+        if len(metrics) == 0:
+            return ""
+        latencies = [metric["latency"] for metric in metrics]
+        summary = "Scheduled activation latency (min/max): {:.3f}s/{:.3f}s" \
+                  .format(min(latencies), max(latencies))
+        skews = [metric["skew"] for metric in metrics if metric["skew"] is not None]
+        if len(skews) > 0:
+            summary += ", activation_time skew (min/max): {:+.3f}s/{:+.3f}s".format(min(skews), max(skews))
+        return summary + " over {} activation(s)".format(len(metrics))
+
     def check_perform_immediate_activation(self, port, portId, stagedParams, changedParam):
         return self._check_perform_activation(port, portId, stagedParams, changedParam)
 
     def check_perform_relative_activation(self, port, portId, stagedParams, changedParam):
         return self._check_perform_activation(port, portId, stagedParams, changedParam,
                                               "relative", SCHEDULED_RELATIVE_ACTIVATION,
-                                              "0:200000000", 0.2)
+                                              "0:200000000", CONFIG.API_PROCESSING_TIMEOUT)
 
     def check_perform_absolute_activation(self, port, portId, stagedParams, changedParam):
         # As stated in the README, the time of the test device and the time of the device hosting the tests
@@ -258,7 +294,7 @@ class IS05Utils(NMOSUtils):
         MAX_TIME_SYNC_OFFSET = 0.1
         return self._check_perform_activation(port, portId, stagedParams, changedParam,
                                               "absolute", SCHEDULED_ABSOLUTE_ACTIVATION,
-                                              self.get_TAI_time(1), 1 + MAX_TIME_SYNC_OFFSET)
+                                              self.get_TAI_time(1), MAX_TIME_SYNC_OFFSET)
 
     def check_activation(self, port, portId, activationMethod, transportType, masterEnable=None):
         """Checks that when an immediate activation is called staged parameters are moved
@@ -530,38 +566,25 @@ class IS05Utils(NMOSUtils):
         sdp_valid, sdp_response = self.checkCleanRequest("GET", sdpDest)
         if a_valid:
             if sdp_valid:
-                sdp_sections = sdp_response.text.split("m=")
-                sdp_global = sdp_sections[0]
-                sdp_media_sections = sdp_sections[1:]
-                sdp_groups_line = re.search(r"a=group:DUP (.+)", sdp_global)
-                tp_compare = []
-                if sdp_groups_line:
-                    sdp_group_names = sdp_groups_line.group(1).split()
-                    for sdp_media in sdp_media_sections:
-                        group_name = re.search(r"a=mid:(\S+)", sdp_media)
-                        if group_name.group(1) in sdp_group_names:
-                            tp_compare.append("m=" + sdp_media)
-                elif len(sdp_media_sections) > 0:
-                    tp_compare.append("m=" + sdp_media_sections[0])
+                tp_compare = SDPUtils.parse_sdp(sdp_response.text).transport_media
                 if len(tp_compare) != len(a_response["transport_params"]):
                     return False, "Number of SDP groups do not match the length of the 'transport_params' array"
-                for index, sdp_data in enumerate(tp_compare):
+                for index, media in enumerate(tp_compare):
                     transport_params = a_response["transport_params"][index]
-                    media_line = re.search(r"m=([a-z]+) ([0-9]+) RTP/AVP ([0-9]+)", sdp_data)
-                    if media_line.group(2) != str(transport_params["destination_port"]):
+                    if media.port != transport_params["destination_port"]:
                         return False, "SDP destination port {} does not match transport_params: {}" \
-                                      .format(media_line.group(2), transport_params["destination_port"])
-                    connection_line = re.search(r"c=IN IP[4,6] ([^/\r\n]*)(?:/[0-9]+){0,2}", sdp_data)
-                    if connection_line.group(1) != transport_params["destination_ip"]:
+                                      .format(media.port, transport_params["destination_port"])
+                    if media.connection_address != transport_params["destination_ip"]:
                         return False, "SDP destination IP {} does not match transport_params: {}" \
-                                      .format(connection_line.group(1), transport_params["destination_ip"])
-                    filter_line = re.search(r"a=source-filter: incl IN IP[4,6] (\S*) (\S*)", sdp_data)
-                    if filter_line and filter_line.group(2) != transport_params["source_ip"]:
-                        return False, "SDP source-filter IP {} does not match transport_params: {}" \
-                                      .format(filter_line.group(2), transport_params["source_ip"])
-                    elif filter_line and filter_line.group(1) != transport_params["destination_ip"]:
-                        return False, "SDP source-filter multicast IP {} does not match transport_params {}" \
-                                      .format(filter_line.group(1), transport_params["destination_ip"])
+                                      .format(media.connection_address, transport_params["destination_ip"])
+                    source_filter = media.source_filter
+                    if source_filter and source_filter.mode == "incl":
+                        if source_filter.sources[0] != transport_params["source_ip"]:
+                            return False, "SDP source-filter IP {} does not match transport_params: {}" \
+                                          .format(source_filter.sources[0], transport_params["source_ip"])
+                        elif source_filter.destination != transport_params["destination_ip"]:
+                            return False, "SDP source-filter multicast IP {} does not match transport_params {}" \
+                                          .format(source_filter.destination, transport_params["destination_ip"])
             else:
                 return False, sdp_response
         else:
@@ -14,38 +14,118 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from threading import Thread
-from queue import Queue
+import socket
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from threading import Condition
+from zeroconf import _CLASS_IN, _TYPE_SRV
+
+from . import Config as CONFIG
+
+# Number of threads shared by all listeners for resolving services
+RESOLVER_THREADS = 8
+
+# Lifetime in seconds of a resolved service whose SRV record is not in the Zeroconf cache
+DEFAULT_TTL = 120
+
+RESOLVER_POOL = ThreadPoolExecutor(max_workers=RESOLVER_THREADS, thread_name_prefix="MdnsResolver")
+
+
+def service_at(ip, port):
+    """Get a predicate which matches a resolved service advertised at a specific IP address and port"""
+    def predicate(info):
+        return info.port == port and any(address == ip for address in get_addresses(info))
+    return predicate
+
+
+def get_addresses(info):
+    """Get the IPv4 addresses of a resolved service as strings"""
+    return [socket.inet_ntoa(address) for address in info.addresses if len(address) == 4]
 
 
 class MdnsListener(object):
     def __init__(self, zeroconf):
         self.zeroconf = zeroconf
-        self.services = list()
-        self.resolve_queue = Queue()
+        # Resolved services, by (type, name), in the order in which they were resolved
+        self.services = dict()
+        self.resolved_time = dict()
+        # Resolutions in progress, by (type, name), and whether another has been requested since each one started
+        self.resolving = dict()
+        self.condition = Condition()
 
     def _resolve_service(self, srv_type, name):
-        self.resolve_queue.put((srv_type, name))
-        t = Thread(target=self.worker)
-        t.daemon = True
-        t.start()
+        key = (srv_type, name)
+        with self.condition:
+            if key in self.resolving:
+                # Resolve again once the current resolution completes, in case the advert changed in the meantime
+                self.resolving[key] = True
+                return
+            self.resolving[key] = False
+        RESOLVER_POOL.submit(self.worker, key)
 
     def add_service(self, zeroconf, srv_type, name):
         self._resolve_service(srv_type, name)
 
     def remove_service(self, zeroconf, srv_type, name):
-        pass
+        with self.condition:
+            self.services.pop((srv_type, name), None)
+            self.resolved_time.pop((srv_type, name), None)
+            self.condition.notify_all()
 
     def update_service(self, zeroconf, srv_type, name):
         self._resolve_service(srv_type, name)
 
-    def get_service_list(self):
-        self.resolve_queue.join()
-        return self.services
+    def _is_expired(self, key, now):
+        # Follow the TTL of the SRV record, which Zeroconf refreshes while the service is still advertised
+        record = self.zeroconf.cache.get_by_details(key[1], _TYPE_SRV, _CLASS_IN)
+        if record is not None:
+            return record.is_expired(now * 1000)
+        return now >= self.resolved_time[key] + DEFAULT_TTL
+
+    def _current_services(self, srv_type):
+        now = time.time()
+        for key in [key for key in self.services if self._is_expired(key, now)]:
+            del self.services[key]
+            del self.resolved_time[key]
+        return [(key, info) for key, info in self.services.items() if key[0] == srv_type]
+
+    def get_service_list(self, srv_type, timeout=None):
+        """Get the services of a type which have been resolved and not since removed or expired, most recent last,
+        waiting for up to 'timeout' seconds (by default DNS_SD_BROWSE_TIMEOUT) for any resolutions of services of
+        that type which are in progress"""
+        if timeout is None:
+            timeout = CONFIG.DNS_SD_BROWSE_TIMEOUT
+        with self.condition:
+            self.condition.wait_for(lambda: not any(key[0] == srv_type for key in self.resolving), timeout)
+            return [info for _, info in self._current_services(srv_type)]
+
+    def wait_for_service(self, srv_type, predicate, timeout, since=None):
+        """Wait for a resolved service of a type which matches the predicate, returning the most recently resolved
+        one, or None if there is none before the timeout. If 'since' is specified, services resolved before that time
+        are ignored, e.g. to wait for a service to be updated"""
+        def find_service():
+            return next((info for key, info in reversed(self._current_services(srv_type))
+                         if (since is None or self.resolved_time[key] >= since) and predicate(info)), None)
+
+        with self.condition:
+            return self.condition.wait_for(find_service, timeout)
 
-    def worker(self):
-        item = self.resolve_queue.get()
-        info = self.zeroconf.get_service_info(item[0], item[1])
-        if info is not None:
-            self.services.append(info)
-        self.resolve_queue.task_done()
+    def worker(self, key):
+        while True:
+            try:
+                info = self.zeroconf.get_service_info(key[0], key[1])
+            except Exception:
+                info = None
+            with self.condition:
+                if info is not None:
+                    # Move the service to the end, as the most recently resolved
+                    self.services.pop(key, None)
+                    self.services[key] = info
+                    self.resolved_time[key] = time.time()
+                self.condition.notify_all()
+                if self.resolving[key]:
+                    self.resolving[key] = False
+                    continue
+                del self.resolving[key]
+                return
@@ -0,0 +1,155 @@
+# Copyright (C) 2021 Advanced Media Workflow Association
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from threading import RLock
+from zeroconf_monkey import ServiceBrowser, Zeroconf
+
+from .MdnsListener import MdnsListener
+
+# Service types which are browsed continuously from the first use of mDNS. Any other '_nmos-*._tcp' service types
+# are browsed as soon as they are seen in the responses to a DNS-SD service type enumeration query
+NMOS_SERVICE_TYPES = [
+    "_nmos-node._tcp.local.",
+    "_nmos-register._tcp.local.",
+    "_nmos-registration._tcp.local.",
+    "_nmos-query._tcp.local.",
+    "_nmos-system._tcp.local.",
+    "_nmos-auth._tcp.local.",
+    "_nmos-mqtt._tcp.local."
+]
+
+SERVICE_TYPE_ENUMERATION = "_services._dns-sd._udp.local."
+
+
+class ServiceTypeListener(object):
+    """Starts browsing for each NMOS service type found by a DNS-SD service type enumeration"""
+
+    def __init__(self, manager):
+        self.manager = manager
+
+    def add_service(self, zeroconf, srv_type, name):
+        if name.startswith("_nmos-") and name.endswith("._tcp.local."):
+            self.manager.browse(name)
+
+    def remove_service(self, zeroconf, srv_type, name):
+        pass
+
+    def update_service(self, zeroconf, srv_type, name):
+        pass
+
+
+class MdnsManager(object):
+    """
+    Holds a single Zeroconf instance for the lifetime of the testing tool. The NMOS service types are browsed
+    continuously, so that test suites start from a warm cache of resolved services. Adverts are reference counted
+    by name, so that an advert which is registered again while it is still active isn't re-probed
+    """
+    def __init__(self):
+        self.lock = RLock()
+        self.zeroconf = None
+        self.listener = None
+        self.browsers = {}
+        # Registered adverts, by name, with the number of registrations of each
+        self.adverts = {}
+
+    def get_zeroconf(self):
+        with self.lock:
+            if self.zeroconf is None:
+                self.zeroconf = Zeroconf()
+                self.listener = MdnsListener(self.zeroconf)
+                for service_type in NMOS_SERVICE_TYPES:
+                    self.browse(service_type)
+                self.browsers[SERVICE_TYPE_ENUMERATION] = ServiceBrowser(self.zeroconf, SERVICE_TYPE_ENUMERATION,
+                                                                         ServiceTypeListener(self))
+            return self.zeroconf
+
+    def get_listener(self):
+        """Get the listener which holds the resolved services of each of the browsed types"""
+        with self.lock:
+            self.get_zeroconf()
+            return self.listener
+
+    def browse(self, service_type):
+        """Start browsing for a service type, unless it is already being browsed"""
+        with self.lock:
+            zeroconf = self.get_zeroconf()
+            if service_type not in self.browsers:
+                self.browsers[service_type] = ServiceBrowser(zeroconf, service_type, self.listener)
+
+    def register_service(self, info):
+        with self.lock:
+            zeroconf = self.get_zeroconf()
+            if info.name not in self.adverts:
+                zeroconf.register_service(info)
+                self.adverts[info.name] = [info, 1]
+            else:
+                advert = self.adverts[info.name]
+                if advert[0] is not info:
+                    # Re-announce the advert, in case its contents have changed
+                    zeroconf.update_service(info)
+                    advert[0] = info
+                advert[1] += 1
+
+    def unregister_service(self, info):
+        with self.lock:
+            advert = self.adverts.get(info.name)
+            if advert is None:
+                return
+            advert[1] -= 1
+            if advert[1] == 0:
+                self.zeroconf.unregister_service(advert[0])
+                del self.adverts[info.name]
+
+    def open(self):
+        """Get a session, through which a test suite registers adverts"""
+        return MdnsSession(self)
+
+    def close(self):
+        with self.lock:
+            if self.zeroconf is not None:
+                for browser in self.browsers.values():
+                    browser.cancel()
+                self.zeroconf.close()
+            self.zeroconf = None
+            self.listener = None
+            self.browsers = {}
+            self.adverts = {}
+
+
+class MdnsSession(object):
+    """A test suite's use of the shared MdnsManager, which withdraws any adverts still registered by the suite
+    when it is closed"""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.registered = []
+
+    def browse(self, service_type):
+        self.manager.browse(service_type)
+
+    def register_service(self, info):
+        self.manager.register_service(info)
+        self.registered.append(info)
+
+    def unregister_service(self, info):
+        if info in self.registered:
+            self.registered.remove(info)
+            self.manager.unregister_service(info)
+
+    def close(self):
+        while self.registered:
+            self.manager.unregister_service(self.registered.pop())
+
+
+MDNS_MANAGER = MdnsManager()
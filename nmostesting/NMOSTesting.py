@@ -45,14 +45,18 @@ from requests.compat import json
 
 from . import Config as CONFIG
 from .DNS import DNS
-from .GenericTest import NMOSInitException
-from .TestResult import TestStates
+from .MdnsManager import MDNS_MANAGER
+from .GenericTest import NMOSInitException, get_test_tags, select_tests
+from .TestResult import TestResult, TestStates
 from .TestHelper import get_default_ip
 from .NMOSUtils import DEFAULT_ARGS
 from .CRL import CRL, CRL_API
 from .OCSP import OCSP, OCSP_API
+from .ResultStore import ResultStore, format_query
+from .ResultWriter import open_result_writer
 from .mocks.Node import NODE, NODE_API
 from .mocks.Registry import NUM_REGISTRIES, REGISTRIES, REGISTRY_API
+from .mocks.QueryAPI import QUERY_API, SUBSCRIPTION_SERVER
 from .mocks.System import NUM_SYSTEMS, SYSTEMS, SYSTEM_API
 
 # Make ANSI escape character sequences (for producing coloured terminal text) work under Windows
@@ -64,6 +68,7 @@ except ImportError:
 
 from .suites import IS0401Test
 from .suites import IS0402Test
+from .suites import IS0402LoadTest
 from .suites import IS0403Test
 from .suites import IS0501Test
 from .suites import IS0502Test
@@ -100,6 +105,8 @@ for instance in range(NUM_REGISTRIES):
     reg_app.config['PORT'] = REGISTRIES[instance].port
     reg_app.config['SECURE'] = CONFIG.ENABLE_HTTPS
     reg_app.register_blueprint(REGISTRY_API)  # Dependency for IS0401Test
+    if CONFIG.ENABLE_MOCK_QUERY_API:
+        reg_app.register_blueprint(QUERY_API)  # Dependency for IS0401Test
     FLASK_APPS.append(reg_app)
 
 for instance in range(NUM_SYSTEMS):
@@ -160,6 +167,17 @@ TEST_DEFINITIONS = {
         }],
         "class": IS0402Test.IS0402Test
     },
+    "IS-04-02-LOAD": {
+        "name": "IS-04 Registry APIs Load Benchmark",
+        "specs": [{
+            "spec_key": "is-04",
+            "api_key": "registration"
+        }, {
+            "spec_key": "is-04",
+            "api_key": "query"
+        }],
+        "class": IS0402LoadTest.IS0402LoadTest
+    },
     "IS-04-03": {
         "name": "IS-04 Node API (Peer to Peer)",
         "specs": [{
@@ -384,6 +402,7 @@ def index_page():
 
                     test_selection = request.form.getlist("test_selection")
                     results = run_tests(test, endpoints, test_selection)
+                    record_results(results, endpoints)
                     json_output = format_test_results(results, endpoints, "json", CMD_ARGS)
                     for index, result in enumerate(results["result"]):
                         results["result"][index] = result.output()
@@ -420,6 +439,8 @@ def index_page():
             discovery_mode = "Unicast DNS"
         else:
             discovery_mode = "Invalid Configuration"
+    elif CONFIG.ENABLE_MOCK_QUERY_API:
+        discovery_mode = "Disabled (Using mock Query API {}:{})".format(get_default_ip(), REGISTRIES[1].port)
     else:
         discovery_mode = "Disabled (Using Query API {}:{})".format(CONFIG.QUERY_API_HOST, CONFIG.QUERY_API_PORT)
 
@@ -431,7 +452,7 @@ def index_page():
     return r
 
 
-def run_tests(test, endpoints, test_selection=["all"]):
+def run_tests(test, endpoints, test_selection=["all"], result_writer=None):
     if test in TEST_DEFINITIONS:
         test_def = TEST_DEFINITIONS[test]
         protocol = "http"
@@ -515,9 +536,12 @@ def run_tests(test, endpoints, test_selection=["all"]):
         else:
             test_obj = test_def["class"](apis)
 
+        if result_writer is not None:
+            result_writer.start(test, test_def["name"], endpoints, tested_urls, _export_config())
+
         core_app.config['TEST_ACTIVE'] = time.time()
         try:
-            result = test_obj.run_tests(test_selection)
+            result = test_obj.run_tests(test_selection, result_writer)
         except Exception as ex:
             print(" * ERROR: {}".format(ex))
             raise ex
@@ -588,6 +612,15 @@ def _check_test_result(test_result, results):
         """)
 
 
+def record_results(results, endpoints, ignored_tests=[]):
+    """Store the results of a run in the results database, if one is configured"""
+    if CONFIG.RESULTS_DATABASE:
+        # Any None results are reported when the results are formatted, see _check_test_result()
+        ResultStore(CONFIG.RESULTS_DATABASE).record_run(results["suite"], endpoints,
+                                                        [result for result in results["result"] if result is not None],
+                                                        TOOL_VERSION, _export_config(), ignored_tests)
+
+
 def _export_config():
     current_config = {"VERSION": TOOL_VERSION}
     for param in dir(CONFIG):
@@ -596,6 +629,112 @@ def _export_config():
     return current_config
 
 
+def parse_test_state(state):
+    """Get a TestStates value from its name (e.g. 'FAIL') or its description (e.g. 'Fail'), ignoring case"""
+    for test_state in TestStates:
+        if state.lower() in [test_state.name.lower(), str(test_state).lower()]:
+            return test_state
+    raise ValueError("Unknown test state '{}'".format(state))
+
+
+def load_previous_results(rerun_from):
+    """Load the results of a previous run, from a JSON results file or an already parsed JSON results document"""
+    if isinstance(rerun_from, dict):
+        previous = rerun_from
+    else:
+        with open(rerun_from) as f:
+            previous = json.load(f)
+    if not isinstance(previous, dict) or not isinstance(previous.get("results"), list):
+        raise ValueError("Not a JSON test results document")
+    return previous
+
+
+def check_rerun_args(args, access_type="cli"):
+    """Get an error message if the previous results or states to re-run are invalid"""
+    if access_type == "http" and not isinstance(args.rerun_from, dict):
+        # Don't allow API clients to read files on the testing tool's host
+        return "ERROR: 'rerun_from' must be a JSON results document"
+    try:
+        for state in args.rerun_states:
+            parse_test_state(state)
+        previous = load_previous_results(args.rerun_from)
+    except (OSError, ValueError) as e:
+        source = args.rerun_from if isinstance(args.rerun_from, str) else "the previous results"
+        return "ERROR: Unable to re-run tests from {}: {}".format(source, e)
+    if previous.get("suite") != args.suite:
+        return "ERROR: The results to re-run are from test suite '{}' rather than '{}'" \
+               .format(previous.get("suite"), args.suite)
+    return ""
+
+
+def select_rerun_tests(suite, previous, states):
+    """Get the test selection needed to re-run the tests of a previous run which had one of the given states.
+    Automatically defined tests can only be re-run all together, via 'auto'"""
+    tests = enumerate_tests(TEST_DEFINITIONS[suite]["class"])
+    state_names = [str(state) for state in states]
+    selection = []
+    for result in previous["results"]:
+        if result["state"] not in state_names:
+            continue
+        test_name = "auto" if result["name"].startswith("auto_") else result["name"]
+        if test_name in tests and test_name not in selection:
+            selection.append(test_name)
+    return selection
+
+
+def merge_rerun_results(results, previous):
+    """Merge the results of re-running some tests into the results of the previous run, in the previous order.
+    Previous results which weren't replaced are carried over, and marked as such"""
+    new_results = {}
+    for test_result in results["result"]:
+        if test_result is not None:
+            new_results.setdefault(test_result.name, []).append(test_result)
+    rerun_auto = any(test_name.startswith("auto_") for test_name in new_results)
+    merged = []
+    carried_over = []
+    for previous_result in previous["results"]:
+        test_name = previous_result["name"]
+        if new_results.get(test_name):
+            merged.append(new_results[test_name].pop(0))
+        elif not (rerun_auto and test_name.startswith("auto_")):
+            test_result = TestResult(test_name, parse_test_state(previous_result["state"]),
+                                     previous_result.get("description", ""), previous_result["detail"], None,
+                                     previous_result.get("timestamp", ""), previous_result["duration"])
+            test_result.metrics = previous_result.get("metrics")
+            test_result.carried_over = True
+            merged.append(test_result)
+            carried_over.append(test_result)
+    # Add any results which weren't in the previous run, e.g. because the automatically defined tests have changed
+    for test_results in new_results.values():
+        merged.extend(test_results)
+    results["result"] = merged
+    return carried_over
+
+
+def run_selected_tests(args, endpoints, result_writer=None):
+    """Run the selected test, or re-run the tests from previous results which had the selected states"""
+    if args.rerun_from is None:
+        results = run_tests(args.suite, endpoints, get_selection(args), result_writer)
+        record_results(results, endpoints, args.ignore)
+        return results
+
+    previous = load_previous_results(args.rerun_from)
+    states = [parse_test_state(state) for state in args.rerun_states]
+    test_selection = select_rerun_tests(args.suite, previous, states)
+    if not test_selection:
+        raise NMOSInitException("No tests in the previous results had the state(s): {}"
+                                .format(", ".join(str(state) for state in states)))
+    print(" * Re-running tests: {}".format(", ".join(test_selection)))
+    results = run_tests(args.suite, endpoints, test_selection, result_writer)
+    carried_over = merge_rerun_results(results, previous)
+    if result_writer is not None:
+        for test_result in carried_over:
+            result_writer.write(test_result)
+    # Record the merged results, so that the carried over tests aren't recorded as missing from this run
+    record_results(results, endpoints, args.ignore)
+    return results
+
+
 def format_test_results(results, endpoints, format, args):
     formatted = None
     total_time = 0
@@ -620,15 +759,22 @@ def format_test_results(results, endpoints, format, args):
             formatted["results"].append({
                 "name": test_result.name,
                 "state": str(TestStates.DISABLED if test_result.name in ignored_tests else test_result.state),
+                "description": test_result.description,
                 "detail": test_result.detail,
+                "timestamp": test_result.timestamp,
                 "duration": test_result.elapsed_time
             })
+            if test_result.metrics is not None:
+                formatted["results"][-1]["metrics"] = test_result.metrics
+            if test_result.carried_over:
+                formatted["results"][-1]["carried_over"] = True
         formatted = json.dumps(formatted, sort_keys=True, indent=4)
     elif format == "junit":
         test_cases = []
         for test_result in results["result"]:
             test_case = TestCase(test_result.name, classname=results["suite"],
-                                 elapsed_sec=test_result.elapsed_time, timestamp=test_result.timestamp)
+                                 elapsed_sec=test_result.elapsed_time, timestamp=test_result.timestamp,
+                                 status="carried over" if test_result.carried_over else None)
             if test_result.name in ignored_tests or test_result.state in [
                 TestStates.DISABLED,
                 TestStates.UNCLEAR,
@@ -650,6 +796,8 @@ def format_test_results(results, endpoints, format, args):
         for test_result in results["result"]:
             num_extra_dots = max_name_len - len(test_result.name)
             test_state = str(TestStates.DISABLED if test_result.name in ignored_tests else test_result.state)
+            if test_result.carried_over:
+                test_state += " (Carried Over)"
             formatted += "{} ...{} {}\r\n".format(test_result.name, ("." * num_extra_dots), test_state)
         formatted += "----------------------------\r\n"
         formatted += "Ran {} tests in ".format(len(results["result"])) + "{0:.3f}s".format(total_time) + "\r\n"
@@ -701,8 +849,11 @@ def parse_arguments():
                               help="list available tests for a given suite")
     suite_parser.add_argument('--describe-tests', action='store_true',
                               help="describe the available tests for a given suite")
-    suite_parser.add_argument('--selection', default=DEFAULT_ARGS["selection"],
-                              help="select a specific test to run, otherwise 'all' will be tested")
+    suite_parser.add_argument('--list-tags', action='store_true',
+                              help="list the tags of the tests in a given suite, with the tests which have each tag")
+    suite_parser.add_argument('--selection', default=DEFAULT_ARGS["selection"], nargs="+",
+                              help="space separated test names, glob patterns (e.g. 'test_1*') or tags of the tests "
+                                   "to run, or 'auto', otherwise 'all' will be tested")
     suite_parser.add_argument('--host', default=DEFAULT_ARGS["host"], nargs="*",
                               help="space separated hostnames or IPs of the APIs under test")
     suite_parser.add_argument('--port', default=DEFAULT_ARGS["port"], nargs="*", type=int,
@@ -714,7 +865,33 @@ def parse_arguments():
     suite_parser.add_argument('--ignore', default=DEFAULT_ARGS["ignore"], nargs="*",
                               help="space separated test names to ignore the results from")
     suite_parser.add_argument('--output', default=DEFAULT_ARGS["output"],
-                              help="filename to save test results to (ending .xml or .json), otherwise print to stdout")
+                              help="filename to save test results to (ending .xml, .json or .jsonl), otherwise print "
+                                   "to stdout. XML and JSON Lines results are written as each test completes")
+    suite_parser.add_argument('--rerun-from', default=DEFAULT_ARGS["rerun_from"],
+                              help="JSON results file of a previous run of the suite, from which to re-run the tests "
+                                   "with the states given by --rerun-states, carrying over the other results")
+    suite_parser.add_argument('--rerun-states', default=DEFAULT_ARGS["rerun_states"], nargs="*",
+                              help="space separated states of the tests to re-run, e.g. FAIL WARNING UNCLEAR")
+    suite_parser.add_argument('--fsync', action='store_true',
+                              help="flush each test result to disk as it is written to an XML or JSON Lines file")
+
+    results_parser = subparsers.add_parser("results", help="query the history of test runs in the results database")
+    results_parser.add_argument("query", choices=["runs", "changes", "flaky", "regressions"],
+                                help="list recent runs, show the changes in test states since the preceding run, "
+                                     "find tests whose states change frequently, or find tests which have become "
+                                     "slower")
+    results_parser.add_argument('--database', default=CONFIG.RESULTS_DATABASE,
+                                help="path of the results database, by default RESULTS_DATABASE in the config")
+    results_parser.add_argument('--dut', default=None,
+                                help="only include runs against the API(s) under test with these space separated "
+                                     "host:port pairs")
+    results_parser.add_argument('--test-suite', default=None,
+                                help="only include runs of this test suite")
+    results_parser.add_argument('--run', default=None, type=int,
+                                help="ID of the run to compare with its preceding run, otherwise the most recent")
+    results_parser.add_argument('--window', default=10, type=int,
+                                help="number of recent runs to list, or to consider for flaky tests and durations")
+    results_parser.add_argument('--json', action='store_true', help="print the results of the query as JSON")
 
     return parser.parse_args()
 
@@ -730,6 +907,7 @@ def validate_args(args, access_type="cli"):
         for test_suite in sorted(TEST_DEFINITIONS):
             msg += test_suite + ": " + TEST_DEFINITIONS[test_suite]["name"] + '\n'
     elif "suite" in vars(args):
+        selection_error = check_selection(args) if args.suite in TEST_DEFINITIONS else ""
         if args.suite not in TEST_DEFINITIONS:
             msg = "ERROR: The requested test suite '{}' does not exist".format(args.suite)
             return_type = ExitCodes.ERROR
@@ -741,9 +919,12 @@ def validate_args(args, access_type="cli"):
             tests = enumerate_tests(TEST_DEFINITIONS[args.suite]["class"], describe=True)
             for test_description in tests:
                 msg += test_description + '\n'
-        elif getattr(args, "selection", "all") not in enumerate_tests(TEST_DEFINITIONS[args.suite]["class"]):
-            msg = "ERROR: Test with name '{}' does not exist in test suite '{}'".format(args.selection,
-                                                                                        args.suite)
+        elif getattr(args, "list_tags", False):
+            tags = get_test_tags(TEST_DEFINITIONS[args.suite]["class"])
+            for tag in sorted(tags):
+                msg += tag + ": " + " ".join(tags[tag]) + '\n'
+        elif selection_error:
+            msg = selection_error
             return_type = ExitCodes.ERROR
         elif not args.host or not args.port or not args.version:
             msg = "ERROR: No Hostname(s)/IP address(es) or Port(s) or Version(s) specified"
@@ -764,15 +945,62 @@ def validate_args(args, access_type="cli"):
             msg = "ERROR: This test suite expects {} Hostname(s)/IP address(es), Port(s) and Version(s)".format(
                 len(TEST_DEFINITIONS[args.suite]["specs"]))
             return_type = ExitCodes.ERROR
-        elif args.output and not args.output.endswith("xml") and not args.output.endswith("json"):
-            msg = "ERROR: Output file must end with '.xml' or '.json'"
+        elif args.output and not args.output.endswith(("xml", "json", "jsonl")):
+            msg = "ERROR: Output file must end with '.xml', '.json' or '.jsonl'"
             return_type = ExitCodes.ERROR
     elif access_type == "http" and "suite" not in vars(args):
         msg = "ERROR: 'suite' parameter not found in body of request"
         return_type = ExitCodes.ERROR
+    if not msg and "suite" in vars(args) and args.rerun_from is not None:
+        msg = check_rerun_args(args, access_type)
+        if msg:
+            return_type = ExitCodes.ERROR
     return arg_return(access_type, return_type, msg)
 
 
+def query_results(database, query, dut=None, suite=None, run_id=None, window=10):
+    store = ResultStore(database)
+    if query == "runs":
+        return store.get_runs(dut, suite, window)
+    elif query == "changes":
+        return store.get_changes(run_id, dut, suite)
+    elif query == "flaky":
+        return store.get_flaky_tests(dut, suite, window)
+    elif query == "regressions":
+        return store.get_duration_regressions(run_id, dut, suite, window)
+    raise ValueError("Unknown results query '{}'".format(query))
+
+
+def run_results_query(args):
+    if not args.database:
+        print(" * ERROR: No results database specified. Set RESULTS_DATABASE in the config or use --database")
+        return ExitCodes.ERROR
+    if not os.path.exists(args.database):
+        print(" * ERROR: The results database '{}' does not exist".format(args.database))
+        return ExitCodes.ERROR
+    data = query_results(args.database, args.query, args.dut, args.test_suite, args.run, args.window)
+    if args.json:
+        print(json.dumps(data, sort_keys=True, indent=4))
+    else:
+        print(format_query(args.query, data))
+    return ExitCodes.OK
+
+
+def get_selection(args):
+    """Get the list of test names, glob patterns and tags selected by the arguments"""
+    selection = getattr(args, "selection", "all")
+    return [selection] if isinstance(selection, str) else selection
+
+
+def check_selection(args):
+    """Get an error message if the selected tests do not exist in the test suite"""
+    try:
+        select_tests(TEST_DEFINITIONS[args.suite]["class"], get_selection(args))
+    except ValueError as e:
+        return "ERROR: {} in test suite '{}'".format(e, args.suite)
+    return ""
+
+
 def arg_return(access_type, return_type, msg=""):
     if access_type == "http":
         if msg.endswith('\n'):
@@ -816,6 +1044,9 @@ def start_web_servers():
         ctx.check_hostname = False
         ctx.verify_mode = ssl.CERT_NONE
 
+    if CONFIG.ENABLE_MOCK_QUERY_API:
+        SUBSCRIPTION_SERVER.start_server(ctx)
+
     web_threads = []
     for app in FLASK_APPS:
         port = app.config['PORT']
@@ -849,15 +1080,29 @@ def run_noninteractive_tests(args):
             selector = args.selector[i]
         endpoints.append({"host": args.host[i], "port": args.port[i], "version": args.version[i],
                           "selector": selector})
+    result_writer = None
     try:
-        results = run_tests(args.suite, endpoints, [args.selection])
-        if args.output:
+        if args.output and not args.output.endswith(".json"):
+            # Stream the results to the output file as each test completes
+            result_writer = open_result_writer(args.output, args.ignore, args.fsync)
+        results = run_selected_tests(args, endpoints, result_writer)
+        if result_writer:
+            for test_result in results["result"]:
+                _check_test_result(test_result, results)
+            result_writer.finish()
+            print(" * Test results written to file: {}".format(args.output))
+            exit_code = identify_exit_code(results, args)
+        elif args.output:
             exit_code = write_test_results(results, endpoints, args)
         else:
             exit_code = print_test_results(results, endpoints, args)
     except Exception as e:
         print(" * ERROR: {}".format(str(e)))
         exit_code = ExitCodes.ERROR
+    finally:
+        if result_writer:
+            # Summarise any partial results
+            result_writer.close()
     return exit_code
 
 
@@ -878,7 +1123,6 @@ def check_internal_requirements():
 
 def check_external_requirements():
     deps = {
-        "sdpoker": ("sdpoker --version", "0.2.0"),
         "testssl": ("{} testssl/testssl.sh -v".format(shlex.quote(CONFIG.TEST_SSL_BASH)), "3.0.2")
     }
     for dep_name, dep_ver in deps.items():
@@ -908,7 +1152,10 @@ def api():
         example_dict["version"] = ["v1.2"]
         example_dict["selector"] = [None]
         example_dict["output"] = "xml"
+        example_dict["selection"] = ["test_01", "test_1*", "dns-sd"]
         example_dict["ignore"] = ["test_23"]
+        example_dict["rerun_from"] = None
+        example_dict["rerun_states"] = ["FAIL", "WARNING"]
         return jsonify(example_dict), 200
     elif core_app.config['TEST_ACTIVE'] is not False:
         return jsonify("""Error: A test is currently in progress.
@@ -940,6 +1187,21 @@ def api():
         return results, 400
 
 
+@core_app.route('/results', methods=["GET"])
+def results_history():
+    if not CONFIG.RESULTS_DATABASE:
+        return jsonify("Error: No results database is configured"), 400
+    try:
+        run_id = request.args.get("run")
+        data = query_results(CONFIG.RESULTS_DATABASE, request.args.get("query", "runs"),
+                             request.args.get("dut"), request.args.get("suite"),
+                             int(run_id) if run_id is not None else None,
+                             int(request.args.get("window", 10)))
+        return jsonify(data), 200
+    except ValueError as e:
+        return jsonify("Error: {}".format(e)), 400
+
+
 @core_app.route('/config', methods=["GET", "PATCH"])
 def config():
     if request.method == "GET":
@@ -970,7 +1232,7 @@ def run_api_tests(args, data_format):
             selector = args.selector[i]
         endpoints.append({"host": args.host[i], "port": args.port[i], "version": args.version[i],
                           "selector": selector})
-    results = run_tests(args.suite, endpoints, [args.selection])
+    results = run_selected_tests(args, endpoints)
     if data_format == "xml":
         formatted_test_results = format_test_results(results, endpoints, "junit", args)
         return TestSuite.to_xml_string([formatted_test_results], prettyprint=True)
@@ -1001,6 +1263,8 @@ def main(args):
 
     # Parse and validate command line arguments
     CMD_ARGS = parse_arguments()
+    if "query" in vars(CMD_ARGS):
+        sys.exit(run_results_query(CMD_ARGS))
     validate_args(CMD_ARGS)
 
     # Download up to date versions of each API specification
@@ -1042,5 +1306,8 @@ def main(args):
     if DNS_SERVER:
         DNS_SERVER.stop()
 
+    # Withdraw any remaining mDNS adverts
+    MDNS_MANAGER.close()
+
     # Exit the application with the desired code
     sys.exit(exit_code)
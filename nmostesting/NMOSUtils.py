@@ -62,13 +62,16 @@ DEFAULT_ARGS = {
     "describe_suites": False,
     "list_tests": False,
     "describe_tests": False,
+    "list_tags": False,
     "host": [],
     "port": [],
     "version": [],
     "selector": [],
     "ignore": [],
     "output": None,
-    "selection": "all"
+    "selection": ["all"],
+    "rerun_from": None,
+    "rerun_states": ["FAIL", "WARNING"]
 }
 
 
@@ -95,6 +98,44 @@ class NMOSUtils(object):
         ippTime = NMOSUtils.from_UTC(secs, nanos)
         return str(ippTime[0]) + ":" + str(ippTime[1])
 
+    @staticmethod
+    def get_TAI_seconds(offset=0.0):
+        """Get the current TAI time as floating point seconds"""
+        return NMOSUtils.TAI_to_seconds(NMOSUtils.get_TAI_time(offset))
+
+    @staticmethod
+    def TAI_to_seconds(tai_time):
+        """Convert a colon-separated TAI time string into floating point seconds"""
+        secs, nanos = tai_time.split(":")
+        return int(secs) + int(nanos) / 1e9
+
+    @staticmethod
+    def sleep_until_TAI(target, min_interval=0.005):
+        """Sleep until the given TAI time (in seconds), halving each sleep as the deadline approaches so that
+        the wake-up is not late by more than the clock and scheduler jitter"""
+        while True:
+            remaining = target - NMOSUtils.get_TAI_seconds()
+            if remaining <= 0:
+                return
+            time.sleep(remaining / 2 if remaining > min_interval else remaining)
+
+    @staticmethod
+    def poll_TAI_deadline(target, timeout, min_interval=0.005, max_interval=None):
+        """Generator which sleeps until the given TAI time (in seconds) and then yields each time the caller
+        should poll, backing off exponentially from min_interval to max_interval until timeout seconds after
+        the deadline. Each value yielded is the number of seconds elapsed since the deadline."""
+        if max_interval is None:
+            max_interval = CONFIG.API_PROCESSING_TIMEOUT
+        NMOSUtils.sleep_until_TAI(target, min_interval)
+        interval = min_interval
+        while True:
+            late = NMOSUtils.get_TAI_seconds() - target
+            yield late
+            if late >= timeout:
+                return
+            time.sleep(min(interval, timeout - late))
+            interval = min(interval * 2, max_interval)
+
     @staticmethod
     def compare_resource_version(ver1, ver2):
         """Returns 1 if ver1>ver2, 0 if ver1=ver2, and -1 if ver1<ver2"""
@@ -16,6 +16,8 @@
 import os
 import jsonref
 
+from .TestHelper import SCHEMA_LOADER
+
 
 # Work around ramlfications Windows compatibility issues and loader caching. The following method is modified from
 # the original in https://github.com/spotify/ramlfications/blob/master/ramlfications/loader.py
@@ -33,8 +35,6 @@ def _parse_json(self, jsonfile, base_path):
     else:
         base_uri_path = "file://" + base_path
 
-    loader = jsonref.JsonLoader(cache_results=False)
-
     with open(jsonfile, "r") as f:
-        schema = jsonref.load(f, base_uri=base_uri_path, loader=loader, jsonschema=True)
+        schema = jsonref.load(f, base_uri=base_uri_path, loader=SCHEMA_LOADER, jsonschema=True)
     return schema
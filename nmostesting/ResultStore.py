@@ -0,0 +1,253 @@
+# Copyright (C) 2021 Advanced Media Workflow Association
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import re
+import sqlite3
+import time
+
+from contextlib import closing
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    suite TEXT NOT NULL,
+    dut TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    duration REAL NOT NULL,
+    tool_version TEXT,
+    endpoints TEXT,
+    config TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_by_dut ON runs (dut, suite, timestamp);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    test TEXT NOT NULL,
+    occurrence INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL,
+    ignored INTEGER NOT NULL DEFAULT 0,
+    detail TEXT,
+    duration REAL NOT NULL,
+    metrics TEXT,
+    carried_over INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (run_id, test, occurrence)
+);
+CREATE INDEX IF NOT EXISTS results_by_test ON results (test, occurrence, run_id);
+"""
+
+# Columns of the runs returned by queries, omitting the endpoints and configuration which were stored with each run
+RUN_COLUMNS = "id, suite, dut, timestamp, duration, tool_version"
+
+# Configuration parameters whose values are credentials, and which are therefore not stored with each run
+SECRET_CONFIG = re.compile(r"PASSWORD|SECRET|PRIVKEY|USERNAME|(^|_)TOKEN$")
+
+
+def redact_config(config):
+    """Get a copy of the configuration of a run with the values of any credentials replaced"""
+    if config is None:
+        return None
+    return {param: "<redacted>" if value is not None and SECRET_CONFIG.search(param) else value
+            for param, value in config.items()}
+
+
+def get_dut(endpoints):
+    """Identify the device under test by the host and port of each of the APIs under test"""
+    return " ".join("{}:{}".format(endpoint["host"], endpoint["port"]) for endpoint in endpoints)
+
+
+class ResultStore(object):
+    """
+    Stores the results of every test run in an SQLite database, so that a device which is tested repeatedly can be
+    compared with its previous runs. A device under test (DUT) is identified by the host and port of each API under
+    test, as given by get_dut()
+    """
+    def __init__(self, path):
+        self.path = path
+        with closing(self._connect()) as db, db:
+            db.executescript(SCHEMA)
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA foreign_keys = ON")
+        return db
+
+    def _query(self, query, parameters=()):
+        with closing(self._connect()) as db:
+            return [dict(row) for row in db.execute(query, parameters)]
+
+    def record_run(self, suite, endpoints, results, tool_version=None, config=None, ignored_tests=[]):
+        """Store the TestResults of a run of a test suite, returning the ID of the run. Results with the same name
+        are distinguished by their occurrence, i.e. the number of earlier results with that name in the run.
+        Results carried over from a previous run are flagged, and are not treated as new results by the queries"""
+        occurrences = {}
+        rows = []
+        for result in results:
+            occurrence = occurrences.get(result.name, 0)
+            occurrences[result.name] = occurrence + 1
+            rows.append((result.name, occurrence, str(result.state), result.name in ignored_tests, str(result.detail),
+                         result.elapsed_time, json.dumps(result.metrics) if result.metrics is not None else None,
+                         result.carried_over))
+        with closing(self._connect()) as db, db:
+            run_id = db.execute(
+                "INSERT INTO runs (suite, dut, timestamp, duration, tool_version, endpoints, config) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (suite, get_dut(endpoints), time.time(), sum(result.elapsed_time for result in results),
+                 tool_version, json.dumps(endpoints), json.dumps(redact_config(config), default=str))
+            ).lastrowid
+            db.executemany(
+                "INSERT INTO results "
+                "(run_id, test, occurrence, state, ignored, detail, duration, metrics, carried_over) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run_id,) + row for row in rows]
+            )
+        return run_id
+
+    def get_runs(self, dut=None, suite=None, limit=20):
+        """Get the most recent runs, most recent first, optionally only those of a specific DUT and/or suite"""
+        return self._query("SELECT {}, (SELECT COUNT(*) FROM results WHERE run_id = runs.id) AS tests FROM runs "
+                           "WHERE (:dut IS NULL OR dut = :dut) AND (:suite IS NULL OR suite = :suite) "
+                           "ORDER BY timestamp DESC, id DESC LIMIT :limit".format(RUN_COLUMNS),
+                           {"dut": dut, "suite": suite, "limit": limit})
+
+    def get_run(self, run_id=None, dut=None, suite=None):
+        """Get a run by ID, or otherwise the most recent run, optionally of a specific DUT and/or suite"""
+        if run_id is not None:
+            runs = self._query("SELECT {} FROM runs WHERE id = ?".format(RUN_COLUMNS), (run_id,))
+        else:
+            runs = self._query("SELECT {} FROM runs WHERE (:dut IS NULL OR dut = :dut) "
+                               "AND (:suite IS NULL OR suite = :suite) ORDER BY timestamp DESC, id DESC LIMIT 1"
+                               .format(RUN_COLUMNS), {"dut": dut, "suite": suite})
+        return runs[0] if runs else None
+
+    def get_previous_run(self, run):
+        """Get the run of the same suite against the same DUT which preceded the specified run"""
+        runs = self._query("SELECT {} FROM runs WHERE dut = ? AND suite = ? AND (timestamp, id) < (?, ?) "
+                           "ORDER BY timestamp DESC, id DESC LIMIT 1".format(RUN_COLUMNS),
+                           (run["dut"], run["suite"], run["timestamp"], run["id"]))
+        return runs[0] if runs else None
+
+    def get_changes(self, run_id=None, dut=None, suite=None):
+        """
+        Get the tests whose state differs between a run (by default the most recent) and the preceding run of the
+        same suite against the same DUT, including tests which are only present in one of the two runs.
+        Results which were carried over into the run are not compared
+        """
+        run = self.get_run(run_id, dut, suite)
+        previous = self.get_previous_run(run) if run else None
+        if previous is None:
+            return {"run": run, "previous": None, "changes": []}
+        changes = self._query(
+            "SELECT c.test AS test, c.occurrence AS occurrence, p.state AS previous, c.state AS current "
+            "FROM results c LEFT JOIN results p "
+            "ON p.run_id = :previous AND p.test = c.test AND p.occurrence = c.occurrence "
+            "WHERE c.run_id = :current AND NOT c.carried_over AND (p.state IS NULL OR p.state != c.state) "
+            "UNION ALL "
+            "SELECT p.test, p.occurrence, p.state, NULL FROM results p "
+            "WHERE p.run_id = :previous AND NOT EXISTS (SELECT 1 FROM results c WHERE c.run_id = :current "
+            "AND c.test = p.test AND c.occurrence = p.occurrence) "
+            "ORDER BY test, occurrence",
+            {"current": run["id"], "previous": previous["id"]})
+        return {"run": run, "previous": previous, "changes": changes}
+
+    def get_flaky_tests(self, dut=None, suite=None, window=10, min_changes=2):
+        """
+        Get the tests whose state changed at least 'min_changes' times between consecutive runs, within the most
+        recent 'window' runs of each suite against each DUT, ignoring results which were carried over from a previous
+        run
+        """
+        return self._query(
+            "WITH recent AS ("
+            "  SELECT id, dut, suite, timestamp FROM ("
+            "    SELECT id, dut, suite, timestamp, "
+            "    ROW_NUMBER() OVER (PARTITION BY dut, suite ORDER BY timestamp DESC, id DESC) AS age FROM runs "
+            "    WHERE (:dut IS NULL OR dut = :dut) AND (:suite IS NULL OR suite = :suite)"
+            "  ) WHERE age <= :window"
+            "), history AS ("
+            "  SELECT recent.dut, recent.suite, results.test, results.occurrence, results.state, "
+            "  LAG(results.state) OVER (PARTITION BY recent.dut, recent.suite, results.test, results.occurrence "
+            "                           ORDER BY recent.timestamp, recent.id) AS previous_state "
+            "  FROM recent JOIN results ON results.run_id = recent.id AND NOT results.carried_over"
+            ") "
+            "SELECT dut, suite, test, occurrence, COUNT(*) AS runs, "
+            "SUM(previous_state IS NOT NULL AND state != previous_state) AS changes, "
+            "GROUP_CONCAT(DISTINCT state) AS states FROM history "
+            "GROUP BY dut, suite, test, occurrence HAVING changes >= :min_changes "
+            "ORDER BY changes DESC, dut, suite, test, occurrence",
+            {"dut": dut, "suite": suite, "window": window, "min_changes": min_changes})
+
+    def get_duration_regressions(self, run_id=None, dut=None, suite=None, window=10, ratio=1.5, min_increase=0.5):
+        """
+        Get the tests in a run (by default the most recent) which took at least 'ratio' times, and at least
+        'min_increase' seconds, longer than their mean duration over up to 'window' preceding runs of the same suite
+        against the same DUT, ignoring results which were carried over from a previous run
+        """
+        run = self.get_run(run_id, dut, suite)
+        if run is None:
+            return {"run": None, "regressions": []}
+        regressions = self._query(
+            "WITH baseline AS ("
+            "  SELECT id FROM runs WHERE dut = :dut AND suite = :suite AND (timestamp, id) < (:timestamp, :id) "
+            "  ORDER BY timestamp DESC, id DESC LIMIT :window"
+            ") "
+            "SELECT c.test AS test, c.occurrence AS occurrence, c.duration AS duration, "
+            "AVG(p.duration) AS mean_duration, MAX(p.duration) AS max_duration, COUNT(p.duration) AS runs "
+            "FROM results c JOIN results p ON p.test = c.test AND p.occurrence = c.occurrence AND p.run_id IN baseline "
+            "AND NOT p.carried_over WHERE c.run_id = :id AND NOT c.carried_over GROUP BY c.test, c.occurrence "
+            "HAVING c.duration >= :ratio * mean_duration AND c.duration - mean_duration >= :min_increase "
+            "ORDER BY c.duration - mean_duration DESC",
+            {"id": run["id"], "timestamp": run["timestamp"], "dut": run["dut"], "suite": run["suite"],
+             "window": window, "ratio": ratio, "min_increase": min_increase})
+        return {"run": run, "regressions": regressions}
+
+
+def format_query(query, data):
+    """Format the result of one of the ResultStore queries for the console"""
+    def describe_run(run):
+        return "run {} of {} against {} at {}".format(run["id"], run["suite"], run["dut"],
+                                                      time.strftime("%Y-%m-%d %H:%M:%S",
+                                                                    time.localtime(run["timestamp"])))
+
+    def describe_test(test):
+        # Distinguish the later results of a test which was run more than once in a run
+        return test["test"] if test["occurrence"] == 0 else "{} #{}".format(test["test"], test["occurrence"] + 1)
+
+    lines = []
+    if query == "runs":
+        for run in data:
+            lines.append("{}: {} tests in {:.3f}s, version {}".format(describe_run(run), run["tests"],
+                                                                      run["duration"], run["tool_version"]))
+    elif query == "changes":
+        if data["run"] is None:
+            lines.append("No runs found")
+        elif data["previous"] is None:
+            lines.append("No run preceding {}".format(describe_run(data["run"])))
+        else:
+            lines.append("Changes from {} to {}".format(describe_run(data["previous"]), describe_run(data["run"])))
+            for change in data["changes"]:
+                lines.append("{} ... {} -> {}".format(describe_test(change), change["previous"] or "Not Run",
+                                                      change["current"] or "Not Run"))
+    elif query == "flaky":
+        for test in data:
+            lines.append("{} {} {} ... {} changes in {} runs ({})".format(
+                test["suite"], test["dut"], describe_test(test), test["changes"], test["runs"], test["states"]))
+    elif query == "regressions":
+        if data["run"] is None:
+            lines.append("No runs found")
+        else:
+            lines.append("Duration regressions in {}".format(describe_run(data["run"])))
+            for test in data["regressions"]:
+                lines.append("{} ... {:.3f}s, compared to a mean of {:.3f}s over {} runs"
+                             .format(describe_test(test), test["duration"], test["mean_duration"], test["runs"]))
+    return "\n".join(lines)
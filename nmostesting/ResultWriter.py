@@ -0,0 +1,211 @@
+# Copyright (C) 2021 Advanced Media Workflow Association
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import time
+
+from abc import ABC, abstractmethod
+from xml.sax.saxutils import quoteattr
+
+from .TestResult import TestStates
+
+# States which are reported as skipped rather than as failures or errors in JUnit output
+SKIPPED_STATES = [TestStates.DISABLED, TestStates.UNCLEAR, TestStates.MANUAL, TestStates.NA, TestStates.OPTIONAL]
+
+# Number of characters reserved for the attributes which summarise the results in each JUnit header element
+JUNIT_SUMMARY_WIDTH = 120
+
+
+class ResultWriter(ABC):
+    """
+    Base class for writers which append each TestResult to an output file as soon as it completes, so that the
+    results so far survive a crash or timeout. If 'fsync' is set, each result is also flushed to disk.
+    The results are summarised by finish(), or by close() if the run was not completed
+    """
+    def __init__(self, filename, ignored_tests=[], fsync=False):
+        self.filename = filename
+        self.ignored_tests = ignored_tests
+        self.fsync = fsync
+        self.file = open(filename, "w", encoding="utf-8")
+        self.started = time.time()
+        self.finished = False
+        # Results written so far, with the metrics of each when it was written
+        self.written = []
+
+    def is_ignored(self, result):
+        return result.name in self.ignored_tests
+
+    def start(self, suite, name, endpoints, urls, config):
+        """Called before the tests of a suite are run"""
+        pass
+
+    def write(self, result):
+        """Append a completed TestResult to the output"""
+        if result is None:
+            # Reported when the results are formatted, see _check_test_result()
+            return
+        self.written.append((result, result.metrics))
+        self.write_result(result)
+        self.sync()
+
+    @abstractmethod
+    def write_result(self, result):
+        """Append the output for a TestResult"""
+
+    def finish(self, complete=True):
+        """Append a summary of the results to the output"""
+        if not self.finished:
+            self.finished = True
+            self.write_summary(complete)
+            self.sync()
+
+    @abstractmethod
+    def write_summary(self, complete):
+        """Append the output which summarises the results, which is only called once"""
+
+    def sync(self):
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        """Close the output, summarising the results written so far if the run was not completed"""
+        if not self.file.closed:
+            self.finish(complete=False)
+            self.file.close()
+
+
+class JSONLinesWriter(ResultWriter):
+    """Writes a JSON object per line: a 'start' line, a 'result' line per TestResult and a final 'summary' line"""
+
+    def write_line(self, data):
+        self.file.write(json.dumps(data, sort_keys=True) + "\n")
+
+    def start(self, suite, name, endpoints, urls, config):
+        self.write_line({"type": "start", "suite": suite, "name": name, "timestamp": self.started,
+                         "endpoints": endpoints, "urls": urls, "config": config})
+        self.sync()
+
+    def write_result(self, result):
+        line = {
+            "type": "result",
+            "name": result.name,
+            "state": str(TestStates.DISABLED if self.is_ignored(result) else result.state),
+            "description": result.description,
+            "detail": result.detail,
+            "timestamp": result.timestamp,
+            "duration": result.elapsed_time
+        }
+        if result.metrics is not None:
+            line["metrics"] = result.metrics
+        if result.carried_over:
+            line["carried_over"] = True
+        self.write_line(line)
+
+    def write_summary(self, complete):
+        states = {}
+        for result, metrics in self.written:
+            if result.metrics is not metrics:
+                # Metrics may be attached to a result after it completes, e.g. when the test suite is torn down
+                self.write_line({"type": "metrics", "name": result.name, "metrics": result.metrics})
+            state = str(TestStates.DISABLED if self.is_ignored(result) else result.state)
+            states[state] = states.get(state, 0) + 1
+        self.write_line({"type": "summary", "timestamp": time.time(), "complete": complete,
+                         "tests": len(self.written), "states": states,
+                         "duration": sum(result.elapsed_time for result, _ in self.written)})
+
+
+class JUnitWriter(ResultWriter):
+    """
+    Writes JUnit XML in the same layout as junit_xml's pretty-printed output. Space is reserved in the header
+    elements for the summary attributes, which are overwritten in place once the results are complete. If the
+    process is killed before then, the test cases written so far are kept but the document is left unclosed
+    """
+    def __init__(self, filename, ignored_tests=[], fsync=False):
+        super().__init__(filename, ignored_tests, fsync)
+        self.suite = ""
+        self.name = ""
+        self.header_offset = None
+
+    def header(self):
+        counts = {"disabled": 0, "errors": 0, "failures": 0, "skipped": 0, "tests": len(self.written), "time": 0}
+        for result, _ in self.written:
+            kind = self.result_kind(result)
+            if kind == "failure":
+                counts["failures"] += 1
+            elif kind == "error":
+                counts["errors"] += 1
+            elif kind == "skipped":
+                counts["skipped"] += 1
+            counts["time"] += result.elapsed_time
+
+        def summary(keys):
+            attributes = "".join(' {}="{}"'.format(key, counts[key]) for key in keys)
+            return attributes.ljust(JUNIT_SUMMARY_WIDTH)
+
+        return '<testsuites{}>\n\t<testsuite name={}{}>\n'.format(
+            summary(["disabled", "errors", "failures", "tests", "time"]), quoteattr(self.name),
+            summary(["disabled", "errors", "failures", "skipped", "tests", "time"]))
+
+    def result_kind(self, result):
+        if self.is_ignored(result) or result.state in SKIPPED_STATES:
+            return "skipped"
+        elif result.state in [TestStates.WARNING, TestStates.FAIL]:
+            return "failure"
+        elif result.state != TestStates.PASS:
+            return "error"
+        return None
+
+    def start(self, suite, name, endpoints, urls, config):
+        self.suite = suite
+        self.name = name + ": " + ", ".join(urls)
+        self.file.write('<?xml version="1.0" ?>\n')
+        self.header_offset = self.file.tell()
+        self.file.write(self.header())
+        self.sync()
+
+    def write_result(self, result):
+        attributes = "name={} time={} timestamp={} classname={}".format(
+            quoteattr(result.name), quoteattr("{:.6f}".format(result.elapsed_time)), quoteattr(str(result.timestamp)),
+            quoteattr(self.suite))
+        if result.carried_over:
+            attributes += ' status="carried over"'
+        kind = self.result_kind(result)
+        if kind is None:
+            self.file.write("\t\t<testcase {}/>\n".format(attributes))
+            return
+        if kind == "skipped":
+            info_type = "skipped"
+        else:
+            info_type = str(result.state)
+        self.file.write("\t\t<testcase {}>\n\t\t\t<{} type={} message={}/>\n\t\t</testcase>\n".format(
+            attributes, kind, quoteattr(info_type), quoteattr(str(result.detail))))
+
+    def write_summary(self, complete):
+        if self.header_offset is None:
+            return
+        self.file.write("\t</testsuite>\n</testsuites>\n")
+        self.file.seek(self.header_offset)
+        self.file.write(self.header())
+        self.file.seek(0, os.SEEK_END)
+
+
+def open_result_writer(filename, ignored_tests=[], fsync=False):
+    """Get a streaming writer for an output filename ending '.jsonl' or '.xml'"""
+    if filename.endswith(".jsonl"):
+        return JSONLinesWriter(filename, ignored_tests, fsync)
+    elif filename.endswith(".xml"):
+        return JUnitWriter(filename, ignored_tests, fsync)
+    raise ValueError("No streaming writer for output file '{}'".format(filename))
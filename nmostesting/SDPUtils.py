@@ -0,0 +1,632 @@
+# Copyright (C) 2021 Advanced Media Workflow Association
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+import ipaddress
+from collections import namedtuple, OrderedDict
+from functools import lru_cache
+from math import gcd
+
+# The order in which lines must appear in the session and media descriptions (ref: RFC4566 Section 5)
+# Time descriptions ('t=' followed by any 'r=') may be repeated, so they share a position
+SESSION_LINE_ORDER = ["v", "o", "s", "i", "u", "e", "p", "c", "b", "tr", "z", "k", "a"]
+MEDIA_LINE_ORDER = ["m", "i", "c", "b", "k", "a"]
+
+# Lines which may appear more than once at the same level
+REPEATABLE_LINES = ["e", "p", "b", "t", "r", "a"]
+
+MEDIA_TYPES = ["audio", "video", "text", "application", "message"]
+
+# Encoding names of the ST.2110 media types, which are subject to the ST.2110-10 timing requirements
+ST2110_ENCODINGS = ["raw", "L16", "L24", "AM824", "smpte291"]
+
+# Format-specific parameter values permitted by ST.2110-20
+VIDEO_SAMPLING = ["YCbCr-4:4:4", "YCbCr-4:2:2", "YCbCr-4:2:0", "CLYCbCr-4:4:4", "CLYCbCr-4:2:2", "CLYCbCr-4:2:0",
+                  "ICtCp-4:4:4", "ICtCp-4:2:2", "ICtCp-4:2:0", "RGB", "XYZ", "KEY"]
+VIDEO_DEPTH = ["8", "10", "12", "16", "16f"]
+VIDEO_COLORIMETRY = ["BT601", "BT709", "BT2020", "BT2100", "ST2065-1", "ST2065-3", "UNSPECIFIED", "XYZ"]
+VIDEO_TCS = ["SDR", "PQ", "HLG", "LINEAR", "BT2100LINPQ", "BT2100LINHLG", "ST2065-1", "ST428-1", "DENSITY",
+             "UNSPECIFIED"]
+VIDEO_PM = ["2110GPM", "2110BPM"]
+VIDEO_SSN = ["ST2110-20:2017"]
+VIDEO_REQUIRED = ["sampling", "depth", "width", "height", "exactframerate", "colorimetry", "PM", "SSN"]
+VIDEO_FLAGS = ["interlace", "segmented", "top-field-first"]
+
+# Sender types permitted by ST.2110-21, required when checking traffic shaping
+SHAPING_TP = ["2110TPN", "2110TPNL", "2110TPW"]
+
+# Audio sample rates and packet times permitted by ST.2110-30
+AUDIO_ENCODINGS = ["L16", "L24"]
+AUDIO_RATES = ["44100", "48000", "96000"]
+AUDIO_PTIMES = ["0.125", "0.25", "0.333", "1", "4", "0.12", "0.08", "1.09", "0.09", "0.06"]
+
+# The number of channels in each ST.2110-30 channel grouping
+CHANNEL_GROUPS = {"M": 1, "DM": 2, "ST": 2, "LtRt": 2, "51": 6, "71": 8, "222": 24, "SGRP": 4}
+
+SDPLine = namedtuple("SDPLine", ["number", "type", "value", "ending"])
+RTPMap = namedtuple("RTPMap", ["payload_type", "encoding", "clock_rate", "parameters"])
+SourceFilter = namedtuple("SourceFilter", ["mode", "address_type", "destination", "sources"])
+
+
+class SDPMedia(object):
+    """
+    A single media description within an SDP file. The media, connection, rtpmap, fmtp, source-filter, ts-refclk
+    and mid attributes are parsed once, with connection data, source filters and reference clocks falling back to
+    the session description when not given at media level. Malformed lines are left for check_sdp to report.
+    """
+    def __init__(self, line):
+        self.line = line
+        self.lines = [line]
+        self.media_type = None
+        self.port = None
+        self.proto = None
+        self.formats = []
+        self.connection_address = None
+        self.rtpmaps = OrderedDict()
+        self.fmtps = {}
+        self.source_filter = None
+        self.ts_refclks = []
+        self.mid = None
+
+    def attributes(self, name):
+        """Get the lines and values of the attributes with the given name"""
+        return [(line, value) for line, value in _attributes(self.lines) if _attribute_name(line.value) == name]
+
+    def _parse(self, sdp):
+        match = re.match(r"^(\S+) (\d+)(?:/\d+)? (\S+)((?: \S+)+)$", self.line.value)
+        if match:
+            self.media_type, self.port, self.proto = match.group(1), int(match.group(2)), match.group(3)
+            self.formats = match.group(4).split()
+
+        connections = [line for line in self.lines if line.type == "c"] or \
+            [line for line in sdp.session if line.type == "c"]
+        if len(connections) > 0:
+            connection = re.match(r"^IN IP[46] ([^/ ]+)", connections[0].value)
+            if connection:
+                self.connection_address = connection.group(1)
+
+        for _, value in self.attributes("rtpmap"):
+            rtpmap = re.match(r"^(\d+) ([^/ ]+)/(\d+)(?:/(\S+))?$", value or "")
+            if rtpmap:
+                payload_type = int(rtpmap.group(1))
+                self.rtpmaps[payload_type] = RTPMap(payload_type, rtpmap.group(2), int(rtpmap.group(3)),
+                                                    rtpmap.group(4))
+
+        for _, value in self.attributes("fmtp"):
+            payload_type, params = parse_fmtp(value or "")
+            if payload_type.isdigit():
+                self.fmtps[int(payload_type)] = OrderedDict(params)
+
+        filters = self.attributes("source-filter") or sdp.session_attributes("source-filter")
+        if len(filters) > 0:
+            source_filter = re.match(r"^ ?(incl|excl) IN (IP4|IP6|\*) (\S+) (\S+(?: \S+)*)$", filters[0][1] or "")
+            if source_filter:
+                self.source_filter = SourceFilter(source_filter.group(1), source_filter.group(2),
+                                                  source_filter.group(3), source_filter.group(4).split())
+
+        refclks = self.attributes("ts-refclk") or sdp.session_attributes("ts-refclk")
+        self.ts_refclks = [value for _, value in refclks if value is not None]
+
+        mids = self.attributes("mid")
+        if len(mids) > 0:
+            self.mid = mids[0][1]
+
+    @property
+    def payload_type(self):
+        """The payload type of the last rtpmap attribute, or None if there are none"""
+        return next(reversed(self.rtpmaps), None)
+
+    @property
+    def rtpmap(self):
+        """The rtpmap attribute for the media's payload type, or None"""
+        return self.rtpmaps.get(self.payload_type)
+
+    @property
+    def fmtp(self):
+        """The format-specific parameters for the media's payload type, as an ordered dict of names to values
+        (None for flag parameters such as 'interlace')"""
+        return self.fmtps.get(self.payload_type, OrderedDict())
+
+
+class SDPFile(object):
+    """An SDP file split into its session and media descriptions"""
+    def __init__(self, sdp_text):
+        self.text = sdp_text
+        self.lines = []
+        self.session = []
+        self.media = []
+        for number, raw in enumerate(sdp_text.splitlines(True), start=1):
+            content = raw.rstrip("\r\n")
+            ending = raw[len(content):]
+            if len(content) >= 2 and content[1] == "=":
+                line = SDPLine(number, content[0], content[2:], ending)
+            else:
+                line = SDPLine(number, None, content, ending)
+            self.lines.append(line)
+            if line.type == "m":
+                self.media.append(SDPMedia(line))
+            elif len(self.media) > 0:
+                self.media[-1].lines.append(line)
+            else:
+                self.session.append(line)
+
+        for media in self.media:
+            media._parse(self)
+        self.dup_groups = [value.split()[1:] for _, value in self.session_attributes("group")
+                           if (value or "").startswith("DUP ")]
+
+    def session_attributes(self, name):
+        """Get the lines and values of the session-level attributes with the given name"""
+        return [(line, value) for line, value in _attributes(self.session) if _attribute_name(line.value) == name]
+
+    @property
+    def payload_type(self):
+        """The payload type of the last rtpmap attribute in the file, or None if there are none"""
+        payload_types = [media.payload_type for media in self.media if media.payload_type is not None]
+        return payload_types[-1] if len(payload_types) > 0 else None
+
+    @property
+    def ts_refclks(self):
+        """All the ts-refclk attribute values in the file, in order"""
+        return [value for line, value in _attributes(self.lines)
+                if _attribute_name(line.value) == "ts-refclk" and value is not None]
+
+    @property
+    def transport_media(self):
+        """
+        The media descriptions which correspond to the legs of a Sender's 'transport_params', i.e. those
+        identified by the first DUP group (ref: RFC7104) in order, otherwise just the first media description
+        """
+        if len(self.dup_groups) > 0:
+            return [media for media in self.media if media.mid in self.dup_groups[0]]
+        return self.media[:1]
+
+
+@lru_cache(maxsize=256)
+def parse_sdp(sdp_text):
+    """
+    Parse an SDP file, caching the result so that each distinct file is only parsed once per run.
+    The returned SDPFile is shared between callers and must not be modified.
+    """
+    return SDPFile(sdp_text)
+
+
+def _attribute_name(value):
+    return value.split(":", 1)[0]
+
+
+def _attributes(lines):
+    for line in lines:
+        if line.type == "a":
+            parts = line.value.split(":", 1)
+            yield line, parts[1] if len(parts) > 1 else None
+
+
+def _error(line, message):
+    if line is None:
+        return message
+    return "Line {}: {}".format(line.number, message)
+
+
+def exactframerate(grain_rate):
+    """Format an NMOS grain rate like the SDP video format-specific parameter 'exactframerate'"""
+    d = grain_rate.get("denominator", 1)
+    if d == 1:
+        return "{}".format(grain_rate.get("numerator"))
+    else:
+        return "{}/{}".format(grain_rate.get("numerator"), d)
+
+
+def rtp_ptype(sdp_file):
+    """Extract the payload type from an SDP file string"""
+    return parse_sdp(sdp_file).payload_type
+
+
+def channel_order(channels):
+    """Create an ST.2110-30 'channel-order' format-specific parameter value from an NMOS audio source 'channels'"""
+    # first, straightforward comma-separated channel symbols (or "?" if omitted)
+    symbols = ",".join([_["symbol"] if "symbol" in _ else "?" for _ in channels])
+
+    # second, replace all ST.2110-30 defined groups with their grouping symbol
+    GROUPS = [
+        ["L,R,C,LFE,Lss,Rss,Lrs,Rrs", "71"],
+        ["L,R,C,LFE,Ls,Rs", "51"],
+        ["Lt,Rt", "LtRt"],
+        ["L,R", "ST"],
+        ["M1,M2", "DM"],
+        ["M1", "M"]
+    ]
+    for G in GROUPS:
+        symbols = symbols.replace(G[0], G[1])
+
+    # third, replace all other channel symbols with 'U'
+    groups = ",".join([_ if _ in [G[1] for G in GROUPS] else "U" for _ in symbols.split(",")])
+
+    # finally, replace all sequences of 'U' with the required undefined grouping symbol
+    # and format as per ST.2110-30
+    return "SMPTE2110.({})" \
+           .format(re.sub(r"U(,U)*", lambda us: "U{:02d}".format(int((len(us.group())+1)/2)), groups))
+
+
+def parse_fmtp(value):
+    """Split the value of an 'a=fmtp' attribute into its payload type and an ordered list of (name, value) pairs"""
+    parts = value.split(" ", 1)
+    params = []
+    if len(parts) > 1:
+        for param in parts[1].split(";"):
+            param = param.strip()
+            if param == "":
+                continue
+            components = param.split("=", 1)
+            params.append((components[0], components[1] if len(components) > 1 else None))
+    return parts[0], params
+
+
+def check_sdp(sdp_text, duplicate=False, shaping=True):
+    """
+    Check an SDP file against the requirements of RFC4566 and SMPTE ST.2110 (the rules checked by SDPoker).
+    Returns a list of errors, for requirements which shall be met, and a list of warnings, for whitespace, line
+    endings and requirements which should be met. 'duplicate' checks for ST.2022-7 duplicated streams and 'shaping'
+    checks for ST.2110-21 traffic shaping parameters.
+    """
+    sdp = sdp_text if isinstance(sdp_text, SDPFile) else parse_sdp(sdp_text)
+    errors = []
+    warnings = []
+
+    _check_format(sdp, errors, warnings)
+    _check_session(sdp, errors, warnings)
+    for media in sdp.media:
+        _check_media(sdp, media, errors, warnings, shaping)
+    if duplicate:
+        _check_duplication(sdp, errors)
+
+    return errors, warnings
+
+
+def _check_format(sdp, errors, warnings):
+    """Check the basic syntax of each line, and the line ordering (ref: RFC4566 Section 5)"""
+    if len(sdp.lines) == 0:
+        errors.append("SDP file is empty")
+        return
+    if sdp.lines[0].type != "v" or sdp.lines[0].value != "0":
+        errors.append(_error(sdp.lines[0], "SDP file must start with 'v=0'"))
+
+    other_endings = [line for line in sdp.lines if line.ending != "\r\n"]
+    if other_endings:
+        # Report this once per SDP file, as the line endings are normally the same throughout
+        warnings.append(_error(other_endings[0], "Lines should end with CRLF ({} of {} lines do not)"
+                               .format(len(other_endings), len(sdp.lines))))
+
+    for line in sdp.lines:
+        if line.type is None:
+            if line.value.strip() == "":
+                errors.append(_error(line, "Blank lines are not permitted"))
+            else:
+                errors.append(_error(line, "Line is not of the form '<type>=<value>'"))
+            continue
+        if not re.match(r"^[a-z]$", line.type):
+            errors.append(_error(line, "Line type '{}' must be a single lower case letter".format(line.type)))
+        if line.value != line.value.strip() and line.value != " ":
+            warnings.append(_error(line, "Line has leading or trailing whitespace"))
+
+    descriptions = [(sdp.session, SESSION_LINE_ORDER)] + [(media.lines, MEDIA_LINE_ORDER) for media in sdp.media]
+    for lines, order in descriptions:
+        position = 0
+        seen = set()
+        for line in lines:
+            if line.type is None:
+                continue
+            line_position = next((index for index, types in enumerate(order) if line.type in types), None)
+            if line_position is None:
+                errors.append(_error(line, "Line type '{}' is not permitted here".format(line.type)))
+                continue
+            if line_position < position:
+                errors.append(_error(line, "Line type '{}' is out of order".format(line.type)))
+            elif line.type in seen and line.type not in REPEATABLE_LINES:
+                errors.append(_error(line, "Line type '{}' must not be repeated".format(line.type)))
+            position = max(position, line_position)
+            seen.add(line.type)
+
+
+def _check_connection(line, errors):
+    """Check the format of a connection data ('c=') line (ref: RFC4566 Section 5.7)"""
+    match = re.match(r"^IN (IP4|IP6) ([^/ ]+)((?:/\d+){0,2})$", line.value)
+    if not match:
+        errors.append(_error(line, "Connection data must be of the form 'c=IN <IP4|IP6> <address>[/<ttl>][/<n>]'"))
+        return
+    try:
+        address = ipaddress.ip_address(match.group(2))
+    except ValueError:
+        # Fully qualified domain names are permitted
+        return
+    if (address.version == 4) != (match.group(1) == "IP4"):
+        errors.append(_error(line, "Connection address does not match its address type {}".format(match.group(1))))
+    elif address.version == 4 and address.is_multicast and match.group(3) == "":
+        errors.append(_error(line, "IPv4 multicast connection addresses must include a TTL"))
+    elif address.version == 6 and match.group(3).count("/") > 1:
+        errors.append(_error(line, "IPv6 connection addresses must not include a TTL"))
+
+
+def _check_session(sdp, errors, warnings):
+    """Check the session description (ref: RFC4566 Section 5)"""
+    for line_type in ["v", "o", "s", "t"]:
+        if not any(line.type == line_type for line in sdp.session):
+            errors.append("Session description is missing a '{}=' line".format(line_type))
+
+    for line in sdp.session:
+        if line.type == "o":
+            fields = line.value.split(" ")
+            if len(fields) != 6:
+                errors.append(_error(line, "Origin must have six fields separated by single spaces"))
+            elif not fields[1].isdigit() or not fields[2].isdigit():
+                errors.append(_error(line, "Origin session ID and version must be numeric"))
+            elif fields[3] != "IN" or fields[4] not in ["IP4", "IP6"]:
+                errors.append(_error(line, "Origin network type must be 'IN' and address type 'IP4' or 'IP6'"))
+        elif line.type == "s":
+            if line.value == "":
+                errors.append(_error(line, "Session name must not be empty, use a single space if unnamed"))
+        elif line.type == "t":
+            if not re.match(r"^\d+ \d+$", line.value):
+                errors.append(_error(line, "Timing must be two decimal start and stop times"))
+        elif line.type == "c":
+            _check_connection(line, errors)
+
+    if len(sdp.media) == 0:
+        errors.append("SDP file does not include any media descriptions")
+
+
+def _media_or_session(sdp, media, name):
+    """Get an attribute from the media description, or the session description if not present there"""
+    attributes = media.attributes(name)
+    if len(attributes) == 0:
+        attributes = sdp.session_attributes(name)
+    return attributes
+
+
+def _check_media(sdp, media, errors, warnings, shaping):
+    """Check a media description against RFC4566 and SMPTE ST.2110"""
+    match = re.match(r"^(\S+) (\d+)(?:/(\d+))? (\S+)((?: \S+)+)$", media.line.value)
+    if not match:
+        errors.append(_error(media.line, "Media description must be of the form "
+                                         "'m=<media> <port>[/<number of ports>] <proto> <fmt> ...'"))
+        return
+    media_type, port, proto, formats = match.group(1), int(match.group(2)), match.group(4), match.group(5).split()
+    if media_type not in MEDIA_TYPES:
+        errors.append(_error(media.line, "Media type '{}' is not one of {}".format(media_type, MEDIA_TYPES)))
+    if port > 65535:
+        errors.append(_error(media.line, "Port {} is out of range".format(port)))
+    if proto != "RTP/AVP":
+        errors.append(_error(media.line, "Transport protocol must be 'RTP/AVP' for SMPTE ST.2110"))
+
+    connections = [line for line in media.lines if line.type == "c"]
+    for line in connections:
+        _check_connection(line, errors)
+    if len(connections) == 0 and not any(line.type == "c" for line in sdp.session):
+        errors.append(_error(media.line, "Media description has no connection data at media or session level"))
+
+    rtpmaps = {}
+    for line, value in media.attributes("rtpmap"):
+        rtpmap = re.match(r"^(\d+) ([^/ ]+)/(\d+)(?:/(\S+))?$", value or "")
+        if not rtpmap:
+            errors.append(_error(line, "rtpmap must be of the form "
+                                       "'a=rtpmap:<payload type> <encoding name>/<clock rate>[/<parameters>]'"))
+        elif rtpmap.group(1) not in formats:
+            errors.append(_error(line, "rtpmap payload type {} is not listed in the media description"
+                                       .format(rtpmap.group(1))))
+        else:
+            rtpmaps[rtpmap.group(1)] = (line, rtpmap.group(2), rtpmap.group(3), rtpmap.group(4))
+    for fmt in formats:
+        if not fmt.isdigit() or int(fmt) > 127:
+            errors.append(_error(media.line, "RTP payload type {} must be an integer from 0 to 127".format(fmt)))
+        elif int(fmt) >= 96 and fmt not in rtpmaps:
+            errors.append(_error(media.line, "Dynamic payload type {} has no rtpmap attribute".format(fmt)))
+
+    fmtps = {}
+    for line, value in media.attributes("fmtp"):
+        payload_type, params = parse_fmtp(value or "")
+        if payload_type not in formats:
+            errors.append(_error(line, "fmtp payload type {} is not listed in the media description"
+                                       .format(payload_type)))
+            continue
+        fmtps[payload_type] = (line, params)
+        parameters = (value or "").split(" ", 1)
+        if len(parameters) > 1 and not re.match(r"^[^; ]+(?:=[^; ]*)?(?:; [^; ]+(?:=[^; ]*)?)*;?$", parameters[1]):
+            warnings.append(_error(line, "fmtp parameters should be separated by a semicolon and a single space"))
+
+    encodings = [rtpmap[1] for rtpmap in rtpmaps.values()]
+    if any(encoding in ST2110_ENCODINGS for encoding in encodings):
+        _check_st2110_10(sdp, media, errors, warnings)
+
+    for payload_type, (line, encoding, clock_rate, encoding_params) in rtpmaps.items():
+        fmtp_line, params = fmtps.get(payload_type, (None, []))
+        if encoding == "raw":
+            _check_st2110_20(media, line, clock_rate, fmtp_line, params, errors, warnings, shaping)
+        elif encoding in AUDIO_ENCODINGS:
+            _check_st2110_30(media, line, clock_rate, encoding_params, params, errors, warnings)
+        elif encoding == "smpte291":
+            _check_st2110_40(line, clock_rate, params, errors)
+
+
+def _check_st2110_10(sdp, media, errors, warnings):
+    """Check the timing and connection requirements of SMPTE ST.2110-10"""
+    refclks = _media_or_session(sdp, media, "ts-refclk")
+    if len(refclks) == 0:
+        errors.append(_error(media.line, "ST.2110-10 requires a ts-refclk attribute at media or session level"))
+    for line, value in refclks:
+        if not re.match(r"^(?:ptp=IEEE1588-2008:(?:traceable|(?:[0-9A-F]{2}-){7}[0-9A-F]{2}(?::\d+)?)|"
+                        r"ptp=(?:IEEE1588-2002|IEEE1588-2019|IEEE802\.1AS-2011):\S+|"
+                        r"localmac=(?:[0-9A-F]{2}-){5}[0-9A-F]{2})$", value or ""):
+            errors.append(_error(line, "ts-refclk '{}' is not a permitted PTP or localmac reference clock, "
+                                       "note that hexadecimal digits must be upper case".format(value)))
+
+    mediaclks = _media_or_session(sdp, media, "mediaclk")
+    if len(mediaclks) == 0:
+        errors.append(_error(media.line, "ST.2110-10 requires a mediaclk attribute at media or session level"))
+    for line, value in mediaclks:
+        if not re.match(r"^(?:direct=\d+(?: rate=\d+)?|sender)$", value or ""):
+            errors.append(_error(line, "mediaclk must be 'direct=<offset>[ rate=<rate>]' or 'sender'"))
+
+    connections = [line for line in media.lines if line.type == "c"] or \
+        [line for line in sdp.session if line.type == "c"]
+    multicast = False
+    for line in connections:
+        try:
+            multicast = multicast or ipaddress.ip_address(line.value.split(" ")[-1].split("/")[0]).is_multicast
+        except ValueError:
+            pass
+    filters = _media_or_session(sdp, media, "source-filter")
+    if multicast and len(filters) == 0:
+        warnings.append(_error(media.line, "Multicast media descriptions should include a source-filter attribute"))
+    for line, value in filters:
+        source_filter = re.match(r"^ ?(incl|excl) IN (IP4|IP6|\*) (\S+) (\S+(?: \S+)*)$", value or "")
+        if not source_filter:
+            errors.append(_error(line, "source-filter must be of the form "
+                                       "'a=source-filter: <incl|excl> IN <IP4|IP6> <destination> <sources>'"))
+        elif connections and source_filter.group(3) not in ["*", connections[0].value.split(" ")[-1].split("/")[0]]:
+            errors.append(_error(line, "source-filter destination {} does not match the connection address"
+                                       .format(source_filter.group(3))))
+
+
+def _check_st2110_20(media, line, clock_rate, fmtp_line, params, errors, warnings, shaping):
+    """Check an uncompressed video media description against SMPTE ST.2110-20 and ST.2110-21"""
+    if clock_rate != "90000":
+        errors.append(_error(line, "ST.2110-20 video must use a 90000 Hz clock rate"))
+    if fmtp_line is None:
+        errors.append(_error(line, "ST.2110-20 video requires an fmtp attribute"))
+        return
+
+    values = {}
+    for name, value in params:
+        if name in values:
+            errors.append(_error(fmtp_line, "fmtp parameter '{}' must not be repeated".format(name)))
+        values[name] = value
+        if name in VIDEO_FLAGS and value is not None:
+            errors.append(_error(fmtp_line, "fmtp parameter '{}' must not have a value".format(name)))
+        elif name not in VIDEO_FLAGS and value is None:
+            errors.append(_error(fmtp_line, "fmtp parameter '{}' must have a value".format(name)))
+
+    for name in VIDEO_REQUIRED:
+        if name not in values:
+            errors.append(_error(fmtp_line, "ST.2110-20 video requires the fmtp parameter '{}'".format(name)))
+
+    for name, permitted in [("sampling", VIDEO_SAMPLING), ("depth", VIDEO_DEPTH),
+                            ("colorimetry", VIDEO_COLORIMETRY), ("PM", VIDEO_PM), ("SSN", VIDEO_SSN),
+                            ("TCS", VIDEO_TCS)]:
+        if values.get(name) is not None and values[name] not in permitted:
+            errors.append(_error(fmtp_line, "fmtp parameter {}={} is not one of {}"
+                                            .format(name, values[name], permitted)))
+
+    for name in ["width", "height"]:
+        if values.get(name) is not None:
+            if not values[name].isdigit() or not 1 <= int(values[name]) <= 32767:
+                errors.append(_error(fmtp_line, "fmtp parameter {} must be an integer from 1 to 32767".format(name)))
+
+    if values.get("exactframerate") is not None:
+        rate = re.match(r"^(\d+)(?:/(\d+))?$", values["exactframerate"])
+        if not rate:
+            errors.append(_error(fmtp_line, "fmtp parameter exactframerate must be an integer or a ratio of integers"))
+        elif rate.group(2) is not None:
+            numerator, denominator = int(rate.group(1)), int(rate.group(2))
+            if denominator == 1 or numerator % denominator == 0:
+                errors.append(_error(fmtp_line, "fmtp parameter exactframerate must be an integer where possible"))
+            elif gcd(numerator, denominator) != 1:
+                errors.append(_error(fmtp_line, "fmtp parameter exactframerate must be a ratio in its lowest terms"))
+
+    if ("segmented" in values or "top-field-first" in values) and "interlace" not in values:
+        errors.append(_error(fmtp_line, "fmtp parameters 'segmented' and 'top-field-first' require 'interlace'"))
+    if "TCS" not in values:
+        warnings.append(_error(fmtp_line, "fmtp parameter 'TCS' should be included, otherwise SDR is assumed"))
+
+    if shaping:
+        if "TP" not in values:
+            errors.append(_error(fmtp_line, "ST.2110-21 requires the fmtp parameter 'TP'"))
+        elif values["TP"] not in SHAPING_TP:
+            errors.append(_error(fmtp_line, "fmtp parameter TP={} is not one of {}".format(values["TP"], SHAPING_TP)))
+        for name in ["TROFF", "CMAX"]:
+            if values.get(name) is not None and not values[name].isdigit():
+                errors.append(_error(fmtp_line, "fmtp parameter {} must be an integer".format(name)))
+
+
+def _check_st2110_30(media, line, clock_rate, encoding_params, params, errors, warnings):
+    """Check a PCM audio media description against SMPTE ST.2110-30"""
+    if clock_rate not in AUDIO_RATES:
+        errors.append(_error(line, "ST.2110-30 audio sample rate must be one of {}".format(AUDIO_RATES)))
+    if encoding_params is not None and not encoding_params.isdigit():
+        errors.append(_error(line, "rtpmap number of channels must be an integer"))
+    channels = int(encoding_params) if encoding_params is not None and encoding_params.isdigit() else 1
+
+    ptimes = media.attributes("ptime")
+    if len(ptimes) == 0:
+        errors.append(_error(media.line, "ST.2110-30 audio requires a ptime attribute"))
+    for ptime_line, value in ptimes:
+        if not re.match(r"^\d+(?:\.\d+)?$", value or ""):
+            errors.append(_error(ptime_line, "ptime must be a decimal number of milliseconds"))
+        elif value not in AUDIO_PTIMES:
+            warnings.append(_error(ptime_line, "ptime {} is not one of the packet times defined by ST.2110-30"
+                                               .format(value)))
+
+    for name, value in params:
+        if name == "channel-order":
+            order = re.match(r"^SMPTE2110\.\(([^)]*)\)$", value or "")
+            if not order:
+                errors.append(_error(line, "fmtp parameter channel-order must be of the form 'SMPTE2110.(...)'"))
+                continue
+            count = 0
+            for group in order.group(1).split(","):
+                undefined = re.match(r"^U(\d\d)$", group)
+                if group in CHANNEL_GROUPS:
+                    count += CHANNEL_GROUPS[group]
+                elif undefined and 1 <= int(undefined.group(1)) <= 64:
+                    count += int(undefined.group(1))
+                else:
+                    errors.append(_error(line, "channel-order grouping symbol '{}' is not defined by ST.2110-30"
+                                               .format(group)))
+                    count = None
+                    break
+            if count is not None and count != channels:
+                errors.append(_error(line, "channel-order describes {} channels, but rtpmap has {}"
+                                           .format(count, channels)))
+
+
+def _check_st2110_40(line, clock_rate, params, errors):
+    """Check an ancillary data media description against SMPTE ST.2110-40 and RFC8331"""
+    if clock_rate != "90000":
+        errors.append(_error(line, "ST.2110-40 ancillary data must use a 90000 Hz clock rate"))
+    for name, value in params:
+        if name == "DID_SDID" and not re.match(r"^\{0x[0-9a-fA-F]{1,2},0x[0-9a-fA-F]{1,2}\}$", value or ""):
+            errors.append(_error(line, "fmtp parameter DID_SDID must be of the form '{0xXX,0xXX}'"))
+        elif name == "VPID_Code" and not (value or "").isdigit():
+            errors.append(_error(line, "fmtp parameter VPID_Code must be an integer"))
+
+
+def _check_duplication(sdp, errors):
+    """Check the signalling of ST.2022-7 duplicated streams (ref: RFC7104)"""
+    groups = [(line, value) for line, value in sdp.session_attributes("group") if (value or "").startswith("DUP")]
+    if len(groups) == 0:
+        errors.append("Duplicated streams require a session-level 'a=group:DUP' attribute")
+        return
+    mids = {}
+    for media in sdp.media:
+        for line, value in media.attributes("mid"):
+            mids[value] = media
+    for line, value in groups:
+        tags = value.split()[1:]
+        if len(tags) < 2:
+            errors.append(_error(line, "DUP group must identify at least two media descriptions"))
+        if len(set(tags)) != len(tags):
+            errors.append(_error(line, "DUP group identifies the same media description more than once"))
+        for tag in tags:
+            if tag not in mids:
+                errors.append(_error(line, "DUP group identification tag '{}' does not match any 'a=mid'"
+                                           .format(tag)))
@@ -13,8 +13,14 @@
 # limitations under the License.
 
 import os
+import io
+import hashlib
+import threading
 import ramlfications
 
+from types import MappingProxyType
+from urllib.parse import urlparse
+
 from .Patches import _parse_json
 from .TestHelper import load_resolved_schema
 
@@ -24,14 +30,20 @@ try:
 except AttributeError:
     pass
 
+# RAML patched by Specification._fix_schemas, keyed by a hash of the original file contents
+_fixed_raml = {}
+_fixed_raml_lock = threading.Lock()
+
 
 class Specification(object):
     def __init__(self, file_path):
         self.data = {}
         self.global_schemas = {}
+        # Schemas are only located when the RAML is parsed, and resolved the first time they are requested
+        self.spec_path = os.path.dirname(os.path.dirname(file_path))
+        self.resolved_schemas = {}
 
-        self._fix_schemas(file_path)
-        api_raml = ramlfications.parse(file_path, "config.ini")
+        api_raml = ramlfications.parse(self._fix_schemas(file_path), "config.ini")
 
         self._extract_global_schemas(api_raml)
 
@@ -39,7 +51,7 @@ class Specification(object):
         for resource in api_raml.resources:
             resource_data = {'method': resource.method,
                              'params': resource.uri_params,
-                             'body': self._extract_body_schema(resource, file_path),
+                             'body': self._extract_body_schema(resource),
                              'responses': {}}
 
             # Add a list for the resource path if we don't have one yet
@@ -50,56 +62,73 @@ class Specification(object):
             for response in resource.responses:
                 # Note: Must check we don't overwrite an existing schema here by checking if it is None or not
                 if response.code not in resource_data["responses"] or resource_data["responses"][response.code] is None:
-                    resource_data["responses"][response.code] = self._extract_response_schema(response, file_path)
+                    resource_data["responses"][response.code] = self._extract_response_schema(response)
 
             # Register the collected data in the Specification object
             self.data[resource.path].append(resource_data)
 
+        self._build_indexes()
+
     def _fix_schemas(self, file_path):
-        """Fixes RAML files to match ramlfications expectations (bugs)"""
-        lines = []
-        in_schemas = False
-        type_name = None
+        """
+        Fixes RAML files to match ramlfications expectations (bugs), returning the patched RAML as a stream.
+        The file itself is left untouched, so the same RAML can safely be parsed concurrently.
+        """
         try:
-            with open(file_path) as raml:
-                # Read in a single line of RAML
-                line = raml.readline()
-                while line:
-                    if in_schemas and not line.startswith(" "):
-                        # Detect that we've reached the first line after the schemas/types section
-                        in_schemas = False
-                        type_name = None
-
-                    if in_schemas and "!include" not in line:
-                        # This is a correct RAML 1.0 type definition
-                        type_name = line
-                    elif in_schemas and type_name is not None:
-                        # Make the RAML 1.0 type definition look more like RAML 0.8 to aid parsing
-                        line = "  - " + type_name.strip() + " " + line.replace("type:", "").lstrip()
-                        type_name = None
-                    elif in_schemas and "- " not in line:
-                        # Add a leading dash to type/schema definitions to ensure they can be read by ramlfications
-                        line = "  - " + line.lstrip()
-
-                    if line.startswith("schemas:") or line.startswith("types:"):
-                        # We've hit the global schema/type definition section
-                        in_schemas = True
-
-                    if line.startswith("traits:") or line.startswith("securitySchemes:"):
-                        # Remove traits to work around an issue with ramlfications util.py '_remove_duplicates'
-                        line = "bugfix:\r\n"
-
-                    if type_name is None:
-                        # Assuming we're not in the middle of fixing a RAML 1.0 type def, add the line to the
-                        # output RAML
-                        lines.append(line)
-
-                    # Read the next line of the RAML file
-                    line = raml.readline()
-            with open(file_path, "w") as raml:
-                raml.writelines("".join(lines))
+            with open(file_path, "rb") as raml:
+                contents = raml.read()
         except IOError as e:
             print("Error modifying RAML. Some schemas may not be loaded: {}".format(e))
+            return file_path
+
+        digest = hashlib.sha256(contents).hexdigest()
+        with _fixed_raml_lock:
+            fixed_raml = _fixed_raml.get(digest)
+        if fixed_raml is None:
+            fixed_raml = self._fix_raml_lines(contents.decode("utf-8").replace("\r\n", "\n").splitlines(True))
+            with _fixed_raml_lock:
+                _fixed_raml[digest] = fixed_raml
+
+        stream = io.StringIO(fixed_raml)
+        # ramlfications resolves '!include' paths relative to the name of the stream
+        stream.name = file_path
+        return stream
+
+    def _fix_raml_lines(self, raml_lines):
+        """Fixes the lines of a RAML file to match ramlfications expectations (bugs)"""
+        lines = []
+        in_schemas = False
+        type_name = None
+        for line in raml_lines:
+            if in_schemas and not line.startswith(" "):
+                # Detect that we've reached the first line after the schemas/types section
+                in_schemas = False
+                type_name = None
+
+            if in_schemas and "!include" not in line:
+                # This is a correct RAML 1.0 type definition
+                type_name = line
+            elif in_schemas and type_name is not None:
+                # Make the RAML 1.0 type definition look more like RAML 0.8 to aid parsing
+                line = "  - " + type_name.strip() + " " + line.replace("type:", "").lstrip()
+                type_name = None
+            elif in_schemas and "- " not in line:
+                # Add a leading dash to type/schema definitions to ensure they can be read by ramlfications
+                line = "  - " + line.lstrip()
+
+            if line.startswith("schemas:") or line.startswith("types:"):
+                # We've hit the global schema/type definition section
+                in_schemas = True
+
+            if line.startswith("traits:") or line.startswith("securitySchemes:"):
+                # Remove traits to work around an issue with ramlfications util.py '_remove_duplicates'
+                line = "bugfix:\r\n"
+
+            if type_name is None:
+                # Assuming we're not in the middle of fixing a RAML 1.0 type def, add the line to the
+                # output RAML
+                lines.append(line)
+        return "".join(lines)
 
     def _extract_global_schemas(self, api_raml):
         """Find schemas defined at the top of the RAML file and store them in global_schemas"""
@@ -114,20 +143,18 @@ class Specification(object):
                 keys = list(schema.keys())
                 self.global_schemas[keys[0]] = schema[keys[0]]
 
-    def _extract_body_schema(self, resource, file_path):
-        """Locate the schema for the request body if one exists"""
+    def _extract_body_schema(self, resource):
+        """Locate the unresolved schema for the request body if one exists"""
         body_schema = None
         if resource.body is not None:
             for attr in resource.body:
                 if attr.mime_type == "schema":
-                    apis_path = os.path.dirname(file_path)
-                    spec_path = os.path.dirname(apis_path)
-                    body_schema = load_resolved_schema(spec_path, schema_obj=attr.raw)
+                    body_schema = attr.raw
                     break
         return body_schema
 
-    def _extract_response_schema(self, response, file_path):
-        """Find schemas defined for a given API response and return the schema object"""
+    def _extract_response_schema(self, response):
+        """Find schemas defined for a given API response and return the unresolved schema object"""
         schema_loc = None
         if not response.body:
             # Handle parsing errors in ramlfications manually, notably for schemas in RAML 1.0
@@ -142,50 +169,140 @@ class Specification(object):
                     if "type" in entry.raw:
                         schema_loc = entry.raw["type"]
 
-        apis_path = os.path.dirname(file_path)
-        spec_path = os.path.dirname(apis_path)
         if isinstance(schema_loc, dict):
-            return load_resolved_schema(spec_path, schema_obj=schema_loc)
+            return schema_loc
         elif schema_loc in self.global_schemas and self.global_schemas[schema_loc] is not None:
-            return load_resolved_schema(spec_path, schema_obj=self.global_schemas[schema_loc])
+            return self.global_schemas[schema_loc]
         else:
             return None
 
+    def _build_indexes(self):
+        """Index the parsed method definitions so that lookups don't need to scan them"""
+        method_defs = {}
+        allowed_methods = {}
+        path_tree = self._new_path_node()
+        for path in self.data:
+            allowed_methods[path] = tuple(method_def["method"].upper() for method_def in self.data[path]
+                                          if 405 not in method_def["responses"])
+            for method_def in self.data[path]:
+                # Keep every definition of a method in order, as a lookup falls back to later definitions when an
+                # earlier one has no schema, as the linear search did
+                method_defs.setdefault((path, method_def["method"].upper()), []).append(method_def)
+            self._add_path(path_tree, path)
+
+        self.method_defs = MappingProxyType({key: tuple(defs) for key, defs in method_defs.items()})
+        self.allowed_methods = MappingProxyType(allowed_methods)
+        self.path_tree = path_tree
+        self.reads = self._sorted_resources(['get', 'head', 'options'])
+        self.writes = self._sorted_resources(['post', 'put', 'patch', 'delete'])
+
+    def _sorted_resources(self, methods):
+        """Get all API resources which support any of the given HTTP methods, sorted by path"""
+        resources = []
+        for resource in self.data:
+            for method_def in self.data[resource]:
+                if method_def['method'] in methods:
+                    resources.append((resource, method_def))
+        return tuple(sorted(resources, key=lambda x: x[0]))
+
+    @staticmethod
+    def _new_path_node():
+        return {"literals": {}, "params": [], "path": None}
+
+    def _add_path(self, path_tree, path):
+        """Add a RAML resource path to the tree used to match concrete URL paths"""
+        node = path_tree
+        for segment in [segment for segment in path.split("/") if segment]:
+            if segment.startswith("{") and segment.endswith("}"):
+                param_name = segment[1:-1]
+                for name, child in node["params"]:
+                    if name == param_name:
+                        node = child
+                        break
+                else:
+                    child = self._new_path_node()
+                    node["params"].append((param_name, child))
+                    node = child
+            else:
+                node = node["literals"].setdefault(segment, self._new_path_node())
+        node["path"] = path
+
+    def _match_segments(self, node, segments, params):
+        if len(segments) == 0:
+            return node["path"]
+        segment = segments[0]
+        if segment in node["literals"]:
+            path = self._match_segments(node["literals"][segment], segments[1:], params)
+            if path is not None:
+                return path
+        for name, child in node["params"]:
+            params[name] = segment
+            path = self._match_segments(child, segments[1:], params)
+            if path is not None:
+                return path
+            del params[name]
+        return None
+
+    def match_path(self, url):
+        """
+        Find the RAML resource path which matches a concrete URL or URL path, returning it along with the values
+        of its URI parameters, or (None, None) if there is no match.
+        URLs may be given relative to the API base, or in full including the '/x-nmos/{api}/{version}' prefix.
+        """
+        segments = [segment for segment in urlparse(url).path.split("/") if segment]
+        if "x-nmos" in segments:
+            segments = segments[segments.index("x-nmos") + 3:]
+        params = {}
+        path = self._match_segments(self.path_tree, segments, params)
+        if path is None:
+            return None, None
+        return path, params
+
+    def _resolve_schema(self, key, schema_obj):
+        """Resolve a schema object located when the RAML was parsed, memoising the result"""
+        if key not in self.resolved_schemas:
+            self.resolved_schemas[key] = load_resolved_schema(self.spec_path, schema_obj=schema_obj)
+        return self.resolved_schemas[key]
+
     def get_schema(self, method, path, response_code):
         """Get the response schema for a given method, path and response code if available"""
-        if path in self.data:
-            for response in self.data[path]:
-                if response["method"].upper() == method.upper():
-                    if response["responses"][response_code]:
-                        return response["responses"][response_code]
+        for method_def in self.method_defs.get((path, method.upper()), ()):
+            if method_def["responses"][response_code]:
+                return self._resolve_schema((path, method.upper(), response_code),
+                                            method_def["responses"][response_code])
+        return None
+
+    def get_body_schema(self, method, path):
+        """Get the request body schema for a given method and path if available"""
+        for method_def in self.method_defs.get((path, method.upper()), ()):
+            if method_def["body"]:
+                return self._resolve_schema((path, method.upper(), "body"), method_def["body"])
         return None
 
+    def get_schema_for_url(self, method, url, response_code):
+        """Get the response schema for a given method, concrete URL and response code if available"""
+        path, _ = self.match_path(url)
+        if path is None:
+            return None
+        return self.get_schema(method, path, response_code)
+
+    def resolve_all_schemas(self):
+        """Resolve every schema in the API up front, e.g. before a long run which will use most of them"""
+        for path in self.data:
+            for response in self.data[path]:
+                self.get_body_schema(response["method"], path)
+                for response_code in response["responses"]:
+                    self.get_schema(response["method"], path, response_code)
+
     def get_reads(self):
         """Get all API resources which support read based HTTP methods"""
-        resources = []
-        for resource in self.data:
-            for method_def in self.data[resource]:
-                if method_def['method'] in ['get', 'head', 'options']:
-                    resources.append((resource, method_def))
-        resources = sorted(resources, key=lambda x: x[0])
-        return resources
+        return self.reads
 
     def get_writes(self):
         """Get all API resources which support write based HTTP methods"""
-        resources = []
-        for resource in self.data:
-            for method_def in self.data[resource]:
-                if method_def['method'] in ['post', 'put', 'patch', 'delete']:
-                    resources.append((resource, method_def))
-        resources = sorted(resources, key=lambda x: x[0])
-        return resources
+        return self.writes
 
     def get_methods(self, path):
         """Get all methods which exist for a given path if available"""
-        methods = []
-        if path in self.data:
-            for response in self.data[path]:
-                # Don't return methods which are specified to return Method Not Allowed
-                if 405 not in response['responses']:
-                    methods.append(response['method'].upper())
-        return methods
+        # Don't return methods which are specified to return Method Not Allowed
+        return list(self.allowed_methods.get(path, ()))
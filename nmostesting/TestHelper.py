@@ -23,6 +23,7 @@ import netifaces
 import paho.mqtt.client as mqtt
 from copy import copy
 from pathlib import Path
+from urllib.parse import urlparse, unquote
 from enum import IntEnum
 from numbers import Number
 from functools import cmp_to_key
@@ -196,10 +197,67 @@ def do_request(method, url, **kwargs):
         return False, str(e)
 
 
+def _file_version(uri):
+    """Get a value which changes whenever the local file referred to by a URI is modified"""
+    parsed = urlparse(uri)
+    if parsed.scheme != "file":
+        return None
+    path = unquote(parsed.path)
+    if os.name == "nt":
+        path = path.lstrip("/")
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class CachingJsonLoader(jsonref.JsonLoader):
+    """
+    A jsonref loader which caches the parsed documents it fetches. Local files are reloaded if they have been
+    modified, since the specification repositories in the cache are checked out at different branches during a run.
+    """
+
+    def __init__(self):
+        jsonref.JsonLoader.__init__(self, cache_results=False)
+        self.documents = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, uri, **kwargs):
+        version = _file_version(uri)
+        with self.lock:
+            cached = self.documents.get(uri)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        document = jsonref.JsonLoader.__call__(self, uri, **kwargs)
+        with self.lock:
+            self.documents[uri] = (version, document)
+        return document
+
+
+# Shared by all schema loads in the process, so that documents which are referenced from many schemas
+# (e.g. the core resource schemas) are only read and parsed once
+SCHEMA_LOADER = CachingJsonLoader()
+
+# Resolved schema files, keyed by absolute file path and base URI
+_resolved_schemas = {}
+_resolved_schemas_lock = threading.Lock()
+
+
+def clear_schema_cache():
+    """Discard all cached schemas, e.g. after a specification repository has been checked out at another commit"""
+    with _resolved_schemas_lock:
+        _resolved_schemas.clear()
+    with SCHEMA_LOADER.lock:
+        SCHEMA_LOADER.documents.clear()
+
+
 def load_resolved_schema(spec_path, file_name=None, schema_obj=None, path_prefix=True):
     """
     Parses JSON as well as resolves any `$ref`s, including references to
     local files and remote (HTTP/S) files.
+    Schemas loaded from a file are cached until the file is modified, so callers should copy
+    rather than modify any nested objects of the returned schema.
     """
 
     # Only one of file_name or schema_obj must be set
@@ -215,16 +273,27 @@ def load_resolved_schema(spec_path, file_name=None, schema_obj=None, path_prefix
     else:
         base_uri_path = "file://" + base_path
 
-    loader = jsonref.JsonLoader(cache_results=False)
-
     if file_name:
         json_file = str(Path(base_path) / file_name)
-        with open(json_file, "r") as f:
-            schema = jsonref.load(f, base_uri=base_uri_path, loader=loader, jsonschema=True)
+        key = (json_file, base_uri_path)
+        version = _file_version(Path(json_file).as_uri())
+        with _resolved_schemas_lock:
+            cached = _resolved_schemas.get(key)
+        if cached is not None and cached[0] == version:
+            schema = cached[1]
+        else:
+            with open(json_file, "r") as f:
+                schema = jsonref.load(f, base_uri=base_uri_path, loader=SCHEMA_LOADER, jsonschema=True)
+            with _resolved_schemas_lock:
+                _resolved_schemas[key] = (version, schema)
+        # Callers commonly add to the top level of a schema, which mustn't affect the cached copy
+        if type(schema) is dict:
+            schema = copy(schema)
     elif schema_obj:
         # Work around an exception when there's nothing to resolve using an object
         if has_jsonref(schema_obj):
-            schema = jsonref.JsonRef.replace_refs(schema_obj, base_uri=base_uri_path, loader=loader, jsonschema=True)
+            schema = jsonref.JsonRef.replace_refs(schema_obj, base_uri=base_uri_path, loader=SCHEMA_LOADER,
+                                                  jsonschema=True)
         else:
             schema = schema_obj
 
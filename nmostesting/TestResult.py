@@ -12,8 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import inspect
 import datetime
+import sys
 import time
 
 from enum import Enum
@@ -44,14 +44,28 @@ class TestStates(Enum):
 
 
 class TestResult(object):
+    __slots__ = ["name", "state", "description", "detail", "link", "_timestamp", "elapsed_time", "metrics",
+                 "carried_over"]
+
     def __init__(self, name, state, description, detail, link, timestamp, elapsed_time):
         self.name = name
         self.state = state
         self.description = description
         self.detail = detail
         self.link = link
-        self.timestamp = timestamp
+        # Either a formatted time of day, or a time in seconds since the epoch, which is formatted when first used
+        self._timestamp = timestamp
         self.elapsed_time = elapsed_time
+        # Optional dictionary of measurements, e.g. from benchmarks, included in structured output formats
+        self.metrics = None
+        # Whether the result was carried over from a previous run, rather than from running the test again
+        self.carried_over = False
+
+    @property
+    def timestamp(self):
+        if not isinstance(self._timestamp, str):
+            self._timestamp = datetime.datetime.fromtimestamp(self._timestamp).strftime("%H:%M:%S.%f")[:-3]
+        return self._timestamp
 
     def output(self):
         return [self.name, str(self.state), self.state.css_class, self.description, self.detail, self.link,
@@ -59,58 +73,50 @@ class TestResult(object):
 
 
 class Test(object):
+    __slots__ = ["description", "name", "timer"]
+
     def __init__(self, description, name=None):
         self.description = description
         self.name = name
         if not self.name:
-            # Get name of calling function
-            self.name = inspect.stack()[1][3]
+            # Get name of calling function, without the cost of inspect.stack() reading the source of every frame
+            self.name = sys._getframe(1).f_code.co_name
         self.timer = time.time()
 
-    def _current_time(self):
-        return datetime.datetime.now().strftime("%H:%M:%S.%f")[:-3]
-
-    def _time_elapsed(self):
-        return time.time() - self.timer
+    def _result(self, state, detail, link):
+        now = time.time()
+        return TestResult(self.name, state, self.description, detail, link, now, now - self.timer)
 
     # Pass: Successful test case
     def PASS(self, detail="", link=None):
-        return TestResult(self.name, TestStates.PASS, self.description, detail, link, self._current_time(),
-                          self._time_elapsed())
+        return self._result(TestStates.PASS, detail, link)
 
     # Warning: Not a failure, but the API being tested is responding or configured in a way which is
     # not recommended in most cases
     def WARNING(self, detail="", link=None):
-        return TestResult(self.name, TestStates.WARNING, self.description, detail, link, self._current_time(),
-                          self._time_elapsed())
+        return self._result(TestStates.WARNING, detail, link)
 
     # Manual: Test suite does not currently test this feature, so it must be tested manually
     def MANUAL(self, detail="", link=None):
-        return TestResult(self.name, TestStates.MANUAL, self.description, detail, link, self._current_time(),
-                          self._time_elapsed())
+        return self._result(TestStates.MANUAL, detail, link)
 
     # Not Applicable: Test is not applicable, e.g. due to the version of the specification being tested
     def NA(self, detail, link=None):
-        return TestResult(self.name, TestStates.NA, self.description, detail, link, self._current_time(),
-                          self._time_elapsed())
+        return self._result(TestStates.NA, detail, link)
 
     # Fail: Required feature of the specification has been found to be implemented incorrectly
     def FAIL(self, detail, link=None):
-        return TestResult(self.name, TestStates.FAIL, self.description, detail, link, self._current_time(),
-                          self._time_elapsed())
+        return self._result(TestStates.FAIL, detail, link)
 
     # Optional: Recommended/optional feature of the specifications has been found to be not implemented
     # Detail message should explain the effect of this feature being unimplemented
     def OPTIONAL(self, detail, link=None):
-        return TestResult(self.name, TestStates.OPTIONAL, self.description, detail, link, self._current_time(),
-                          self._time_elapsed())
+        return self._result(TestStates.OPTIONAL, detail, link)
 
     # Disabled: Test is disabled due to test suite configuration; change the config or test manually
     def DISABLED(self, detail="", link=None):
-        return TestResult(self.name, TestStates.DISABLED, self.description, detail, link, self._current_time(),
-                          self._time_elapsed())
+        return self._result(TestStates.DISABLED, detail, link)
 
     # Unclear: Test was not run due to prior responses from the API, which may be OK, or indicate a fault
     def UNCLEAR(self, detail="", link=None):
-        return TestResult(self.name, TestStates.UNCLEAR, self.description, detail, link, self._current_time(),
-                          self._time_elapsed())
+        return self._result(TestStates.UNCLEAR, detail, link)
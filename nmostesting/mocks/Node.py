@@ -17,6 +17,7 @@ import uuid
 from flask import Blueprint, make_response, abort
 from ..Config import ENABLE_HTTPS, DNS_DOMAIN, PORT_BASE, DNS_SD_MODE
 from ..TestHelper import get_default_ip
+from .. import SDPUtils
 
 
 class Node(object):
@@ -57,24 +58,27 @@ NODE = Node(1)
 NODE_API = Blueprint('node_api', __name__)
 
 
+SDP_FILES = {}
+
+
+def get_sdp_file(stream_type):
+    """Load one of the mock Node's SDP files, checking it the first time it is requested"""
+    if stream_type not in SDP_FILES:
+        with open("test_data/IS0401/{}.sdp".format(stream_type)) as f:
+            sdp_file = f.read()
+        errors, _ = SDPUtils.check_sdp(sdp_file)
+        if len(errors) > 0:
+            print(" * WARNING: Mock Node {} SDP file has errors: {}".format(stream_type, "; ".join(errors)))
+        SDP_FILES[stream_type] = sdp_file
+    return SDP_FILES[stream_type]
+
+
 @NODE_API.route('/<stream_type>.sdp', methods=["GET"])
 def node_video_sdp(stream_type):
     # TODO: Should we check for an auth token here? May depend on the URL?
-    response = None
-    if stream_type == "video":
-        with open("test_data/IS0401/video.sdp") as f:
-            response = make_response(f.read())
-    elif stream_type == "audio":
-        with open("test_data/IS0401/audio.sdp") as f:
-            response = make_response(f.read())
-    elif stream_type == "data":
-        with open("test_data/IS0401/data.sdp") as f:
-            response = make_response(f.read())
-    elif stream_type == "mux":
-        with open("test_data/IS0401/mux.sdp") as f:
-            response = make_response(f.read())
-    else:
+    if stream_type not in ["video", "audio", "data", "mux"]:
         abort(404)
 
+    response = make_response(get_sdp_file(stream_type))
     response.headers["Content-Type"] = "application/sdp"
     return response
@@ -0,0 +1,642 @@
+# Copyright (C) 2021 Advanced Media Workflow Association
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import base64
+import hashlib
+import json
+import re
+import select
+import socket
+import struct
+import threading
+import time
+import uuid
+
+from bisect import bisect_right
+from collections import OrderedDict
+from urllib.parse import unquote, urlencode
+from flask import request, abort, Blueprint, Response
+from ..Config import PORT_BASE, ENABLE_HTTPS
+from ..NMOSUtils import NMOSUtils
+from .Registry import REGISTRY_COMMON, query_value
+
+QUERY_RESOURCES = OrderedDict([
+    ("nodes", "node"),
+    ("devices", "device"),
+    ("sources", "source"),
+    ("flows", "flow"),
+    ("senders", "sender"),
+    ("receivers", "receiver")
+])
+
+PAGING_DEFAULT_LIMIT = 100
+PAGING_MAX_LIMIT = 1000
+
+TAI_PATTERN = re.compile(r"^[0-9]+:[0-9]+$")
+NUMBER_PATTERN = re.compile(r"^-?[0-9]+(\.[0-9]+)?([eE][-+]?[0-9]+)?$")
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# Identifies this Query API as the source of the subscription grains
+QUERY_API_ID = str(uuid.uuid4())
+
+
+class QueryError(Exception):
+    def __init__(self, code, message):
+        Exception.__init__(self, message)
+        self.code = code
+
+
+def from_tai(timestamp):
+    """Convert a TAI timestamp string into integer nanoseconds"""
+    if not TAI_PATTERN.match(timestamp):
+        raise QueryError(400, "Invalid timestamp: {}".format(timestamp))
+    secs, nanos = timestamp.split(":")
+    return int(secs) * 1000000000 + int(nanos)
+
+
+def to_tai(timestamp):
+    """Convert integer nanoseconds into a TAI timestamp string"""
+    return "{}:{}".format(timestamp // 1000000000, timestamp % 1000000000)
+
+
+def now_tai():
+    now = time.time_ns()
+    secs, nanos = NMOSUtils.from_UTC(now // 1000000000, now % 1000000000)
+    return secs * 1000000000 + nanos
+
+
+def get_attribute(data, path):
+    """Get a (possibly nested) resource attribute identified by a dot-separated path, or raise KeyError"""
+    for key in path.split("."):
+        if not isinstance(data, dict):
+            raise KeyError(key)
+        data = data[key]
+    return data
+
+
+def match_value(attribute, value):
+    """Match an attribute against a basic query value. Array attributes match if any element does"""
+    if isinstance(attribute, list):
+        return any(query_value(element) == value for element in attribute)
+    return query_value(attribute) == value
+
+
+def parse_rql(expression):
+    """Parse an RQL expression into nested (operator, [arguments]) tuples, with string arguments left as-is"""
+    tokens = re.findall(r"[(),]|[^(),]+", expression)
+    position = 0
+
+    def parse_node():
+        nonlocal position
+        if position >= len(tokens) or tokens[position] in "(),":
+            raise QueryError(400, "Invalid RQL expression: {}".format(expression))
+        name = tokens[position]
+        position += 1
+        if position < len(tokens) and tokens[position] == "(":
+            position += 1
+            args = []
+            while position < len(tokens) and tokens[position] != ")":
+                args.append(parse_node())
+                if position < len(tokens) and tokens[position] == ",":
+                    position += 1
+            if position >= len(tokens):
+                raise QueryError(400, "Invalid RQL expression: {}".format(expression))
+            position += 1
+            return (name, args)
+        return name
+
+    node = parse_node()
+    if position != len(tokens):
+        raise QueryError(400, "Invalid RQL expression: {}".format(expression))
+    return node
+
+
+def rql_value(value):
+    """Convert an RQL argument into a typed value"""
+    if not isinstance(value, str):
+        raise QueryError(400, "Invalid RQL value")
+    value = unquote(value)
+    if value.startswith("string:"):
+        return value[len("string:"):]
+    elif value.startswith("number:"):
+        try:
+            return float(value[len("number:"):])
+        except ValueError:
+            raise QueryError(400, "Invalid RQL number: {}".format(value))
+    elif value in ["true", "false"]:
+        return value == "true"
+    elif value == "null":
+        return None
+    elif NUMBER_PATTERN.match(value):
+        return float(value)
+    return value
+
+
+def rql_compare(attribute, value):
+    """Compare an attribute with an RQL value, returning negative, zero or positive, or None if incomparable"""
+    if isinstance(attribute, bool) or isinstance(value, bool) or attribute is None or value is None:
+        return 0 if attribute == value else None
+    if isinstance(attribute, (int, float)) and isinstance(value, float):
+        return (attribute > value) - (attribute < value)
+    attribute = query_value(attribute)
+    value = query_value(value) if not isinstance(value, float) or not value.is_integer() else str(int(value))
+    return (attribute > value) - (attribute < value)
+
+
+RQL_COMPARISONS = {
+    "eq": lambda result: result == 0,
+    "ne": lambda result: result != 0,
+    "lt": lambda result: result is not None and result < 0,
+    "le": lambda result: result is not None and result <= 0,
+    "gt": lambda result: result is not None and result > 0,
+    "ge": lambda result: result is not None and result >= 0
+}
+
+
+def rql_predicate(node):
+    """Build a function which evaluates a parsed RQL expression against a resource"""
+    if not isinstance(node, tuple):
+        raise QueryError(400, "Invalid RQL expression")
+    operator, args = node
+    if operator in ["and", "or"]:
+        predicates = [rql_predicate(arg) for arg in args]
+        combine = all if operator == "and" else any
+        return lambda data: combine(predicate(data) for predicate in predicates)
+    elif operator == "not" and len(args) == 1:
+        predicate = rql_predicate(args[0])
+        return lambda data: not predicate(data)
+    elif operator in RQL_COMPARISONS and len(args) == 2 and isinstance(args[0], str):
+        path, value, check = unquote(args[0]), rql_value(args[1]), RQL_COMPARISONS[operator]
+
+        def compare(data):
+            try:
+                attribute = get_attribute(data, path)
+            except KeyError:
+                return operator == "ne"
+            if isinstance(attribute, list) and operator == "eq":
+                return any(check(rql_compare(element, value)) for element in attribute)
+            return check(rql_compare(attribute, value))
+        return compare
+    elif operator == "in" and len(args) >= 1 and isinstance(args[0], str):
+        path, values = unquote(args[0]), [rql_value(arg) for arg in args[1:]]
+
+        def contains(data):
+            try:
+                attribute = get_attribute(data, path)
+            except KeyError:
+                return False
+            attributes = attribute if isinstance(attribute, list) else [attribute]
+            return any(rql_compare(element, value) == 0 for element in attributes for value in values)
+        return contains
+    raise QueryError(501, "Unsupported RQL operator: {}".format(operator))
+
+
+class ResourceFilter(object):
+    """A filter built from basic query parameters and an optional 'query.rql' expression"""
+
+    def __init__(self, params):
+        self.basic = {}
+        self.rql = None
+        for key, value in params.items():
+            if key == "query.rql":
+                self.rql = rql_predicate(parse_rql(value))
+            elif key.startswith("query."):
+                raise QueryError(501, "Unsupported query parameter: {}".format(key))
+            elif not key.startswith("paging."):
+                self.basic[key] = value
+
+    def candidates(self, common, resource_type):
+        """Use the basic query indexes to get a set of IDs which includes every match, or None for all resources"""
+        candidates = None
+        for key, value in self.basic.items():
+            if "." in key:
+                continue
+            index = common.get_index(resource_type, key)
+            if index is None:
+                continue
+            ids = index.get(value, set())
+            candidates = set(ids) if candidates is None else candidates & ids
+        return candidates
+
+    def __call__(self, data):
+        if data is None:
+            return False
+        for key, value in self.basic.items():
+            try:
+                if not match_value(get_attribute(data, key), value):
+                    return False
+            except KeyError:
+                return False
+        return self.rql is None or self.rql(data)
+
+
+def get_paged_resources(common, resource_type, args):
+    """
+    Get a page of resources matching the query parameters, newest first.
+    Returns the resources, and the since, until and limit values for the paging headers
+    """
+    order = args.get("paging.order", "update")
+    if order not in ["update", "create"]:
+        raise QueryError(400, "Invalid paging.order: {}".format(order))
+    try:
+        limit = int(args.get("paging.limit", PAGING_DEFAULT_LIMIT))
+    except ValueError:
+        raise QueryError(400, "Invalid paging.limit")
+    if limit < 0:
+        raise QueryError(400, "Invalid paging.limit")
+    limit = min(limit, PAGING_MAX_LIMIT)
+    since = from_tai(args["paging.since"]) if "paging.since" in args else None
+    until = from_tai(args["paging.until"]) if "paging.until" in args else None
+    if since is not None and until is not None and since > until:
+        raise QueryError(400, "paging.since must not be after paging.until")
+
+    resource_filter = ResourceFilter(args)
+    with common.lock:
+        if until is None:
+            until = max(now_tai(), common.last_timestamp)
+        if since is not None and since > until:
+            until = since
+        candidates = resource_filter.candidates(common, resource_type)
+        resources = common.resources.get(resource_type, {})
+        ordered = (common.created if order == "create" else common.updated).get(resource_type, [])
+        lower = bisect_right(ordered, (since, chr(0x10ffff))) if since is not None else 0
+        upper = bisect_right(ordered, (until, chr(0x10ffff)))
+
+        # Find one more match than the limit, to determine whether the page is full
+        matches = []
+        positions = range(lower, upper) if "paging.since" in args else range(upper - 1, lower - 1, -1)
+        for position in positions:
+            timestamp, resource_id = ordered[position]
+            if candidates is not None and resource_id not in candidates:
+                continue
+            if resource_filter(resources[resource_id]):
+                matches.append((timestamp, resources[resource_id]))
+                if len(matches) > limit:
+                    break
+
+    more = len(matches) > limit
+    if "paging.since" in args:
+        # The page begins at 'since', so a full page ends with its newest resource
+        if more:
+            until = matches[limit - 1][0] if limit > 0 else since
+        matches = matches[limit - 1::-1] if limit > 0 else []
+    else:
+        # The page ends at 'until', so a full page begins at the next older match
+        if more:
+            since = matches[limit][0] if limit > 0 else until
+        elif since is None:
+            since = 0
+        matches = matches[:limit]
+    return [data for _, data in matches], since, until, limit
+
+
+def paging_link(rel, since=None, until=None, limit=None):
+    params = [(key, value) for key, value in request.args.items(multi=True) if not key.startswith("paging.")]
+    if since is not None:
+        params.append(("paging.since", to_tai(since)))
+    if until is not None:
+        params.append(("paging.until", to_tai(until)))
+    params.append(("paging.limit", str(limit)))
+    if "paging.order" in request.args:
+        params.append(("paging.order", request.args["paging.order"]))
+    return '<{}?{}>; rel="{}"'.format(request.base_url, urlencode(params, safe=":"), rel)
+
+
+def json_response(data, status=200, headers=None):
+    # Using json.dumps to support older Flask versions http://flask.pocoo.org/docs/1.0/security/#json-security
+    return Response(json.dumps(data), status=status, headers=headers, mimetype='application/json')
+
+
+def error_response(code, message):
+    return json_response({"code": code, "error": message, "debug": None}, code)
+
+
+class QuerySubscriptions(object):
+    """The mock Query API's WebSocket subscriptions, shared between all of the mock registries"""
+
+    def __init__(self, port):
+        self.port = port
+        self.lock = threading.Lock()
+        self.subscriptions = OrderedDict()
+        self.connections = {}
+
+    def find_or_create(self, data, host, version):
+        """Get an existing subscription with the same parameters, or create one. Returns the subscription and
+        whether it was created"""
+        with self.lock:
+            for subscription in self.subscriptions.values():
+                if all(subscription.get(key) == value for key, value in data.items()):
+                    return subscription, False
+            subscription = dict(data)
+            subscription["id"] = str(uuid.uuid4())
+            subscription["ws_href"] = "{}://{}:{}/x-nmos/query/{}/subscriptions/{}".format(
+                "wss" if ENABLE_HTTPS else "ws", host, self.port, version, subscription["id"])
+            self.subscriptions[subscription["id"]] = subscription
+            self.connections[subscription["id"]] = 0
+            return subscription, True
+
+    def get(self, subscription_id):
+        with self.lock:
+            return self.subscriptions.get(subscription_id)
+
+    def list(self):
+        with self.lock:
+            return list(self.subscriptions.values())
+
+    def delete(self, subscription_id):
+        with self.lock:
+            self.connections.pop(subscription_id, None)
+            return self.subscriptions.pop(subscription_id, None)
+
+    def connect(self, subscription_id):
+        with self.lock:
+            if subscription_id not in self.subscriptions:
+                return None
+            self.connections[subscription_id] += 1
+            return self.subscriptions[subscription_id]
+
+    def disconnect(self, subscription_id):
+        with self.lock:
+            if subscription_id not in self.connections:
+                return
+            self.connections[subscription_id] -= 1
+            # Non-persistent subscriptions are removed once their last client disconnects
+            if self.connections[subscription_id] == 0 and not self.subscriptions[subscription_id]["persist"]:
+                self.subscriptions.pop(subscription_id)
+                self.connections.pop(subscription_id)
+
+
+class SubscriptionServer(threading.Thread):
+    """Serves the WebSocket connections for the mock Query API subscriptions, one thread per connection"""
+
+    def __init__(self, common, subscriptions):
+        threading.Thread.__init__(self, daemon=True)
+        self.common = common
+        self.subscriptions = subscriptions
+        self.ssl_context = None
+
+    def start_server(self, ssl_context=None):
+        self.ssl_context = ssl_context
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(("0.0.0.0", self.subscriptions.port))
+        self.listener.listen(128)
+        self.start()
+
+    def run(self):
+        while True:
+            connection, _ = self.listener.accept()
+            threading.Thread(target=self.serve_connection, args=(connection,), daemon=True).start()
+
+    def serve_connection(self, connection):
+        subscription = None
+        try:
+            if self.ssl_context is not None:
+                connection = self.ssl_context.wrap_socket(connection, server_side=True)
+            connection.settimeout(5)
+            subscription = self.handshake(connection)
+            if subscription is not None:
+                self.send_grains(connection, subscription)
+        except (OSError, ValueError):
+            pass
+        finally:
+            if subscription is not None:
+                self.subscriptions.disconnect(subscription["id"])
+            connection.close()
+
+    def handshake(self, connection):
+        """Complete the WebSocket opening handshake, returning the subscription, or None if it doesn't exist"""
+        request_data = b""
+        while b"\r\n\r\n" not in request_data:
+            data = connection.recv(4096)
+            if not data or len(request_data) > 65536:
+                return None
+            request_data += data
+        lines = request_data.split(b"\r\n\r\n")[0].decode("latin-1").split("\r\n")
+        path = lines[0].split(" ")[1].split("?")[0]
+        headers = {name.strip().lower(): value.strip() for name, _, value in
+                   [line.partition(":") for line in lines[1:]]}
+
+        subscription = None
+        match = re.match(r"^/x-nmos/query/[^/]+/subscriptions/([^/]+)/?$", path)
+        if match:
+            subscription = self.subscriptions.connect(match.group(1))
+        if subscription is None or "sec-websocket-key" not in headers:
+            status = "404 Not Found" if subscription is None else "400 Bad Request"
+            connection.sendall("HTTP/1.1 {}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+                               .format(status).encode("latin-1"))
+            if subscription is not None:
+                self.subscriptions.disconnect(subscription["id"])
+            return None
+
+        accept = base64.b64encode(hashlib.sha1((headers["sec-websocket-key"] + WEBSOCKET_GUID)
+                                               .encode("latin-1")).digest()).decode("latin-1")
+        connection.sendall("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                           "Sec-WebSocket-Accept: {}\r\n\r\n".format(accept).encode("latin-1"))
+        return subscription
+
+    def send_frame(self, connection, opcode, payload):
+        length = len(payload)
+        if length < 126:
+            header = struct.pack("!BB", 0x80 | opcode, length)
+        elif length < 65536:
+            header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+        connection.sendall(header + payload)
+
+    def receive_frames(self, connection):
+        """Handle any frames sent by the client, returning False once the connection is closing"""
+        while select.select([connection], [], [], 0)[0] or getattr(connection, "pending", lambda: 0)():
+            header = connection.recv(2)
+            if len(header) < 2:
+                return False
+            opcode, length = header[0] & 0x0f, header[1] & 0x7f
+            if length == 126:
+                length = struct.unpack("!H", connection.recv(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", connection.recv(8))[0]
+            mask = connection.recv(4) if header[1] & 0x80 else b"\x00\x00\x00\x00"
+            payload = b""
+            while len(payload) < length:
+                data = connection.recv(length - len(payload))
+                if not data:
+                    return False
+                payload += data
+            payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+            if opcode == 0x8:
+                self.send_frame(connection, 0x8, payload[:2])
+                return False
+            elif opcode == 0x9:
+                self.send_frame(connection, 0xa, payload)
+        return True
+
+    def make_grain(self, subscription, items):
+        timestamp = to_tai(now_tai())
+        return {
+            "grain_type": "event",
+            "source_id": QUERY_API_ID,
+            "flow_id": subscription["id"],
+            "origin_timestamp": timestamp,
+            "sync_timestamp": timestamp,
+            "creation_timestamp": timestamp,
+            "rate": {"numerator": 0, "denominator": 1},
+            "duration": {"numerator": 0, "denominator": 1},
+            "grain": {
+                "type": "urn:x-nmos:format:data.event",
+                "topic": subscription["resource_path"] + "/",
+                "data": items
+            }
+        }
+
+    def get_sync_items(self, resource_type, resource_filter):
+        with self.common.lock:
+            return [{"path": resource_id, "pre": data, "post": data}
+                    for resource_id, data in self.common.resources.get(resource_type, {}).items()
+                    if resource_filter(data)], self.common.sequence
+
+    def send_grains(self, connection, subscription):
+        """Send a sync grain, followed by grains for each batch of changes to the matching resources"""
+        resource_type = QUERY_RESOURCES[subscription["resource_path"].strip("/")]
+        resource_filter = ResourceFilter(subscription["params"])
+        interval = subscription["max_update_rate_ms"] / 1000.0
+
+        items, sequence = self.get_sync_items(resource_type, resource_filter)
+        self.send_frame(connection, 0x1, json.dumps(self.make_grain(subscription, items)).encode("utf-8"))
+        last_sent = time.time()
+
+        while self.subscriptions.get(subscription["id"]) is not None:
+            if not self.receive_frames(connection):
+                return
+            with self.common.changed:
+                self.common.changed.wait_for(lambda: self.common.sequence != sequence, timeout=1)
+            time.sleep(max(last_sent + interval - time.time(), 0))
+
+            changes, latest = self.common.get_changes(sequence)
+            if changes is None:
+                # The subscription fell too far behind the change feed, so start again from the current state
+                items, sequence = self.get_sync_items(resource_type, resource_filter)
+            else:
+                sequence = latest
+                # Combine multiple changes to the same resource into one event with the first 'pre' and last 'post'
+                events = OrderedDict()
+                for _, change_type, resource_id, pre, post in changes:
+                    if change_type != resource_type:
+                        continue
+                    pre = pre if resource_filter(pre) else None
+                    post = post if resource_filter(post) else None
+                    if resource_id in events:
+                        events[resource_id]["post"] = post
+                    elif pre is not None or post is not None:
+                        events[resource_id] = {"path": resource_id, "pre": pre, "post": post}
+                items = []
+                for event in events.values():
+                    if event["pre"] is None:
+                        del event["pre"]
+                    if event["post"] is None:
+                        del event["post"]
+                    if len(event) > 1:
+                        items.append(event)
+            if items:
+                self.send_frame(connection, 0x1, json.dumps(self.make_grain(subscription, items)).encode("utf-8"))
+                last_sent = time.time()
+
+        # The subscription was deleted
+        self.send_frame(connection, 0x8, struct.pack("!H", 1000))
+
+
+QUERY_SUBSCRIPTIONS = QuerySubscriptions(PORT_BASE + 150)
+SUBSCRIPTION_SERVER = SubscriptionServer(REGISTRY_COMMON, QUERY_SUBSCRIPTIONS)
+QUERY_API = Blueprint('query_api', __name__)
+
+
+@QUERY_API.route('/x-nmos/query/<version>', methods=["GET"], strict_slashes=False)
+def query_base(version):
+    return json_response(["subscriptions/"] + [resource_path + "/" for resource_path in QUERY_RESOURCES])
+
+
+@QUERY_API.route('/x-nmos/query/<version>/<resource_path>', methods=["GET"], strict_slashes=False)
+def query_resources(version, resource_path):
+    if resource_path == "subscriptions":
+        return json_response(QUERY_SUBSCRIPTIONS.list())
+    if resource_path not in QUERY_RESOURCES:
+        abort(404)
+    try:
+        resources, since, until, limit = get_paged_resources(REGISTRY_COMMON, QUERY_RESOURCES[resource_path],
+                                                             request.args)
+    except QueryError as e:
+        return error_response(e.code, str(e))
+    links = [
+        paging_link("first", since=0, limit=limit),
+        paging_link("prev", until=since, limit=limit),
+        paging_link("next", since=until, limit=limit),
+        paging_link("last", limit=limit)
+    ]
+    return json_response(resources, headers={
+        "Link": ", ".join(links),
+        "X-Paging-Limit": str(limit),
+        "X-Paging-Since": to_tai(since),
+        "X-Paging-Until": to_tai(until)
+    })
+
+
+@QUERY_API.route('/x-nmos/query/<version>/<resource_path>/<resource_id>', methods=["GET"], strict_slashes=False)
+def query_resource(version, resource_path, resource_id):
+    if resource_path == "subscriptions":
+        subscription = QUERY_SUBSCRIPTIONS.get(resource_id)
+        if subscription is None:
+            abort(404)
+        return json_response(subscription)
+    if resource_path not in QUERY_RESOURCES:
+        abort(404)
+    with REGISTRY_COMMON.lock:
+        data = REGISTRY_COMMON.resources.get(QUERY_RESOURCES[resource_path], {}).get(resource_id)
+    if data is None:
+        abort(404)
+    return json_response(data)
+
+
+@QUERY_API.route('/x-nmos/query/<version>/subscriptions', methods=["POST"])
+def post_subscription(version):
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get("params", {}), dict) or \
+            data.get("resource_path", "").strip("/") not in QUERY_RESOURCES:
+        return error_response(400, "Invalid subscription request")
+    try:
+        ResourceFilter(data.get("params", {}))
+    except QueryError as e:
+        return error_response(e.code, str(e))
+    data = {
+        "max_update_rate_ms": data.get("max_update_rate_ms", 100),
+        "persist": data.get("persist", False),
+        "secure": data.get("secure", ENABLE_HTTPS),
+        "resource_path": "/" + data["resource_path"].strip("/"),
+        "params": data.get("params", {}),
+        "authorization": data.get("authorization", False)
+    }
+    subscription, created = QUERY_SUBSCRIPTIONS.find_or_create(data, request.host.rsplit(":", 1)[0], version)
+    location = "/x-nmos/query/{}/subscriptions/{}".format(version, subscription["id"])
+    return json_response(subscription, 201 if created else 200, headers={"Location": location})
+
+
+@QUERY_API.route('/x-nmos/query/<version>/subscriptions/<subscription_id>', methods=["DELETE"])
+def delete_subscription(version, subscription_id):
+    subscription = QUERY_SUBSCRIPTIONS.get(subscription_id)
+    if subscription is None:
+        abort(404)
+    if not subscription["persist"]:
+        return error_response(403, "Non-persistent subscriptions cannot be deleted")
+    QUERY_SUBSCRIPTIONS.delete(subscription_id)
+    return "", 204
@@ -17,18 +17,147 @@ import flask
 import json
 import re
 
+from bisect import bisect_left
+from collections import deque
 from flask import request, jsonify, abort, Blueprint, Response
-from threading import Event
+from threading import Condition, Event, RLock
 from ..Config import PORT_BASE, AUTH_TOKEN_PUBKEY, ENABLE_AUTH, AUTH_TOKEN_ISSUER
+from ..NMOSUtils import NMOSUtils
 from authlib.jose import jwt
 
+# Number of resource changes retained for Query API WebSocket subscriptions which are catching up
+CHANGE_FEED_LENGTH = 100000
+
+
+def query_value(value):
+    """Convert a resource attribute value to the string form used to match basic query parameters"""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    elif value is None:
+        return "null"
+    return str(value)
+
+
+def index_values(value):
+    """Get the basic query index keys for a resource attribute value. Array attributes are indexed by each element,
+    as a basic query matches them if any element does"""
+    if isinstance(value, list):
+        return set(query_value(element) for element in value)
+    return [query_value(value)]
+
 
 class RegistryCommon(object):
+    """
+    The resources registered with any of the mock registries.
+    Resources are kept in order of their creation and update timestamps, and changes are recorded in a feed, so that
+    the mock Query API can serve paged queries and WebSocket subscriptions without scanning every resource
+    """
     def __init__(self):
+        self.lock = RLock()
+        self.changed = Condition(self.lock)
         self.reset()
 
     def reset(self):
-        self.resources = {"node": {}}
+        with self.lock:
+            self.resources = {"node": {}}
+            # Creation and update timestamps for each resource, as integer nanoseconds since the TAI epoch
+            self.timestamps = {}
+            # Lists of (timestamp, id) for each resource type, in creation and update order
+            self.created = {}
+            self.updated = {}
+            # Basic query indexes, built on first use, keyed by resource type and attribute,
+            # which map each attribute value to the set of resource IDs with that value
+            self.indexes = {}
+            self.last_timestamp = 0
+            # Recent changes as (sequence number, resource type, id, pre, post)
+            self.changes = deque(maxlen=CHANGE_FEED_LENGTH)
+            self.sequence = 0
+            self.changed.notify_all()
+
+    def next_timestamp(self):
+        """Get a TAI timestamp for a change, distinct from and later than any previous one"""
+        now = time.time_ns()
+        secs, nanos = NMOSUtils.from_UTC(now // 1000000000, now % 1000000000)
+        self.last_timestamp = max(secs * 1000000000 + nanos, self.last_timestamp + 1)
+        return self.last_timestamp
+
+    def _index_add(self, resource_type, resource_id, data):
+        for key, index in self.indexes.get(resource_type, {}).items():
+            for value in index_values(data.get(key)):
+                index.setdefault(value, set()).add(resource_id)
+
+    def _index_remove(self, resource_type, resource_id, data):
+        for key, index in self.indexes.get(resource_type, {}).items():
+            for value in index_values(data.get(key)):
+                ids = index.get(value)
+                if ids is not None:
+                    ids.discard(resource_id)
+
+    def _record_change(self, resource_type, resource_id, pre, post):
+        self.sequence += 1
+        self.changes.append((self.sequence, resource_type, resource_id, pre, post))
+        self.changed.notify_all()
+
+    def put(self, resource_type, data):
+        """Create or update a resource, returning its update timestamp"""
+        with self.lock:
+            resources = self.resources.setdefault(resource_type, {})
+            created = self.created.setdefault(resource_type, [])
+            updated = self.updated.setdefault(resource_type, [])
+            resource_id = data["id"]
+            timestamp = self.next_timestamp()
+            pre = resources.get(resource_id)
+            if pre is None:
+                created.append((timestamp, resource_id))
+                created_timestamp = timestamp
+            else:
+                created_timestamp, updated_timestamp = self.timestamps[(resource_type, resource_id)]
+                del updated[bisect_left(updated, (updated_timestamp, resource_id))]
+                self._index_remove(resource_type, resource_id, pre)
+            # Timestamps always increase, so appending keeps the list in order
+            updated.append((timestamp, resource_id))
+            self.timestamps[(resource_type, resource_id)] = (created_timestamp, timestamp)
+            resources[resource_id] = data
+            self._index_add(resource_type, resource_id, data)
+            self._record_change(resource_type, resource_id, pre, data)
+            return timestamp
+
+    def remove(self, resource_type, resource_id):
+        """Remove a resource, if it exists"""
+        with self.lock:
+            pre = self.resources.get(resource_type, {}).pop(resource_id, None)
+            if pre is None:
+                return
+            created_timestamp, updated_timestamp = self.timestamps.pop((resource_type, resource_id))
+            created = self.created[resource_type]
+            del created[bisect_left(created, (created_timestamp, resource_id))]
+            updated = self.updated[resource_type]
+            del updated[bisect_left(updated, (updated_timestamp, resource_id))]
+            self._index_remove(resource_type, resource_id, pre)
+            self._record_change(resource_type, resource_id, pre, None)
+
+    def get_index(self, resource_type, key):
+        """Get the basic query index for a top-level resource attribute, building it if necessary"""
+        with self.lock:
+            indexes = self.indexes.setdefault(resource_type, {})
+            if key not in indexes:
+                index = {}
+                for resource_id, data in self.resources.get(resource_type, {}).items():
+                    for value in index_values(data.get(key)):
+                        index.setdefault(value, set()).add(resource_id)
+                indexes[key] = index
+            return indexes[key]
+
+    def get_changes(self, sequence):
+        """
+        Get the changes made after the given sequence number, and the sequence number of the latest change.
+        Returns None for the changes if some have already been discarded from the feed
+        """
+        with self.lock:
+            if sequence > self.sequence or len(self.changes) > 0 and self.changes[0][0] > sequence + 1:
+                return None, self.sequence
+            start = len(self.changes) - (self.sequence - sequence)
+            return [self.changes[i] for i in range(max(start, 0), len(self.changes))], self.sequence
 
 
 class RegistryData(object):
@@ -74,7 +203,8 @@ class Registry(object):
                 if payload["data"]["id"] in self.auth_clients and self.auth_clients[payload["data"]["id"]] != client_id:
                     raise BCP00302Exception
                 self.auth_clients[payload["data"]["id"]] = client_id
-                self.common.resources[payload["type"]][payload["data"]["id"]] = payload["data"]
+                return self.common.put(payload["type"], payload["data"])
+        return None
 
     def delete(self, headers, payload, version, resource_type, resource_id):
         self.last_time = time.time()
@@ -85,7 +215,7 @@ class Registry(object):
             client_id = self._get_client_id(headers)
             if resource_id in self.auth_clients and self.auth_clients[resource_id] != client_id:
                 raise BCP00302Exception
-            self.common.resources[resource_type].pop(resource_id, None)
+            self.common.remove(resource_type, resource_id)
 
     def heartbeat(self, headers, payload, version, node_id):
         self.last_hb_time = time.time()
@@ -211,15 +341,19 @@ def post_resource(version):
     else:
         registered = True
     try:
-        registry.add(request.headers, request.json, version)
+        timestamp = registry.add(request.headers, request.json, version)
     except BCP00302Exception:
         abort(403)
     location = "/x-nmos/registration/{}/resource/{}/{}".format(version, request.json["type"],
                                                                request.json["data"]["id"])
+    headers = {"Location": location}
+    if timestamp is not None:
+        # Debugging header which allows the IS-04 Registry tests to check pagination precisely
+        headers["X-Paging-Timestamp"] = "{}:{}".format(timestamp // 1000000000, timestamp % 1000000000)
     if registered:
-        return jsonify(request.json["data"]), 200, {"Location": location}
+        return jsonify(request.json["data"]), 200, headers
     else:
-        return jsonify(request.json["data"]), 201, {"Location": location}
+        return jsonify(request.json["data"]), 201, headers
 
 
 @REGISTRY_API.route('/x-nmos/registration/<version>/resource/<resource_type>/<resource_id>', methods=["DELETE"])
@@ -0,0 +1,351 @@
+# Copyright (C) 2021 Advanced Media Workflow Association
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from .. import Config as CONFIG
+from ..NMOSUtils import NMOSUtils
+from ..TestHelper import do_request, get_default_ip
+from .Node import get_sdp_file
+
+SWARM_API_VERSION = "v1.3"
+
+# The order in which each virtual Node's resources are registered, so that parents always precede their children
+RESOURCE_TYPES = ["node", "device", "source", "flow", "sender", "receiver"]
+
+NODE_API_RESOURCES = {
+    "devices": "device",
+    "sources": "source",
+    "flows": "flow",
+    "senders": "sender",
+    "receivers": "receiver"
+}
+
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed"
+}
+
+
+def load_templates(host):
+    """Load the resource data shared by every virtual Node, removing anything which the swarm doesn't serve"""
+    templates = {}
+    for resource_type in RESOURCE_TYPES:
+        with open("test_data/IS0402/v1.3_{}.json".format(resource_type)) as resource_data:
+            templates[resource_type] = json.load(resource_data)
+    templates["node"]["services"] = []
+    templates["node"]["api"]["versions"] = [SWARM_API_VERSION]
+    templates["device"]["controls"] = []
+    for resource_type in RESOURCE_TYPES:
+        templates[resource_type]["tags"] = {}
+        templates[resource_type]["description"] = "Swarm {}".format(resource_type.capitalize())
+    templates["host"] = host
+    return templates
+
+
+class VirtualNode(object):
+    """
+    A lightweight virtual Node, holding only what differs between Nodes.
+    Its resources are generated from the shared templates when requested
+    """
+    __slots__ = ("index", "port", "ids", "version", "registered", "last_heartbeat")
+
+    def __init__(self, index, port):
+        self.index = index
+        self.port = port
+        # The UUIDs of the Node's resources, in RESOURCE_TYPES order, packed into a single bytes object
+        self.ids = b"".join(uuid.uuid4().bytes for _ in RESOURCE_TYPES)
+        self.version = NMOSUtils.get_TAI_time()
+        self.registered = False
+        self.last_heartbeat = None
+
+    def get_id(self, resource_type):
+        offset = RESOURCE_TYPES.index(resource_type) * 16
+        return str(uuid.UUID(bytes=self.ids[offset:offset + 16]))
+
+    def get_resource(self, resource_type, templates):
+        data = dict(templates[resource_type])
+        data["id"] = self.get_id(resource_type)
+        data["version"] = self.version
+        data["label"] = "Swarm {} {}".format(resource_type.capitalize(), self.index)
+        href = "http://{}:{}/".format(templates["host"], self.port)
+        if resource_type == "node":
+            data["href"] = href
+            data["hostname"] = "nmos-swarm-{}".format(self.index)
+            data["api"] = dict(data["api"], endpoints=[{
+                "host": templates["host"],
+                "port": self.port,
+                "protocol": "http",
+                "authorization": False
+            }])
+        elif resource_type == "device":
+            data["node_id"] = self.get_id("node")
+            data["senders"] = [self.get_id("sender")]
+            data["receivers"] = [self.get_id("receiver")]
+        else:
+            data["device_id"] = self.get_id("device")
+        if resource_type == "flow":
+            data["source_id"] = self.get_id("source")
+        elif resource_type == "sender":
+            data["flow_id"] = self.get_id("flow")
+            data["manifest_href"] = href + "video.sdp"
+        return data
+
+
+class SwarmStatistics(object):
+    """Counters for the registration and heartbeat activity of a swarm"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.registration_latencies = []
+        self.registration_errors = 0
+        self.reregistrations = 0
+        self.heartbeats = 0
+        self.heartbeat_failures = 0
+        self.heartbeat_late = 0
+        self.node_api_requests = 0
+
+    def get_counters(self):
+        with self.lock:
+            latencies = sorted(self.registration_latencies)
+            counters = {
+                "registered": len(latencies),
+                "registration_errors": self.registration_errors,
+                "reregistrations": self.reregistrations,
+                "heartbeats": self.heartbeats,
+                "heartbeat_misses": self.heartbeat_failures + self.heartbeat_late,
+                "heartbeat_failures": self.heartbeat_failures,
+                "heartbeat_late": self.heartbeat_late,
+                "node_api_requests": self.node_api_requests
+            }
+        for name, percent in [("p50", 0.5), ("p99", 0.99)]:
+            latency = latencies[min(int(percent * len(latencies)), len(latencies) - 1)] if latencies else None
+            counters["registration_latency_{}_ms".format(name)] = round(latency * 1000, 1) if latencies else None
+        return counters
+
+
+class Swarm(object):
+    """
+    Simulates many virtual Nodes in one process.
+    Every Node's API is served from a shared asyncio event loop, one port per Node, while the Nodes register and
+    heartbeat with a Registration API on jittered schedules
+    """
+    def __init__(self, reg_url, count, port_base, host=None, jitter=0.1, workers=50):
+        self.reg_url = reg_url if reg_url.endswith("/") else reg_url + "/"
+        self.jitter = jitter
+        self.templates = load_templates(host or get_default_ip())
+        self.nodes = [VirtualNode(index, port_base + index) for index in range(count)]
+        self.statistics = SwarmStatistics()
+        # Registration API requests are made with the blocking TestHelper.do_request, so use a bounded pool for them
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.loop = None
+        self.stopping = None
+        # The open Node API connections, and the tasks serving them
+        self.connections = {}
+        self.thread = None
+        self.started = threading.Event()
+        self.error = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        self.started.wait()
+        if self.error is not None:
+            self.executor.shutdown()
+            raise self.error
+
+    def stop(self):
+        """Stop heartbeating, and remove the virtual Nodes from the registry"""
+        if self.thread is not None and self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.stopping.set)
+            self.thread.join()
+        self.executor.shutdown()
+
+    def get_counters(self):
+        return self.statistics.get_counters()
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.stopping = asyncio.Event()
+        try:
+            self.loop.run_until_complete(self._serve())
+        finally:
+            self.loop.close()
+
+    async def _serve(self):
+        servers = []
+        try:
+            for node in self.nodes:
+                servers.append(await asyncio.start_server(
+                    lambda reader, writer, node=node: self._serve_node_api(node, reader, writer), port=node.port))
+        except OSError as e:
+            # Most likely a port is in use, or the process has too few file descriptors for the number of Nodes
+            self.error = e
+            for server in servers:
+                server.close()
+            return
+        finally:
+            self.started.set()
+
+        tasks = [self.loop.create_task(self._run_node(node)) for node in self.nodes]
+        await self.stopping.wait()
+
+        for server in servers:
+            server.close()
+        for task in tasks:
+            task.cancel()
+        for writer in self.connections.values():
+            writer.close()
+        await asyncio.gather(*tasks, *self.connections, return_exceptions=True)
+        await asyncio.gather(*[self._request("DELETE", "resource/nodes/" + node.get_id("node"))
+                               for node in self.nodes if node.last_heartbeat is not None])
+
+    async def _request(self, method, path, **kwargs):
+        return await self.loop.run_in_executor(
+            self.executor, lambda: do_request(method, self.reg_url + path, **kwargs))
+
+    async def _register(self, node):
+        start = time.time()
+        for resource_type in RESOURCE_TYPES:
+            valid, r = await self._request("POST", "resource", json={
+                "type": resource_type,
+                "data": node.get_resource(resource_type, self.templates)
+            })
+            if not valid or r.status_code not in [200, 201]:
+                with self.statistics.lock:
+                    self.statistics.registration_errors += 1
+                return
+            if resource_type == "node":
+                # Registering the Node resets the registry's garbage collection timer, as a heartbeat would
+                node.last_heartbeat = start
+        with self.statistics.lock:
+            self.statistics.registration_latencies.append(time.time() - start)
+        node.registered = True
+
+    async def _heartbeat(self, node):
+        start = time.time()
+        valid, r = await self._request("POST", "health/nodes/" + node.get_id("node"))
+        with self.statistics.lock:
+            self.statistics.heartbeats += 1
+            if start - node.last_heartbeat > CONFIG.HEARTBEAT_INTERVAL:
+                self.statistics.heartbeat_late += 1
+            if not valid or r.status_code != 200:
+                self.statistics.heartbeat_failures += 1
+        if valid and r.status_code == 404:
+            # The registry has garbage collected the Node, so register it again
+            node.registered = False
+            with self.statistics.lock:
+                self.statistics.reregistrations += 1
+        node.last_heartbeat = start
+
+    async def _run_node(self, node):
+        # Spread the initial registrations, and then each heartbeat, so that the Nodes don't act in lockstep
+        await asyncio.sleep(random.uniform(0, CONFIG.HEARTBEAT_INTERVAL))
+        while True:
+            if node.registered:
+                await self._heartbeat(node)
+            else:
+                await self._register(node)
+            if node.last_heartbeat is None:
+                due = time.time() + CONFIG.HEARTBEAT_INTERVAL
+            else:
+                due = node.last_heartbeat + CONFIG.HEARTBEAT_INTERVAL * random.uniform(1 - self.jitter, 1)
+            await asyncio.sleep(max(due - time.time(), 0))
+
+    def _get_node_api_response(self, node, method, path):
+        """Get the status code, content type and body for a request to a virtual Node's API"""
+        if method not in ["GET", "HEAD"]:
+            return 405, "application/json", {"code": 405, "error": "Method not allowed", "debug": None}
+
+        segments = [segment for segment in urlparse(path).path.split("/") if segment]
+        if segments == ["video.sdp"]:
+            return 200, "application/sdp", get_sdp_file("video")
+        elif segments == []:
+            return 200, "application/json", ["x-nmos/"]
+        elif segments == ["x-nmos"]:
+            return 200, "application/json", ["node/"]
+        elif segments == ["x-nmos", "node"]:
+            return 200, "application/json", [SWARM_API_VERSION + "/"]
+        elif segments[:3] == ["x-nmos", "node", SWARM_API_VERSION]:
+            segments = segments[3:]
+            if segments == []:
+                return 200, "application/json", ["self/"] + [_ + "/" for _ in NODE_API_RESOURCES]
+            elif segments == ["self"]:
+                return 200, "application/json", node.get_resource("node", self.templates)
+            elif segments[0] in NODE_API_RESOURCES:
+                resource_type = NODE_API_RESOURCES[segments[0]]
+                if len(segments) == 1:
+                    return 200, "application/json", [node.get_resource(resource_type, self.templates)]
+                elif len(segments) == 2 and segments[1] == node.get_id(resource_type):
+                    return 200, "application/json", node.get_resource(resource_type, self.templates)
+        return 404, "application/json", {"code": 404, "error": "Not found", "debug": None}
+
+    async def _serve_node_api(self, node, reader, writer):
+        """Serve a minimal HTTP/1.1 implementation of the read-only parts of a virtual Node's API"""
+        connection = asyncio.current_task()
+        self.connections[connection] = writer
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in [b"\r\n", b"\n", b""]:
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if int(headers.get("content-length", 0)) > 0:
+                    await reader.readexactly(int(headers["content-length"]))
+
+                try:
+                    method, path, http_version = request_line.decode("latin-1").split()
+                except ValueError:
+                    method, http_version = None, "HTTP/1.0"
+                    status, content_type = 400, "application/json"
+                    body = {"code": 400, "error": "Bad request", "debug": None}
+                else:
+                    status, content_type, body = self._get_node_api_response(node, method, path)
+                with self.statistics.lock:
+                    self.statistics.node_api_requests += 1
+
+                if not isinstance(body, str):
+                    body = json.dumps(body)
+                body = body.encode("utf-8")
+                keep_alive = http_version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                writer.write("HTTP/1.1 {} {}\r\nContent-Type: {}\r\nContent-Length: {}\r\n"
+                             "Access-Control-Allow-Origin: *\r\nConnection: {}\r\n\r\n"
+                             .format(status, HTTP_REASONS[status], content_type, len(body),
+                                     "keep-alive" if keep_alive else "close").encode("latin-1"))
+                if method != "HEAD":
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self.connections.pop(connection, None)
+            writer.close()
@@ -17,15 +17,51 @@ import subprocess
 from requests.compat import json
 import ssl
 import socket
+import hashlib
 import ipaddress
 
-from ..GenericTest import GenericTest, NMOSTestException, NMOSInitException
+from ..GenericTest import GenericTest, NMOSTestException, NMOSInitException, get_test_names, select_tests
 from .. import Config as CONFIG
 
 SECURE_API_KEY = "secure"
 TMPFILE = "tls-report.json"
 
 
+def test_ssl_args(*args):
+    """Decorator to declare the testssl.sh arguments required by a test, so that the scans can be planned before the
+    tests are run"""
+    def decorator(func):
+        func.test_ssl_args = list(args)
+        return func
+    return decorator
+
+
+class TLSReport(object):
+    """The findings of a testssl.sh JSON report, indexed by finding ID"""
+    def __init__(self, findings):
+        self.findings = findings
+        self.index = {}
+        for position, finding in enumerate(findings):
+            # IDs may be qualified when there are multiple certificates, e.g. 'cert_commonName <cert#1>'
+            self.index.setdefault(finding["id"].split()[0], []).append((position, finding))
+
+    def __iter__(self):
+        return iter(self.findings)
+
+    def find(self, *finding_ids, prefix=False):
+        """Get the findings with any of the given IDs, in the order in which they appear in the report.
+        If 'prefix' is set, get the findings whose IDs start with any of the given IDs, e.g. 'cipher-tls1_2_'"""
+        matches = []
+        for finding_id in finding_ids:
+            if prefix:
+                for indexed_id, indexed in self.index.items():
+                    if indexed_id.startswith(finding_id):
+                        matches += indexed
+            else:
+                matches += self.index.get(finding_id, [])
+        return [finding for _, finding in sorted(matches, key=lambda match: match[0])]
+
+
 class BCP00301Test(GenericTest):
     """
     Runs BCP-003-01-Test
@@ -36,47 +72,115 @@ class BCP00301Test(GenericTest):
             raise NMOSInitException("BCP-003-01 can only be tested when ENABLE_HTTPS is set to True in UserConfig.py")
         self.authorization = False  # Don't send tokens in every request
         self.report_json = {}
-
-    def perform_test_ssl(self, test, args=None):
-        if os.path.exists(TMPFILE):
-            os.remove(TMPFILE)
-        if args is None:
-            args = []
+        self.planned_scans = []
+
+    def execute_tests(self, test_names):
+        """Plan the testssl.sh scans required by the selected tests before running them"""
+        test_names = select_tests(type(self), test_names)
+        self.plan_test_ssl(test_names)
+        GenericTest.execute_tests(self, test_names)
+
+    def plan_test_ssl(self, test_names):
+        """Collect the testssl.sh arguments needed by the given tests into as few scans as configured"""
+        arg_sets = []
+        for test_name in test_names:
+            for name in get_test_names(type(self)):
+                args = getattr(getattr(self, name), "test_ssl_args", None)
+                if test_name in ["all", name] and args is not None and args not in arg_sets:
+                    arg_sets.append(args)
+        arg_sets = [args for args in arg_sets if " ".join(args) not in self.report_json]
+
+        # Share the argument sets between the scans, each of which pays testssl.sh's start-up cost only once
+        num_scans = min(max(CONFIG.TEST_SSL_CONCURRENT_SCANS, 1), len(arg_sets))
+        self.planned_scans = [arg_sets[index::num_scans] for index in range(num_scans)]
+
+    def perform_test_ssl(self, test):
+        """Get the testssl.sh report for the arguments declared by the test being run via test_ssl_args"""
+        args = getattr(self, test.name).test_ssl_args
         arg_key = " ".join(args)
-        if arg_key in self.report_json:
-            return self.report_json[arg_key]
-        else:
-            try:
-                ret = subprocess.run([CONFIG.TEST_SSL_BASH,
-                                      "testssl/testssl.sh",
-                                      "--jsonfile",
-                                      TMPFILE,
-                                      "--warnings",
-                                      "off",
-                                      "--openssl-timeout",
-                                      str(CONFIG.HTTP_TIMEOUT),
-                                      "--add-ca",
-                                      CONFIG.CERT_TRUST_ROOT_CA
-                                      ] + args + ["{}:{}".format(self.apis[SECURE_API_KEY]["hostname"],
-                                                                 self.apis[SECURE_API_KEY]["port"])]
-                                     )
-                if ret.returncode == 0:
-                    with open(TMPFILE) as tls_data:
-                        self.report_json[arg_key] = json.load(tls_data)
-                    return self.report_json[arg_key]
-            except Exception as e:
-                raise NMOSTestException(test.DISABLED("Unable to execute testssl.sh. Please see the README for "
-                                                      "installation instructions: {}".format(e)))
-        return None
+        if arg_key not in self.report_json:
+            scans = self.planned_scans
+            self.planned_scans = []
+            if not any(args in scan for scan in scans):
+                scans.append([args])
+            self.run_test_ssl_scans(test, scans)
+        return self.report_json.get(arg_key)
+
+    def run_test_ssl_scans(self, test, scans):
+        """Run testssl.sh scans concurrently, each combining one or more sets of arguments"""
+        host = self.apis[SECURE_API_KEY]["hostname"]
+        port = self.apis[SECURE_API_KEY]["port"]
+        cache_file = None
+        if CONFIG.TEST_SSL_REPORT_CACHE:
+            cache_file = self.get_test_ssl_cache_file(host, port)
+            if cache_file and os.path.exists(cache_file):
+                with open(cache_file) as cache_data:
+                    cached = json.load(cache_data)
+                for arg_key, findings in cached.items():
+                    self.report_json.setdefault(arg_key, TLSReport(findings))
+                scans = [[args for args in scan if " ".join(args) not in self.report_json] for scan in scans]
+                scans = [scan for scan in scans if len(scan) > 0]
+
+        processes = []
+        try:
+            for index, scan in enumerate(scans):
+                report_file = TMPFILE if index == 0 else "tls-report-{}.json".format(index)
+                if os.path.exists(report_file):
+                    os.remove(report_file)
+                scan_args = [arg for args in scan for arg in args]
+                process = subprocess.Popen([CONFIG.TEST_SSL_BASH,
+                                            "testssl/testssl.sh",
+                                            "--jsonfile",
+                                            report_file,
+                                            "--warnings",
+                                            "off",
+                                            "--openssl-timeout",
+                                            str(CONFIG.HTTP_TIMEOUT),
+                                            "--add-ca",
+                                            CONFIG.CERT_TRUST_ROOT_CA
+                                            ] + scan_args + ["{}:{}".format(host, port)])
+                processes.append((scan, report_file, process))
+            for scan, report_file, process in processes:
+                if process.wait() == 0:
+                    with open(report_file) as tls_data:
+                        report = TLSReport(json.load(tls_data))
+                    for args in scan:
+                        self.report_json[" ".join(args)] = report
+        except Exception as e:
+            for _, _, process in processes:
+                process.kill()
+            raise NMOSTestException(test.DISABLED("Unable to execute testssl.sh. Please see the README for "
+                                                  "installation instructions: {}".format(e)))
+
+        if cache_file and len(processes) > 0:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            with open(cache_file, "w") as cache_data:
+                json.dump({arg_key: report.findings for arg_key, report in self.report_json.items()}, cache_data)
+
+    def get_test_ssl_cache_file(self, host, port):
+        """Get the path of the stored testssl.sh reports for the certificate currently presented by the server"""
+        try:
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            with socket.create_connection((host, port), timeout=CONFIG.HTTP_TIMEOUT) as raw_sock:
+                with context.wrap_socket(raw_sock, server_hostname=host) as sock:
+                    certificate = sock.getpeercert(binary_form=True)
+        except Exception as e:
+            print(" * Unable to fetch the server certificate, not using stored testssl.sh reports: {}".format(e))
+            return None
+        fingerprint = hashlib.sha256(certificate).hexdigest()
+        return os.path.join(CONFIG.CACHE_PATH, "testssl", "{}_{}_{}.json".format(host, port, fingerprint))
 
+    @test_ssl_args("-p")
     def test_01(self, test):
         """TLS Protocols"""
 
-        tls_data = self.perform_test_ssl(test, ["-p"])
+        tls_data = self.perform_test_ssl(test)
         if tls_data is None:
             return test.DISABLED("Unable to test. See the console for further information.")
         else:
-            for report in tls_data:
+            for report in tls_data.find("SSLv2", "SSLv3", "TLS1", "TLS1_1", "TLS1_2", "TLS1_3"):
                 if report["id"] in ["SSLv2", "SSLv3", "TLS1", "TLS1_1"] and "not offered" not in report["finding"]:
                     return test.FAIL("Protocol {} must not be offered".format(report["id"].replace("_", ".")))
                 elif report["id"] in ["TLS1_2"] and not report["finding"].startswith("offered"):
@@ -88,10 +192,11 @@ class BCP00301Test(GenericTest):
                                          .format(self.apis[SECURE_API_KEY]["spec_branch"]))
             return test.PASS()
 
+    @test_ssl_args("-E")
     def test_02(self, test):
         """TLS Ciphers"""
 
-        tls_data = self.perform_test_ssl(test, ["-E"])
+        tls_data = self.perform_test_ssl(test)
         if tls_data is None:
             return test.DISABLED("Unable to test. See the console for further information.")
         else:
@@ -111,14 +216,15 @@ class BCP00301Test(GenericTest):
             tls1_3_shall = ["TLS_AES_128_GCM_SHA256"]
             tls1_3_should = ["TLS_AES_256_GCM_SHA384",
                              "TLS_CHACHA20_POLY1305_SHA256"]
-            for report in tls_data:
-                if report["finding"].startswith("TLS 1.2"):
+            # Each cipher offered for each protocol is reported with an ID such as 'cipher-tls1_2_xc02f'
+            for report in tls_data.find("cipher-tls1_2_", "cipher-tls1_3_", prefix=True):
+                if report["id"].startswith("cipher-tls1_2_"):
                     cipher = report["finding"].split()[-1]
                     if cipher in tls1_2_shall:
                         tls1_2_shall.remove(cipher)
                     elif cipher in tls1_2_should:
                         tls1_2_should.remove(cipher)
-                elif report["finding"].startswith("TLS 1.3"):
+                else:
                     tls1_3_supported = True
                     cipher = report["finding"].split()[-1]
                     if cipher in tls1_3_shall:
@@ -146,15 +252,16 @@ class BCP00301Test(GenericTest):
             else:
                 return test.PASS()
 
+    @test_ssl_args("-S")
     def test_03(self, test):
         """Certificate does not use IP addresses in CN/SANs"""
 
-        tls_data = self.perform_test_ssl(test, ["-S"])
+        tls_data = self.perform_test_ssl(test)
         if tls_data is None:
             return test.DISABLED("Unable to test. See the console for further information.")
         else:
             common_name = None
-            for report in tls_data:
+            for report in tls_data.find("cert_commonName", "cert_subjectAltName"):
                 if report["id"].split()[0] == "cert_commonName":
                     common_name = report["finding"]
                     try:
@@ -197,15 +304,16 @@ class BCP00301Test(GenericTest):
 
             return test.PASS()
 
+    @test_ssl_args("-h")
     def test_04(self, test):
         """HSTS Header"""
 
-        tls_data = self.perform_test_ssl(test, ["-h"])
+        tls_data = self.perform_test_ssl(test)
         if tls_data is None:
             return test.DISABLED("Unable to test. See the console for further information.")
         else:
             hsts_supported = False
-            for report in tls_data:
+            for report in tls_data.find("HSTS_time"):
                 if report["id"] == "HSTS_time":
                     if report["severity"] == "OK":
                         hsts_supported = True
@@ -221,29 +329,31 @@ class BCP00301Test(GenericTest):
             else:
                 return test.FAIL("Error in HSTS header: {}".format(hsts_supported))
 
+    @test_ssl_args("-S")
     def test_05(self, test):
         """Certificate revocation method is available"""
 
-        tls_data = self.perform_test_ssl(test, ["-S"])
+        tls_data = self.perform_test_ssl(test)
         if tls_data is None:
             return test.DISABLED("Unable to test. See the console for further information.")
         else:
-            for report in tls_data:
+            for report in tls_data.find("cert_revocation"):
                 if report["id"].split()[0] == "cert_revocation":
                     if report["severity"] == "HIGH":
                         return test.FAIL("No certificate revocation method was provided by the server")
 
             return test.PASS()
 
+    @test_ssl_args("-S")
     def test_06(self, test):
         """OCSP Stapling"""
 
-        tls_data = self.perform_test_ssl(test, ["-S"])
+        tls_data = self.perform_test_ssl(test)
         if tls_data is None:
             return test.DISABLED("Unable to test. See the console for further information.")
         else:
             ocsp_found = False
-            for report in tls_data:
+            for report in tls_data.find("OCSP_stapling", "cert_ocspURL"):
                 if report["id"].split()[0] == "OCSP_stapling":
                     if report["finding"] == "not offered":
                         return test.OPTIONAL("OCSP stapling is not offered by this server",
@@ -277,16 +387,17 @@ class BCP00301Test(GenericTest):
         except Exception as e:
             return test.FAIL(str(e))
 
+    @test_ssl_args("-S")
     def test_08(self, test):
         """Server exposes both an RSA and ECDSA certificate"""
 
-        tls_data = self.perform_test_ssl(test, ["-S"])
+        tls_data = self.perform_test_ssl(test)
         if tls_data is None:
             return test.DISABLED("Unable to test. See the console for further information.")
         else:
             rsa_found = False
             ecdsa_found = False
-            for report in tls_data:
+            for report in tls_data.find("cert_keySize"):
                 if report["id"].split()[0] == "cert_keySize":
                     if report["finding"].startswith("RSA"):
                         rsa_found = True
@@ -302,14 +413,15 @@ class BCP00301Test(GenericTest):
 
             return test.PASS()
 
+    @test_ssl_args("-S")
     def test_09(self, test):
         """Server exposes a valid chain of trust including a certificate and intermediate"""
 
-        tls_data = self.perform_test_ssl(test, ["-S"])
+        tls_data = self.perform_test_ssl(test)
         if tls_data is None:
             return test.DISABLED("Unable to test. See the console for further information.")
         else:
-            for report in tls_data:
+            for report in tls_data.find("cert_chain_of_trust"):
                 if report["id"].split()[0] == "cert_chain_of_trust":
                     if report["severity"] != "OK":
                         return test.FAIL("One or more certificates have an incomplete chain of trust")
@@ -23,11 +23,12 @@ from urllib.parse import urlparse
 from dnslib import QTYPE
 from copy import deepcopy
 from pathlib import Path
-from zeroconf_monkey import ServiceBrowser, ServiceInfo, Zeroconf
+from zeroconf_monkey import ServiceInfo
 
 from .. import Config as CONFIG
-from ..MdnsListener import MdnsListener
-from ..GenericTest import GenericTest, NMOSTestException, NMOS_WIKI_URL
+from ..MdnsListener import service_at
+from ..MdnsManager import MDNS_MANAGER
+from ..GenericTest import GenericTest, NMOSTestException, NMOS_WIKI_URL, test_tags
 from ..IS04Utils import IS04Utils
 from ..TestHelper import get_default_ip, load_resolved_schema
 
@@ -59,11 +60,13 @@ class IS0401Test(GenericTest):
         self.is04_utils = IS04Utils(self.node_url)
         self.zc = None
         self.zc_listener = None
+        self.dns_start_time = None
 
     def set_up_tests(self):
-        self.zc = Zeroconf()
-        self.zc_listener = MdnsListener(self.zc)
+        self.zc = MDNS_MANAGER.open()
+        self.zc_listener = MDNS_MANAGER.get_listener()
         if self.dns_server:
+            self.dns_start_time = time.time()
             self.dns_server.load_zone(self.apis[NODE_API_KEY]["version"], self.protocol, self.authorization,
                                       "test_data/IS0401/dns_records.zone", CONFIG.PORT_BASE+100)
             print(" * Waiting for up to {} seconds for a DNS query before executing tests"
@@ -74,16 +77,22 @@ class IS0401Test(GenericTest):
                     "_nmos-register._tcp.{}.".format(CONFIG.DNS_DOMAIN),
                     "_nmos-registration._tcp.{}.".format(CONFIG.DNS_DOMAIN)
                 ],
-                CONFIG.DNS_SD_ADVERT_TIMEOUT
+                CONFIG.DNS_SD_ADVERT_TIMEOUT,
+                since=self.dns_start_time
             )
             # Wait for a short time to allow the device to react after performing the query
             time.sleep(CONFIG.API_PROCESSING_TIMEOUT)
+        if not CONFIG.ENABLE_DNS_SD and CONFIG.ENABLE_MOCK_QUERY_API:
+            # The Node is expected to be configured to register with the primary mock registry
+            self.primary_registry.enable()
 
     def tear_down_tests(self):
         if self.zc:
             self.zc.close()
             self.zc = None
         if self.dns_server:
+            # Attach a summary of the DNS queries made by each client during the tests to the unicast DNS-SD test
+            self.attach_dns_metrics(self.dns_server, "test_02", self.dns_start_time)
             self.dns_server.reset()
 
     def _registry_mdns_info(self, port, priority=0, api_ver=None, api_proto=None, api_auth=None, ip=None):
@@ -133,6 +142,7 @@ class IS0401Test(GenericTest):
 
         if not CONFIG.ENABLE_DNS_SD:
             self.do_node_basics_prereqs()
+            self.registry_basics_done = True
             return
 
         if CONFIG.DNS_SD_MODE == "multicast":
@@ -260,6 +270,7 @@ class IS0401Test(GenericTest):
         else:
             self.registry_primary_data = self.registry_basics_data[0]
 
+    @test_tags("dns-sd")
     def test_01(self, test):
         """Node can discover network registration service via multicast DNS"""
 
@@ -275,6 +286,7 @@ class IS0401Test(GenericTest):
 
         return test.FAIL("Node did not attempt to register with the advertised registry.")
 
+    @test_tags("dns-sd")
     def test_01_01(self, test):
         """Node does not attempt to register with an unsuitable registry"""
 
@@ -293,6 +305,7 @@ class IS0401Test(GenericTest):
 
         return test.PASS()
 
+    @test_tags("dns-sd")
     def test_02(self, test):
         """Node can discover network registration service via unicast DNS"""
 
@@ -308,6 +321,7 @@ class IS0401Test(GenericTest):
 
         return test.FAIL("Node did not attempt to register with the advertised registry.")
 
+    @test_tags("dns-sd")
     def test_02_01(self, test):
         """Node does not attempt to register with an unsuitable registry"""
 
@@ -403,11 +417,16 @@ class IS0401Test(GenericTest):
                 if resource[1]["payload"]["type"] == res_type and resource[1]["payload"]["data"]["id"] == res_id:
                     found_resource = resource[1]["payload"]["data"]
         else:
-            # Look up data from a configured Query API
+            # Look up data from a configured Query API, or the one served by the primary mock registry
+            query_api_host = CONFIG.QUERY_API_HOST
+            query_api_port = CONFIG.QUERY_API_PORT
+            if CONFIG.ENABLE_MOCK_QUERY_API:
+                query_api_host = get_default_ip()
+                query_api_port = self.primary_registry.get_data().port
             url = "{}://{}:{}/x-nmos/query/{}/{}s/{}".format(
                 self.protocol,
-                CONFIG.QUERY_API_HOST,
-                str(CONFIG.QUERY_API_PORT),
+                query_api_host,
+                str(query_api_port),
                 self.apis[NODE_API_KEY]["version"],
                 res_type,
                 res_id
@@ -421,8 +440,8 @@ class IS0401Test(GenericTest):
                     raise Exception
             except Exception:
                 print(" * ERROR: Unable to load resource from the configured Query API ({}:{})".format(
-                    CONFIG.QUERY_API_HOST,
-                    CONFIG.QUERY_API_PORT
+                    query_api_host,
+                    query_api_port
                 ))
         return found_resource
 
@@ -701,6 +720,7 @@ class IS0401Test(GenericTest):
 
         return self.do_test_referential_integrity(test, "receiver")
 
+    @test_tags("dns-sd")
     def test_12(self, test):
         """Node advertises a Node type mDNS announcement with no ver_* TXT records
         in the presence of a Registration API (v1.0, v1.1 and v1.2)"""
@@ -753,6 +773,7 @@ class IS0401Test(GenericTest):
                             "operation.".format(api["ip"], api["port"]),
                             NMOS_WIKI_URL + "/IS-04#nodes-peer-to-peer-mode")
 
+    @test_tags("dns-sd")
     def test_12_01(self, test):
         """Node does not advertise a Node type mDNS announcement in the presence of a Registration API (v1.3+)"""
 
@@ -890,6 +911,7 @@ class IS0401Test(GenericTest):
 
         return test.UNCLEAR("Node API does not expose any RTP Receivers")
 
+    @test_tags("dns-sd")
     def test_15(self, test):
         """Node correctly selects a Registration API based on advertised priorities"""
 
@@ -918,6 +940,7 @@ class IS0401Test(GenericTest):
 
         return test.PASS()
 
+    @test_tags("dns-sd")
     def test_16(self, test):
         """Node correctly fails over between advertised Registration APIs when one fails"""
 
@@ -940,6 +963,7 @@ class IS0401Test(GenericTest):
 
         return test.PASS()
 
+    @test_tags("dns-sd")
     def test_16_01(self, test):
         """Node correctly handles Registration APIs whose connections time out"""
 
@@ -1377,6 +1401,7 @@ class IS0401Test(GenericTest):
 
         return test.PASS()
 
+    @test_tags("dns-sd", "slow")
     def test_21(self, test):
         """Node correctly interprets a 200 code from a registry upon initial registration"""
 
@@ -2011,6 +2036,8 @@ class IS0401Test(GenericTest):
         self.primary_registry.reset()
         self.primary_registry.enable()
 
+        # The Node's advert may be updated once it registers, so ignore adverts resolved before then
+        advert_time = time.time()
         if CONFIG.DNS_SD_MODE == "multicast":
             # Advertise a registry at pri 0 and allow the Node to do a basic registration
             self.zc.register_service(registry_info)
@@ -2018,9 +2045,12 @@ class IS0401Test(GenericTest):
         # Wait for n seconds after advertising the service for the first POST from a Node
         self.primary_registry.wait_for_registration(CONFIG.DNS_SD_ADVERT_TIMEOUT)
 
-        ServiceBrowser(self.zc, "_nmos-node._tcp.local.", self.zc_listener)
-        time.sleep(CONFIG.DNS_SD_BROWSE_TIMEOUT)
-        node_list = self.zc_listener.get_service_list()
+        service_type = "_nmos-node._tcp.local."
+        self.zc.browse(service_type)
+        api = self.apis[NODE_API_KEY]
+        self.zc_listener.wait_for_service(service_type, service_at(api["ip"], api["port"]),
+                                          CONFIG.DNS_SD_BROWSE_TIMEOUT, since=advert_time)
+        node_list = self.zc_listener.get_service_list(service_type)
 
         # Withdraw the registry advertisement now we've performed a browse for Node advertisements
         if CONFIG.DNS_SD_MODE == "multicast":
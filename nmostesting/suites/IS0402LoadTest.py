@@ -0,0 +1,607 @@
+# Copyright (C) 2021 Advanced Media Workflow Association
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import random
+import selectors
+import threading
+import time
+import tracemalloc
+import uuid
+import websocket
+from requests.compat import json
+from concurrent.futures import ThreadPoolExecutor
+
+from .. import Config as CONFIG
+from ..GenericTest import GenericTest, NMOSTestException, NMOSInitException, test_tags
+from ..IS04Utils import IS04Utils
+from ..IS0402Resources import IS0402Resources
+
+REG_API_KEY = "registration"
+QUERY_API_KEY = "query"
+
+# The order in which each virtual Node's resources are registered, so that parents always precede their children
+RESOURCE_TYPES = ["node", "device", "source", "flow", "sender", "receiver"]
+
+# The query parameter used to subscribe to a subset of each type of resource, alongside 'label'
+FILTER_KEYS = {
+    "node": "hostname",
+    "device": "node_id",
+    "source": "device_id",
+    "flow": "source_id",
+    "sender": "device_id",
+    "receiver": "device_id"
+}
+
+# The description given to resources when they are updated, identifying each update in the subscription grains
+UPDATE_DESCRIPTION = "Load Test Update {}"
+
+
+def percentile(sorted_values, percent):
+    """Get the nearest-rank percentile of a sorted list of values"""
+    if len(sorted_values) == 0:
+        return None
+    rank = int(math.ceil(percent / 100.0 * len(sorted_values)))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+def summarise_requests(latencies, errors, elapsed):
+    """Summarise the latencies (in seconds) of a set of requests made over the given elapsed time"""
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "duration": round(elapsed, 3),
+        "throughput": round(len(latencies) / elapsed, 1) if elapsed > 0 else None,
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        "latency_p99_ms": round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+        "latency_max_ms": round(latencies[-1] * 1000, 1) if latencies else None
+    }
+
+
+def describe_summary(summary):
+    """Describe a summary from summarise_requests for use in a test result detail"""
+    if summary["throughput"] is None or summary["latency_p50_ms"] is None:
+        return "{} requests, {} errors".format(summary["requests"], summary["errors"])
+    return "{} requests ({} errors) at {} per second, latency p50 {}ms, p99 {}ms" \
+           .format(summary["requests"], summary["errors"], summary["throughput"], summary["latency_p50_ms"],
+                   summary["latency_p99_ms"])
+
+
+class HeartbeatWorker(threading.Thread):
+    """Heartbeats for a set of Nodes every HEARTBEAT_INTERVAL, recording the latency of each request"""
+
+    def __init__(self, reg_url, do_request, max_workers):
+        threading.Thread.__init__(self, daemon=True)
+        self.reg_url = reg_url
+        self.do_request = do_request
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.node_ids = []
+        self.last_heartbeat = {}
+        self.latencies = []
+        self.errors = 0
+        self.overruns = 0
+
+    def add_node(self, node_id):
+        with self.lock:
+            self.node_ids.append(node_id)
+            self.last_heartbeat[node_id] = time.time()
+
+    def remove_nodes(self, node_ids):
+        """Stop heartbeating for the given Nodes, returning the time of each one's last successful heartbeat"""
+        with self.lock:
+            self.node_ids = [_ for _ in self.node_ids if _ not in node_ids]
+            return {node_id: self.last_heartbeat[node_id] for node_id in node_ids}
+
+    def reset_statistics(self):
+        with self.lock:
+            self.latencies = []
+            self.errors = 0
+            self.overruns = 0
+
+    def get_statistics(self):
+        with self.lock:
+            return list(self.latencies), self.errors, self.overruns
+
+    def heartbeat(self, node_id):
+        start = time.time()
+        valid, r = self.do_request("POST", self.reg_url + "health/nodes/" + node_id)
+        end = time.time()
+        with self.lock:
+            if valid and r.status_code == 200:
+                self.latencies.append(end - start)
+                self.last_heartbeat[node_id] = start
+            else:
+                self.errors += 1
+
+    def run(self):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while not self.stopping.is_set():
+                cycle_start = time.time()
+                with self.lock:
+                    node_ids = list(self.node_ids)
+                for future in [executor.submit(self.heartbeat, node_id) for node_id in node_ids]:
+                    future.result()
+                remaining = CONFIG.HEARTBEAT_INTERVAL - (time.time() - cycle_start)
+                if remaining < 0:
+                    with self.lock:
+                        self.overruns += 1
+                self.stopping.wait(max(remaining, 0))
+
+    def stop(self):
+        self.stopping.set()
+        self.join()
+
+
+class LoadTestSubscription(object):
+    """A Query API WebSocket subscription, recording when each resource update is received"""
+
+    def __init__(self, resource_type, params, ws):
+        self.resource_type = resource_type
+        self.params = params
+        self.ws = ws
+        self.messages = 0
+        self.invalid_messages = 0
+        self.error = None
+        # Receive times for each update, keyed by the description from UPDATE_DESCRIPTION
+        self.received = {}
+
+    def matches(self, resource_type, data):
+        """Check whether an update to the given resource should be delivered to this subscription"""
+        if resource_type != self.resource_type:
+            return False
+        return all(data.get(key) == value for key, value in self.params.items())
+
+    def on_message(self, message, received):
+        self.messages += 1
+        try:
+            items = json.loads(message)["grain"]["data"]
+        except (ValueError, KeyError, TypeError):
+            self.invalid_messages += 1
+            return
+        for item in items:
+            post = item.get("post") if isinstance(item, dict) else None
+            if isinstance(post, dict) and str(post.get("description")).startswith(UPDATE_DESCRIPTION.format("")):
+                self.received.setdefault(post["description"], []).append(received)
+
+
+class SubscriptionMultiplexer(threading.Thread):
+    """Receives the messages for many WebSocket subscriptions on a single thread, using a selector"""
+
+    def __init__(self):
+        threading.Thread.__init__(self, daemon=True)
+        self.selector = selectors.DefaultSelector()
+        self.stopping = threading.Event()
+        self.subscriptions = []
+
+    def add(self, resource_type, params, ws_href):
+        """Open a WebSocket connection for a subscription. Must be called before the thread is started"""
+        if CONFIG.ENABLE_AUTH and CONFIG.AUTH_TOKEN and "access_token" not in ws_href:
+            ws_href += "{}access_token={}".format("&" if "?" in ws_href else "?", CONFIG.AUTH_TOKEN)
+        ws = websocket.create_connection(ws_href, timeout=CONFIG.WS_MESSAGE_TIMEOUT,
+                                         sslopt={"ca_certs": CONFIG.CERT_TRUST_ROOT_CA})
+        subscription = LoadTestSubscription(resource_type, params, ws)
+        self.subscriptions.append(subscription)
+        self.selector.register(ws.sock, selectors.EVENT_READ, subscription)
+
+    def receive(self, subscription):
+        while True:
+            try:
+                message = subscription.ws.recv()
+            except (websocket.WebSocketException, OSError) as e:
+                subscription.error = str(e) or e.__class__.__name__
+            else:
+                if message:
+                    subscription.on_message(message, time.time())
+                elif not subscription.ws.connected:
+                    subscription.error = "WebSocket closed by the Query API"
+            if subscription.error:
+                self.selector.unregister(subscription.ws.sock)
+                return
+            # SSL sockets may hold further decrypted frames which the selector cannot signal
+            pending = getattr(subscription.ws.sock, "pending", None)
+            if pending is None or pending() == 0:
+                return
+
+    def run(self):
+        while not self.stopping.is_set():
+            if not self.selector.get_map():
+                self.stopping.wait(0.1)
+                continue
+            for key, _ in self.selector.select(timeout=0.1):
+                self.receive(key.data)
+
+    def stop(self):
+        self.stopping.set()
+        if self.is_alive():
+            self.join()
+        for subscription in self.subscriptions:
+            try:
+                # Don't wait for each close handshake in turn
+                subscription.ws.close(timeout=0)
+            except (websocket.WebSocketException, OSError):
+                pass
+        self.selector.close()
+
+
+class IS0402LoadTest(IS0402Resources, GenericTest):
+    """
+    Runs IS-04-02-Load-Test
+    Benchmarks the Registration and Query APIs with LOAD_TEST_NODES virtual Nodes, reporting metrics for each phase
+    """
+    def __init__(self, apis):
+        GenericTest.__init__(self, apis, disable_auto=True)
+        self.reg_url = self.apis[REG_API_KEY]["url"]
+        self.query_url = self.apis[QUERY_API_KEY]["url"]
+        if self.apis[REG_API_KEY]["version"] != self.apis[QUERY_API_KEY]["version"]:
+            raise NMOSInitException("The Registration and Query API versions under test must be identical")
+        self.is04_reg_utils = IS04Utils(self.reg_url)
+        self.is04_query_utils = IS04Utils(self.query_url)
+        self.test_data = self.load_resource_data()
+        self.subscription_data = self.load_subscription_request_data()
+        self.virtual_nodes = []
+        self.heartbeats = None
+
+    def tear_down_tests(self):
+        if self.heartbeats:
+            self.heartbeats.stop()
+            self.heartbeats = None
+
+        # Remove the virtual Nodes rather than leaving the registry to garbage collect them
+        with ThreadPoolExecutor(max_workers=CONFIG.LOAD_TEST_WORKERS) as executor:
+            for resources in self.virtual_nodes:
+                executor.submit(self.do_request, "DELETE", self.reg_url + "resource/nodes/" + resources["node"]["id"])
+        self.virtual_nodes = []
+
+    def build_virtual_node(self, index):
+        """Create the resource tree for a virtual Node from the test data, with unique IDs"""
+        resources = {resource_type: self.copy_resource(resource_type) for resource_type in RESOURCE_TYPES}
+        ids = {resource_type: str(uuid.uuid4()) for resource_type in RESOURCE_TYPES}
+        for resource_type, data in resources.items():
+            data["id"] = ids[resource_type]
+            data["label"] = "Load Test {} {}".format(resource_type.capitalize(), index)
+            self.bump_resource_version(data)
+        resources["device"]["node_id"] = ids["node"]
+        for resource_type in ["source", "flow", "sender", "receiver"]:
+            # Flows only reference their Device from v1.1
+            if "device_id" in resources[resource_type]:
+                resources[resource_type]["device_id"] = ids["device"]
+        resources["flow"]["source_id"] = ids["source"]
+        resources["sender"]["flow_id"] = ids["flow"]
+        if "senders" in resources["device"]:
+            resources["device"]["senders"] = [ids["sender"]]
+            resources["device"]["receivers"] = [ids["receiver"]]
+        return resources
+
+    def register_virtual_node(self, resources):
+        """Register a virtual Node's resources in order, returning the request latencies and error count"""
+        latencies = []
+        errors = 0
+        for resource_type in RESOURCE_TYPES:
+            start = time.time()
+            valid, r = self.do_request("POST", self.reg_url + "resource",
+                                       json={"type": resource_type, "data": resources[resource_type]})
+            if valid and r.status_code in [200, 201]:
+                latencies.append(time.time() - start)
+                if resource_type == "node":
+                    self.heartbeats.add_node(resources["node"]["id"])
+            else:
+                errors += 1
+        return latencies, errors
+
+    def register_virtual_nodes(self, test):
+        """
+        Register the virtual Nodes, heartbeating for each as soon as it is registered, unless already done.
+        Returns a summary of the registration requests
+        """
+        if self.heartbeats is None:
+            self.heartbeats = HeartbeatWorker(self.reg_url, self.do_request, CONFIG.LOAD_TEST_WORKERS)
+            self.heartbeats.start()
+
+        if len(self.virtual_nodes) > 0:
+            return None
+
+        self.virtual_nodes = [self.build_virtual_node(index) for index in range(CONFIG.LOAD_TEST_NODES)]
+
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=CONFIG.LOAD_TEST_WORKERS) as executor:
+            results = list(executor.map(self.register_virtual_node, self.virtual_nodes))
+        elapsed = time.time() - start
+
+        latencies = [latency for result in results for latency in result[0]]
+        errors = sum(result[1] for result in results)
+        if len(latencies) == 0:
+            raise NMOSTestException(test.FAIL("Registration API did not accept any of the virtual Node resources"))
+        return summarise_requests(latencies, errors, elapsed)
+
+    def build_queries(self):
+        """Create a mix of paged and filtered Query API requests for the virtual Nodes"""
+        resources = random.choice(self.virtual_nodes)
+        return [
+            "nodes?paging.limit=10",
+            "senders?paging.limit=10",
+            "flows?paging.limit=10&format={}".format(resources["flow"].get("format", "")),
+            "devices?node_id={}".format(resources["node"]["id"]),
+            "receivers?device_id={}".format(resources["device"]["id"]),
+            "sources?label={}".format(resources["source"]["label"].replace(" ", "%20")),
+            "senders/{}".format(resources["sender"]["id"])
+        ]
+
+    def run_queries(self, deadline):
+        """Make Query API requests until the deadline, returning the request latencies and error count"""
+        latencies = []
+        errors = 0
+        while time.time() < deadline:
+            for query in self.build_queries():
+                start = time.time()
+                valid, r = self.do_request("GET", self.query_url + query)
+                if valid and r.status_code == 200:
+                    latencies.append(time.time() - start)
+                else:
+                    errors += 1
+        return latencies, errors
+
+    def test_01(self, test):
+        """Registration API sustains concurrent registration of many Nodes' resources"""
+
+        summary = self.register_virtual_nodes(test)
+        if summary is None:
+            return test.NA("Virtual Nodes were already registered")
+
+        result = test.WARNING if summary["errors"] > 0 else test.PASS
+        test_result = result("Registered {} virtual Nodes: {}".format(CONFIG.LOAD_TEST_NODES,
+                                                                      describe_summary(summary)))
+        test_result.metrics = summary
+        return test_result
+
+    @test_tags("slow")
+    def test_02(self, test):
+        """Registration API sustains heartbeats for many Nodes at HEARTBEAT_INTERVAL"""
+
+        self.register_virtual_nodes(test)
+
+        self.heartbeats.reset_statistics()
+        start = time.time()
+        time.sleep(CONFIG.LOAD_TEST_DURATION)
+        latencies, errors, overruns = self.heartbeats.get_statistics()
+        summary = summarise_requests(latencies, errors, time.time() - start)
+        summary["overruns"] = overruns
+
+        if len(latencies) == 0:
+            return test.FAIL("Registration API did not accept any heartbeats")
+
+        result = test.WARNING if summary["errors"] > 0 or overruns > 0 else test.PASS
+        test_result = result("{}, {} heartbeat intervals overran".format(describe_summary(summary), overruns))
+        test_result.metrics = summary
+        return test_result
+
+    @test_tags("slow")
+    def test_03(self, test):
+        """Query API sustains concurrent paged and filtered queries while Nodes heartbeat"""
+
+        self.register_virtual_nodes(test)
+
+        start = time.time()
+        deadline = start + CONFIG.LOAD_TEST_DURATION
+        with ThreadPoolExecutor(max_workers=CONFIG.LOAD_TEST_WORKERS) as executor:
+            futures = [executor.submit(self.run_queries, deadline) for _ in range(CONFIG.LOAD_TEST_WORKERS)]
+            results = [future.result() for future in futures]
+        elapsed = time.time() - start
+
+        latencies = [latency for result in results for latency in result[0]]
+        errors = sum(result[1] for result in results)
+        if len(latencies) == 0:
+            return test.FAIL("Query API did not respond successfully to any queries")
+
+        summary = summarise_requests(latencies, errors, elapsed)
+        result = test.WARNING if summary["errors"] > 0 else test.PASS
+        test_result = result(describe_summary(summary))
+        test_result.metrics = summary
+        return test_result
+
+    @test_tags("slow")
+    def test_04(self, test):
+        """Registry garbage collects Nodes on time when they stop heartbeating"""
+
+        self.register_virtual_nodes(test)
+
+        # Stop heartbeating for a sample of the virtual Nodes and time how long each takes to disappear
+        sample = random.sample(self.virtual_nodes, min(len(self.virtual_nodes), 10))
+        last_heartbeats = self.heartbeats.remove_nodes([resources["node"]["id"] for resources in sample])
+
+        collected = {}
+        deadline = max(last_heartbeats.values()) + CONFIG.GARBAGE_COLLECTION_TIMEOUT + CONFIG.HEARTBEAT_INTERVAL
+        while len(collected) < len(last_heartbeats) and time.time() < deadline:
+            for node_id in last_heartbeats:
+                if node_id in collected:
+                    continue
+                valid, r = self.do_request("GET", self.query_url + "nodes/" + node_id)
+                if valid and r.status_code == 404:
+                    collected[node_id] = time.time() - last_heartbeats[node_id]
+            time.sleep(0.1)
+
+        delays = sorted(collected.values())
+        errors = [delay - CONFIG.GARBAGE_COLLECTION_TIMEOUT for delay in delays]
+        summary = {
+            "nodes": len(last_heartbeats),
+            "collected": len(collected),
+            "expected_s": CONFIG.GARBAGE_COLLECTION_TIMEOUT,
+            "delay_min_s": round(delays[0], 3) if delays else None,
+            "delay_p50_s": round(percentile(delays, 50), 3) if delays else None,
+            "delay_max_s": round(delays[-1], 3) if delays else None,
+            "error_mean_s": round(sum(errors) / len(errors), 3) if errors else None
+        }
+
+        for resources in sample:
+            self.virtual_nodes.remove(resources)
+
+        if len(collected) < len(last_heartbeats):
+            test_result = test.WARNING("{} of {} Nodes were not garbage collected within {}s of their last heartbeat"
+                                       .format(len(last_heartbeats) - len(collected), len(last_heartbeats),
+                                               CONFIG.GARBAGE_COLLECTION_TIMEOUT + CONFIG.HEARTBEAT_INTERVAL))
+        else:
+            test_result = test.PASS("Nodes were garbage collected between {}s and {}s after their last heartbeat "
+                                    "(expected {}s)".format(summary["delay_min_s"], summary["delay_max_s"],
+                                                            CONFIG.GARBAGE_COLLECTION_TIMEOUT))
+        test_result.metrics = summary
+        return test_result
+
+    def supports_basic_queries(self):
+        """Check whether the Query API supports basic queries, and so subscriptions with query parameters"""
+        valid, r = self.do_request("GET", self.query_url + "nodes?description={}".format(str(uuid.uuid4())))
+        try:
+            return valid and r.status_code == 200 and len(r.json()) == 0
+        except json.JSONDecodeError:
+            return False
+
+    def build_subscriptions(self, basic_queries):
+        """Choose a varied set of resource types and query parameters for LOAD_TEST_SUBSCRIPTIONS subscriptions"""
+        subscriptions = []
+        for index in range(CONFIG.LOAD_TEST_SUBSCRIPTIONS):
+            resource_type = RESOURCE_TYPES[index % len(RESOURCE_TYPES)]
+            data = random.choice(self.virtual_nodes)[resource_type]
+            params = {}
+            if basic_queries and index % 3 == 1:
+                params["label"] = data["label"]
+            elif basic_queries and index % 3 == 2 and FILTER_KEYS[resource_type] in data:
+                params[FILTER_KEYS[resource_type]] = data[FILTER_KEYS[resource_type]]
+            subscriptions.append((resource_type, params))
+        return subscriptions
+
+    def update_resources(self, subscriptions, deadline):
+        """
+        Update the virtual Nodes' resources at LOAD_TEST_UPDATE_RATE until the deadline.
+        Returns the description, time and matching subscriptions of each update, and the number of failed updates
+        """
+        interval = 1.0 / CONFIG.LOAD_TEST_UPDATE_RATE
+        # Updates to one resource within a subscription's max_update_rate_ms may be merged into a single grain
+        min_interval = 2 * self.subscription_data.get("max_update_rate_ms", 100) / 1000.0
+        last_update = {}
+        updates = []
+        errors = 0
+        next_update = time.time()
+        while next_update < deadline:
+            time.sleep(max(next_update - time.time(), 0))
+            next_update += interval
+
+            resource_type = random.choice(RESOURCE_TYPES)
+            data = random.choice(self.virtual_nodes)[resource_type]
+            if time.time() - last_update.get(data["id"], 0) < min_interval:
+                continue
+
+            description = UPDATE_DESCRIPTION.format(len(updates) + errors)
+            data["description"] = description
+            self.bump_resource_version(data)
+            start = time.time()
+            valid, r = self.do_request("POST", self.reg_url + "resource", json={"type": resource_type, "data": data})
+            if valid and r.status_code == 200:
+                last_update[data["id"]] = start
+                updates.append((description, start, [_ for _ in subscriptions if _.matches(resource_type, data)]))
+            else:
+                errors += 1
+        return updates, errors
+
+    @test_tags("websocket", "slow")
+    def test_05(self, test):
+        """Query API delivers updates promptly to many concurrent WebSocket subscriptions"""
+
+        self.register_virtual_nodes(test)
+
+        basic_queries = self.supports_basic_queries()
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        memory_start = tracemalloc.get_traced_memory()[0]
+
+        multiplexer = SubscriptionMultiplexer()
+        try:
+            for resource_type, params in self.build_subscriptions(basic_queries):
+                sub_json = self.prepare_subscription("/{}s".format(resource_type), params=params)
+                resp_json = self.post_subscription(test, sub_json)
+                try:
+                    multiplexer.add(resource_type, params, resp_json["ws_href"])
+                except (websocket.WebSocketException, OSError) as e:
+                    return test.FAIL("Error opening websocket: {}".format(e))
+            multiplexer.start()
+
+            # Allow the initial sync grains to be delivered before any resources are updated
+            time.sleep(CONFIG.WS_MESSAGE_TIMEOUT)
+
+            start = time.time()
+            updates, update_errors = self.update_resources(multiplexer.subscriptions,
+                                                           start + CONFIG.LOAD_TEST_DURATION)
+            elapsed = time.time() - start
+            time.sleep(CONFIG.WS_MESSAGE_TIMEOUT)
+        finally:
+            multiplexer.stop()
+            memory_peak = tracemalloc.get_traced_memory()[1]
+            if not tracing:
+                tracemalloc.stop()
+
+        latencies = []
+        missing = 0
+        duplicates = 0
+        for description, sent, subscriptions in updates:
+            for subscription in subscriptions:
+                received = subscription.received.get(description, [])
+                if len(received) == 0:
+                    missing += 1
+                else:
+                    latencies.append(received[0] - sent)
+                    duplicates += len(received) - 1
+        latencies.sort()
+        disconnected = [_ for _ in multiplexer.subscriptions if _.error]
+        invalid = sum(_.invalid_messages for _ in multiplexer.subscriptions)
+
+        summary = {
+            "subscriptions": len(multiplexer.subscriptions),
+            "updates": len(updates),
+            "update_errors": update_errors,
+            "duration": round(elapsed, 3),
+            "deliveries": len(latencies),
+            "missing": missing,
+            "duplicates": duplicates,
+            "invalid_messages": invalid,
+            "disconnected": len(disconnected),
+            "latency_p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+            "latency_p99_ms": round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+            "latency_max_ms": round(latencies[-1] * 1000, 1) if latencies else None,
+            "tool_memory_peak_kb": round((memory_peak - memory_start) / 1024.0, 1),
+            "tool_memory_per_subscription_kb": round((memory_peak - memory_start) / 1024.0 /
+                                                     max(len(multiplexer.subscriptions), 1), 1)
+        }
+
+        if len(updates) == 0:
+            test_result = test.FAIL("Registration API did not accept any resource updates")
+        elif len(latencies) == 0:
+            test_result = test.FAIL("Query API did not deliver any resource updates to the subscriptions")
+        else:
+            detail = "{} subscriptions received {} of {} updates ({} missing, {} duplicated), latency p50 {}ms, " \
+                     "p99 {}ms, tool memory peak {}KiB".format(summary["subscriptions"], len(latencies),
+                                                               len(latencies) + missing, missing, duplicates,
+                                                               summary["latency_p50_ms"], summary["latency_p99_ms"],
+                                                               summary["tool_memory_peak_kb"])
+            if len(disconnected) > 0:
+                test_result = test.FAIL("{} WebSocket connections failed: {}; {}"
+                                        .format(len(disconnected), disconnected[0].error, detail))
+            elif missing > 0 or invalid > 0:
+                test_result = test.FAIL(detail)
+            elif duplicates > 0 or update_errors > 0:
+                test_result = test.WARNING(detail)
+            else:
+                test_result = test.PASS(detail)
+        test_result.metrics = summary
+        return test_result
@@ -19,23 +19,32 @@ import socket
 import uuid
 from requests.compat import json
 from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
+from functools import cmp_to_key
 from time import sleep
 from jsonschema import ValidationError
 from urllib.parse import urlparse
-from zeroconf_monkey import ServiceBrowser, Zeroconf
 
 from .. import Config as CONFIG
-from ..MdnsListener import MdnsListener
-from ..GenericTest import GenericTest, NMOSTestException, NMOSInitException, NMOS_WIKI_URL
+from ..MdnsListener import service_at
+from ..MdnsManager import MDNS_MANAGER
+from ..GenericTest import GenericTest, NMOSTestException, NMOSInitException, NMOS_WIKI_URL, test_tags
 from ..IS04Utils import IS04Utils
+from ..IS0402Resources import IS0402Resources
 from ..TestHelper import WebsocketWorker, load_resolved_schema
 from ..TestResult import Test
 
 REG_API_KEY = "registration"
 QUERY_API_KEY = "query"
 
+# Delay before and after each registration used to order the sample nodes when the registry does not provide the
+# X-Paging-Timestamp debugging header
+# Note: In order to be able to accomplish 20 of these registration post requests well before the default garbage
+# collection interval of 12s, the delay can't be much more than 0.1 seconds...
+PAGING_TIMESTAMP_DELAY = 0.1
 
-class IS0402Test(GenericTest):
+
+class IS0402Test(IS0402Resources, GenericTest):
     """
     Runs IS-04-02-Test
     """
@@ -53,10 +62,12 @@ class IS0402Test(GenericTest):
         self.is04_query_utils = IS04Utils(self.query_url)
         self.test_data = self.load_resource_data()
         self.subscription_data = self.load_subscription_request_data()
+        # Whether the Registration API provides the X-Paging-Timestamp debugging header, unknown until first used
+        self.paging_timestamp_header = None
 
     def set_up_tests(self):
-        self.zc = Zeroconf()
-        self.zc_listener = MdnsListener(self.zc)
+        self.zc = MDNS_MANAGER.open()
+        self.zc_listener = MDNS_MANAGER.get_listener()
 
     def tear_down_tests(self):
         if self.zc:
@@ -69,9 +80,10 @@ class IS0402Test(GenericTest):
         if CONFIG.DNS_SD_MODE != "multicast":
             return test.DISABLED("This test cannot be performed when DNS_SD_MODE is not 'multicast'")
 
-        ServiceBrowser(self.zc, service_type, self.zc_listener)
-        sleep(CONFIG.DNS_SD_BROWSE_TIMEOUT)
-        serv_list = self.zc_listener.get_service_list()
+        self.zc.browse(service_type)
+        self.zc_listener.wait_for_service(service_type, service_at(api["ip"], api["port"]),
+                                          CONFIG.DNS_SD_BROWSE_TIMEOUT)
+        serv_list = self.zc_listener.get_service_list(service_type)
         for service in serv_list:
             port = service.port
             if port != api["port"]:
@@ -116,6 +128,7 @@ class IS0402Test(GenericTest):
         return test.FAIL("No matching mDNS announcement found for {} with IP/Port {}:{}."
                          .format(api["name"], api["ip"], api["port"]))
 
+    @test_tags("dns-sd")
     def test_01(self, test):
         """Registration API advertises correctly via mDNS"""
 
@@ -127,6 +140,7 @@ class IS0402Test(GenericTest):
 
         return self.do_dns_sd_advertisement_check(test, api, service_type)
 
+    @test_tags("dns-sd")
     def test_02(self, test):
         """Query API advertises correctly via mDNS"""
 
@@ -317,56 +331,105 @@ class IS0402Test(GenericTest):
             raise NMOSTestException(test.FAIL("Version > 1 not supported yet."))
 
     def post_sample_nodes(self, test, count, description, labeller=None):
-        """Perform a POST request on the Registration API to register a number of sample nodes"""
-
-        node_data = self.copy_resource("node")
-        node_data["description"] = description
-
-        update_timestamps = []
-        ids = []
-
-        for _ in range(count):
-            ids.append(str(uuid.uuid4()))
+        """
+        Perform POST requests on the Registration API to register a number of sample nodes, returning their update
+        timestamps and ids in registration order.
+        When the registry provides the X-Paging-Timestamp debugging header, its values determine the order, so the
+        nodes are registered without any delay, concurrently unless a labeller depends on the registration order.
+        Otherwise the order is determined by local timestamps recorded before each request and after each response.
+        """
 
-            node_data["id"] = ids[-1]
+        nodes = []
+        for index in range(count):
+            node_data = self.copy_resource("node")
+            node_data["id"] = str(uuid.uuid4())
+            node_data["description"] = description
             self.bump_resource_version(node_data)
 
             if labeller is not None:
-                node_data["label"] = labeller(_)
+                node_data["label"] = labeller(index)
 
             # For debugging
-            node_data["tags"]["index"] = [str(_)]
+            node_data["tags"]["index"] = [str(index)]
+
+            nodes.append(node_data)
 
+        registrations = []
+        if len(nodes) > 0 and self.paging_timestamp_header is None:
+            # Register the first node on its own to find out whether the registry provides the debugging header
+            registrations.append(self.post_sample_node(test, nodes[0], PAGING_TIMESTAMP_DELAY))
+            self.paging_timestamp_header = registrations[0][1] is not None
+
+        remaining = nodes[len(registrations):]
+        if not self.paging_timestamp_header:
             # Add a little delay between the POST requests, and record the local timestamps
             # before the request and after the response, in order to test pagination cursors
             # (unfortunately the required timestamp is unknowable via the registry APIs,
             # unless the implementation includes the X-Paging-Timestamp debugging header)
+            for node_data in remaining:
+                registrations.append(self.post_sample_node(test, node_data, PAGING_TIMESTAMP_DELAY))
+        elif labeller is not None or CONFIG.PAGING_REGISTRATION_WORKERS <= 1:
+            for node_data in remaining:
+                registrations.append(self.post_sample_node(test, node_data))
+        else:
+            with ThreadPoolExecutor(max_workers=CONFIG.PAGING_REGISTRATION_WORKERS) as executor:
+                futures = [executor.submit(self.post_sample_node, test, node_data) for node_data in remaining]
+            registrations.extend(future.result() for future in futures)
+            self.check_paging_timestamps(test, registrations)
+
+            # Concurrent registrations complete in an arbitrary order, so sort them by their update timestamps,
+            # which must also be distinct for the pagination cursors to separate them
+            cmp = IS04Utils.compare_resource_version
+            registrations.sort(key=cmp_to_key(lambda a, b: cmp(TS.recommended_TAI(a[1]), TS.recommended_TAI(b[1]))))
+            if any(cmp(TS.recommended_TAI(a[1]), TS.recommended_TAI(b[1])) == 0
+                   for a, b in zip(registrations, registrations[1:])):
+                registrations = [self.post_sample_node(test, node_data, codes=[200])
+                                 for node_data, _ in registrations]
+
+        self.check_paging_timestamps(test, registrations)
+
+        # Bear in mind that the returned arrays are in forward order
+        # whereas Query API responses are required to be in reverse order
+        return [timestamp for _, timestamp in registrations], [node_data["id"] for node_data, _ in registrations]
 
-            # Note: In order to be able to accomplish 20 of these registration post requests
-            # well before the default garbage collection interval of 12s, the delay can't be
-            # much more than 0.1 seconds...
-            PAGING_TIMESTAMP_DELAY = 0.1
+    def check_paging_timestamps(self, test, registrations):
+        """
+        Check that the registry consistently provided the X-Paging-Timestamp debugging header, if it did at all.
+        Raises an NMOSTestException when there's an error
+        """
+        if self.paging_timestamp_header:
+            for node_data, ts in registrations:
+                if TS.recommended_TAI(ts) is None:
+                    raise NMOSTestException(test.FAIL("Registration API did not consistently include the response "
+                                                      "header X-Paging-Timestamp, e.g. for Node {}"
+                                                      .format(node_data["id"])))
+
+    def post_sample_node(self, test, node_data, delay=0, codes=None):
+        """
+        Perform a POST request on the Registration API to register a sample node, returning the node and either
+        the precise update timestamp from the X-Paging-Timestamp debugging header or the local timestamps around it.
+        Local timestamps are only usable as pagination cursors if there is a delay between each request.
+        """
 
-            before = self.is04_query_utils.get_TAI_time()
-            sleep(PAGING_TIMESTAMP_DELAY)
+        before = self.is04_query_utils.get_TAI_time()
+        sleep(delay)
 
-            location, timestamp = self.post_resource(test, "node", node_data, codes=[201])
+        location, timestamp = self.post_resource(test, "node", node_data, codes=codes or [201])
 
-            sleep(PAGING_TIMESTAMP_DELAY)
-            after = self.is04_query_utils.get_TAI_time()
+        sleep(delay)
+        after = self.is04_query_utils.get_TAI_time()
 
-            # Check API and Testing Tool appear to be synchronized (if debugging header provided)
-            permitted = TS.permitted(before, after)
-            if timestamp is not None and not TS.compare(permitted, timestamp):
-                raise NMOSTestException(test.FAIL("API and Testing Tool clocks appear not to be synchronized. "
-                                                  "The response header X-Paging-Timestamp '{}' is outside the "
-                                                  "expected range: {}".format(timestamp, TS.str(permitted))))
+        if timestamp is None:
+            return node_data, TS.recommended(before, None, after)
 
-            update_timestamps.append(TS.recommended(before, timestamp, after))
+        # Check API and Testing Tool appear to be synchronized
+        permitted = TS.permitted(before, after)
+        if not TS.compare(permitted, timestamp):
+            raise NMOSTestException(test.FAIL("API and Testing Tool clocks appear not to be synchronized. "
+                                              "The response header X-Paging-Timestamp '{}' is outside the "
+                                              "expected range: {}".format(timestamp, TS.str(permitted))))
 
-        # Bear in mind that the returned arrays are in forward order
-        # whereas Query API responses are required to be in reverse order
-        return update_timestamps, ids
+        return node_data, TS.exact(timestamp)
 
     def do_paged_request(self, resource_type="nodes", limit=None, since=None, until=None,
                          description=None, label=None, id=None):
@@ -971,6 +1034,50 @@ class IS0402Test(GenericTest):
 
         return test.PASS()
 
+    @test_tags("slow")
+    def test_21_10(self, test):
+        """Query API implements pagination (traversal of many pages)"""
+
+        self.do_test_paged_trait(test)
+        description = "test_21_10"
+
+        # Without the X-Paging-Timestamp debugging header, registrations are too slow to make many pages
+        # before garbage collection, so the first registration also determines how many to make
+        ts, ids = self.post_sample_nodes(test, 1, description)
+        count = CONFIG.PAGING_SAMPLE_NODES if self.paging_timestamp_header else 20
+        more_ts, more_ids = self.post_sample_nodes(test, count - 1, description)
+        ts += more_ts
+        ids += more_ids
+
+        limit = 7
+
+        # Follow the 'prev' links from the most recent page back to the first page
+
+        end = len(ids)
+        response = self.do_paged_request(description=description, limit=limit)
+        expected_until = TS.ge(ts[-1])
+        while True:
+            start = max(end - limit, 0)
+            self.do_test_paged_response(test, response,
+                                        expected_ids=ids[start:end],
+                                        expected_since=TS.extended(ts[start - 1], ts[start - 1], ts[start])
+                                        if start > 0 else TS.epoch(),
+                                        expected_until=expected_until,
+                                        expected_limit=limit)
+            if start == 0:
+                break
+            end = start
+
+            # do_test_paged_response has already checked the Link header, and the 'prev' page should end
+            # where this page began
+            headers = response[1].headers
+            prev = self.parse_link_header(headers["Link"])["prev"]
+            valid, prev_response = self.do_request("GET", prev)
+            response = valid, prev_response, urlparse(prev).query.split("&")
+            expected_until = TS.required(headers["X-Paging-Since"])
+
+        return test.PASS()
+
     def test_22(self, test):
         """Query API implements downgrade queries"""
 
@@ -1166,6 +1273,7 @@ class IS0402Test(GenericTest):
 
         return test.PASS()
 
+    @test_tags("websocket")
     def test_22_2(self, test):
         """Query API WebSockets implement downgrade queries"""
 
@@ -1333,6 +1441,7 @@ class IS0402Test(GenericTest):
 
         return test.PASS()
 
+    @test_tags("websocket")
     def test_23_1(self, test):
         """Query API WebSockets implement basic query parameters"""
 
@@ -1500,6 +1609,7 @@ class IS0402Test(GenericTest):
 
         return test.PASS()
 
+    @test_tags("websocket")
     def test_24_1(self, test):
         """Query API WebSockets implement RQL"""
 
@@ -1657,6 +1767,7 @@ class IS0402Test(GenericTest):
 
         return test.PASS()
 
+    @test_tags("websocket")
     def test_25_1(self, test):
         """Query API WebSockets implement ancestry queries"""
 
@@ -1688,6 +1799,7 @@ class IS0402Test(GenericTest):
 
         return test.PASS()
 
+    @test_tags("slow")
     def test_27(self, test):
         """Registration API cleans up Nodes and their sub-resources when a heartbeat doesn't occur for
         the duration of a fixed timeout period"""
@@ -1758,6 +1870,7 @@ class IS0402Test(GenericTest):
                 return test.FAIL("Query API did not respond as expected")
         return test.PASS()
 
+    @test_tags("websocket")
     def test_29(self, test):
         """Query API supports websocket subscription request"""
 
@@ -1790,6 +1903,7 @@ class IS0402Test(GenericTest):
         else:
             return test.FAIL("Query API did not provide the requested subscription: {}".format(r.status_code))
 
+    @test_tags("websocket")
     def test_29_1(self, test):
         """Query API websocket subscription requests default to the current protocol"""
 
@@ -1835,6 +1949,7 @@ class IS0402Test(GenericTest):
             return test.FAIL("Registration API returned an unexpected response: {} {}"
                              .format(r.status_code, r.text))
 
+    @test_tags("websocket")
     def test_31(self, test):
         """Query API sends correct websocket event messages for UNCHANGED (SYNC), ADDED, MODIFIED and REMOVED"""
 
@@ -2118,6 +2233,7 @@ class IS0402Test(GenericTest):
 
         return test.PASS()
 
+    @test_tags("auth")
     def test_33(self, test):
         """Registration API rejects resource updates from mismatched clients as per BCP-003-02 (using client_id)"""
 
@@ -2139,6 +2255,7 @@ class IS0402Test(GenericTest):
 
         return test.PASS()
 
+    @test_tags("auth")
     def test_33_1(self, test):
         """Registration API rejects resource updates from mismatched clients as per BCP-003-02 (using azp)"""
 
@@ -2160,30 +2277,6 @@ class IS0402Test(GenericTest):
 
         return test.PASS()
 
-    def load_resource_data(self):
-        """Loads test data from files"""
-        api = self.apis[REG_API_KEY]
-        result_data = dict()
-        resources = ["node", "device", "source", "flow", "sender", "receiver"]
-        for resource in resources:
-            with open("test_data/IS0402/v1.3_{}.json".format(resource)) as resource_data:
-                resource_json = json.load(resource_data)
-                if self.is04_reg_utils.compare_api_version(api["version"], "v1.3") < 0:
-                    resource_json = self.downgrade_resource(resource, resource_json,
-                                                            api["version"])
-
-                result_data[resource] = resource_json
-        return result_data
-
-    def load_subscription_request_data(self):
-        """Loads subscription request data"""
-        api = self.apis[QUERY_API_KEY]
-        with open("test_data/IS0402/subscriptions_request.json") as resource_data:
-            resource_json = json.load(resource_data)
-            if self.is04_reg_utils.compare_api_version(api["version"], "v1.3") < 0:
-                return self.downgrade_resource("subscription", resource_json, api["version"])
-            return resource_json
-
     def do_400_check(self, test, resource_type):
         # this is a more thorough check that the Registration API implements schema validation than previously
         data = self.copy_resource(resource_type)
@@ -2208,244 +2301,6 @@ class IS0402Test(GenericTest):
         else:
             return test.FAIL(message)
 
-    def downgrade_resource(self, resource_type, data, requested_version):
-        """Downgrades given resource data to requested version"""
-        version_major, version_minor = [int(x) for x in requested_version[1:].split(".")]
-
-        if version_major == 1:
-            if resource_type == "node":
-                if version_minor <= 2:
-                    if "interfaces" in data:
-                        key = "attached_network_device"
-                        for interface in data["interfaces"]:
-                            if key in interface:
-                                del interface[key]
-                    key = "authorization"
-                    for service in data["services"]:
-                        if key in service:
-                            del service[key]
-                    if "api" in data and "endpoints" in data["api"]:
-                        for endpoint in data["api"]["endpoints"]:
-                            if key in endpoint:
-                                del endpoint[key]
-                if version_minor <= 1:
-                    keys_to_remove = [
-                        "interfaces"
-                    ]
-                    for key in keys_to_remove:
-                        if key in data:
-                            del data[key]
-                if version_minor == 0:
-                    keys_to_remove = [
-                        "api",
-                        "clocks",
-                        "description",
-                        "tags"
-                    ]
-                    for key in keys_to_remove:
-                        if key in data:
-                            del data[key]
-                return data
-
-            elif resource_type == "device":
-                if version_minor <= 2:
-                    key = "authorization"
-                    if "controls" in data:
-                        for control in data["controls"]:
-                            if key in control:
-                                del control[key]
-                if version_minor <= 1:
-                    pass
-                if version_minor == 0:
-                    keys_to_remove = [
-                        "controls",
-                        "description",
-                        "tags"
-                    ]
-                    for key in keys_to_remove:
-                        if key in data:
-                            del data[key]
-                return data
-
-            elif resource_type == "sender":
-                if version_minor <= 2:
-                    pass
-                if version_minor <= 1:
-                    keys_to_remove = [
-                        "caps",
-                        "interface_bindings",
-                        "subscription"
-                    ]
-                    for key in keys_to_remove:
-                        if key in data:
-                            del data[key]
-                if version_minor == 0:
-                    pass
-                return data
-
-            elif resource_type == "receiver":
-                if version_minor <= 2:
-                    pass
-                if version_minor <= 1:
-                    keys_to_remove = [
-                        "interface_bindings"
-                    ]
-                    for key in keys_to_remove:
-                        if key in data:
-                            del data[key]
-                    if "subscription" in data and "active" in data["subscription"]:
-                        del data["subscription"]["active"]
-                if version_minor == 0:
-                    pass
-                return data
-
-            elif resource_type == "source":
-                if version_minor <= 2:
-                    keys_to_remove = [
-                        "event_type"
-                    ]
-                    for key in keys_to_remove:
-                        if key in data:
-                            del data[key]
-                if version_minor <= 1:
-                    pass
-                if version_minor == 0:
-                    keys_to_remove = [
-                        "channels",
-                        "clock_name",
-                        "grain_rate"
-                    ]
-                    for key in keys_to_remove:
-                        if key in data:
-                            del data[key]
-                return data
-
-            elif resource_type == "flow":
-                if version_minor <= 2:
-                    keys_to_remove = [
-                        "event_type"
-                    ]
-                    for key in keys_to_remove:
-                        if key in data:
-                            del data[key]
-                if version_minor <= 1:
-                    pass
-                if version_minor == 0:
-                    keys_to_remove = [
-                        "bit_depth",
-                        "colorspace",
-                        "components",
-                        "device_id",
-                        "DID_SDID",
-                        "frame_height",
-                        "frame_width",
-                        "grain_rate",
-                        "interlace_mode",
-                        "media_type",
-                        "sample_rate",
-                        "transfer_characteristic"
-                    ]
-                    for key in keys_to_remove:
-                        if key in data:
-                            del data[key]
-                return data
-
-            elif resource_type == "subscription":
-                if version_minor <= 2:
-                    keys_to_remove = [
-                        "authorization"
-                    ]
-                    for key in keys_to_remove:
-                        if key in data:
-                            del data[key]
-                if version_minor <= 1:
-                    pass
-                if version_minor == 0:
-                    keys_to_remove = [
-                        "secure"
-                    ]
-                    for key in keys_to_remove:
-                        if key in data:
-                            del data[key]
-                return data
-
-        # Invalid request
-        return None
-
-    def copy_resource(self, type, api_ver=None):
-        """Make a clone of the test data for the requested type and API version"""
-        if api_ver is None:
-            api_ver = self.apis[REG_API_KEY]["version"]
-        data = deepcopy(self.test_data[type])
-        if self.is04_reg_utils.compare_api_version(api_ver, "v1.3") < 0:
-            data = self.downgrade_resource(type, data, api_ver)
-        return data
-
-    def bump_resource_version(self, resource):
-        """Bump version timestamp of the given resource"""
-        resource["version"] = self.is04_reg_utils.get_TAI_time()
-
-    def prepare_subscription(self, resource_path, params=None, api_ver=None):
-        """Prepare an object ready to send as the request body for a Query API subscription"""
-        if params is None:
-            params = {}
-        if api_ver is None:
-            api_ver = self.apis[QUERY_API_KEY]["version"]
-        sub_json = deepcopy(self.subscription_data)
-        sub_json["resource_path"] = resource_path
-        sub_json["params"] = params
-        sub_json["secure"] = CONFIG.ENABLE_HTTPS
-        if self.is04_query_utils.compare_api_version(api_ver, "v1.3") < 0:
-            sub_json = self.downgrade_resource("subscription", sub_json, api_ver)
-        return sub_json
-
-    def post_subscription(self, test, sub_json, query_url=None):
-        """Perform a POST request to a Query API to create a subscription"""
-        if query_url is None:
-            query_url = self.query_url
-
-        api_ver = query_url.rstrip("/").rsplit("/", 1)[-1]
-
-        valid, r = self.do_request("POST", "{}subscriptions".format(query_url), json=sub_json)
-
-        if not valid:
-            raise NMOSTestException(test.FAIL("Query API returned an unexpected response: {}".format(r)))
-
-        if r.status_code in [200, 201]:
-            if self.is04_query_utils.compare_api_version(api_ver, "v1.3") >= 0:
-                if "Location" not in r.headers:
-                    raise NMOSTestException(test.FAIL("Query API failed to return a 'Location' response header"))
-                path = "{}subscriptions/".format(urlparse(query_url).path)
-                location = r.headers["Location"]
-                if path not in location:
-                    raise NMOSTestException(test.FAIL("Query API 'Location' response header is incorrect: "
-                                                      "Location: {}".format(location)))
-                if not location.startswith("/") and not location.startswith(self.protocol + "://"):
-                    raise NMOSTestException(test.FAIL("Query API 'Location' response header is invalid for the "
-                                                      "current protocol: Location: {}".format(location)))
-        elif r.status_code in [400, 501]:
-            raise NMOSTestException(test.FAIL("Query API signalled that it does not support the requested "
-                                              "subscription parameters: {} {}".format(r.status_code, sub_json)))
-        else:
-            raise NMOSTestException(test.FAIL("Query API returned an unexpected response: "
-                                              "{} {}".format(r.status_code, r.text)))
-
-        # Currently can only validate schema for the API version under test
-        if query_url == self.query_url:
-            schema = self.get_schema(QUERY_API_KEY, "POST", "/subscriptions", r.status_code)
-            valid, message = self.check_response(schema, "POST", r)
-            if valid:
-                # if message:
-                #     return WARNING somehow...
-                pass
-            else:
-                raise NMOSTestException(test.FAIL(message))
-
-        try:
-            return r.json()
-        except json.JSONDecodeError:
-            raise NMOSTestException(test.FAIL("Non-JSON response returned for Query API subscription request"))
-
     def post_resource(self, test, type, data=None, reg_url=None, codes=None, fail=Test.FAIL, headers=None):
         """
         Perform a POST request on the Registration API to create or update a resource registration.
@@ -2578,6 +2433,14 @@ class TS:
     def permitted(lower_TAI, upper_TAI):
         return (lower_TAI, upper_TAI)
 
+    @staticmethod
+    def exact(exact_TAI):
+        # Bounded by the preceding nanosecond so that TS.lower and TS.upper can still be used as exclusive
+        # and inclusive pagination cursors respectively
+        secs, nanos = [int(_) for _ in exact_TAI.split(":")]
+        preceding_TAI = "{}:{}".format(secs, nanos - 1) if nanos > 0 else "{}:{}".format(secs - 1, 999999999)
+        return (preceding_TAI, exact_TAI, exact_TAI)
+
     @staticmethod
     def epoch():
         return TS.required("0:0")
@@ -15,9 +15,9 @@
 import time
 import socket
 
-from zeroconf_monkey import ServiceBrowser, Zeroconf
-from ..MdnsListener import MdnsListener
-from ..GenericTest import GenericTest, NMOS_WIKI_URL
+from ..MdnsListener import service_at
+from ..MdnsManager import MDNS_MANAGER
+from ..GenericTest import GenericTest, NMOS_WIKI_URL, test_tags
 from ..IS04Utils import IS04Utils
 from .. import Config as CONFIG
 
@@ -34,14 +34,15 @@ class IS0403Test(GenericTest):
         self.is04_utils = IS04Utils(self.node_url)
 
     def set_up_tests(self):
-        self.zc = Zeroconf()
-        self.zc_listener = MdnsListener(self.zc)
+        self.zc = MDNS_MANAGER.open()
+        self.zc_listener = MDNS_MANAGER.get_listener()
 
     def tear_down_tests(self):
         if self.zc:
             self.zc.close()
             self.zc = None
 
+    @test_tags("dns-sd")
     def test_01(self, test):
         """Node advertises a Node type mDNS announcement with ver_* TXT records
         in the absence of a Registration API"""
@@ -51,13 +52,17 @@ class IS0403Test(GenericTest):
         if CONFIG.DNS_SD_MODE != "multicast":
             return test.DISABLED("This test cannot be performed when DNS_SD_MODE is not 'multicast'")
 
-        ServiceBrowser(self.zc, "_nmos-node._tcp.local.", self.zc_listener)
+        service_type = "_nmos-node._tcp.local."
+        self.zc.browse(service_type)
         # Wait for n seconds for the Node to recognize it should adopt peer-to-peer operation
         start_time = time.time()
         while time.time() < start_time + CONFIG.DNS_SD_ADVERT_TIMEOUT:
             properties = None
-            time.sleep(CONFIG.DNS_SD_BROWSE_TIMEOUT)
-            node_list = self.zc_listener.get_service_list()
+            # Return as soon as the Node advertises for peer-to-peer operation
+            self.zc_listener.wait_for_service(
+                service_type, lambda node: service_at(api["ip"], api["port"])(node) and
+                "ver_slf" in self.convert_bytes(node.properties), CONFIG.DNS_SD_BROWSE_TIMEOUT)
+            node_list = self.zc_listener.get_service_list(service_type)
             # Iterate in reverse order to check the most recent advert first
             for node in reversed(node_list):
                 port = node.port
@@ -16,13 +16,11 @@
 
 
 import uuid
-import subprocess
-import tempfile
-import os
 from jsonschema import ValidationError, SchemaError
 
 from ..GenericTest import GenericTest
 from ..IS05Utils import IS05Utils
+from .. import SDPUtils
 from ..TestHelper import load_resolved_schema
 
 CONN_API_KEY = "connection"
@@ -641,6 +639,7 @@ class IS0501Test(GenericTest):
 
         if len(self.senders) > 0:
             warn = ""
+            self.is05_utils.pop_activation_metrics()
             for sender in self.is05_utils.sampled_list(self.senders):
                 valid, response = self.is05_utils.check_activation("sender", sender,
                                                                    self.is05_utils.check_perform_relative_activation,
@@ -656,10 +655,11 @@ class IS0501Test(GenericTest):
                                              .format(sender, response2))
                 else:
                     return test.FAIL(response)
+            metrics = self.is05_utils.pop_activation_metrics()
             if warn:
-                return test.WARNING(warn)
+                return test.WARNING("{} {}".format(warn, metrics))
             else:
-                return test.PASS()
+                return test.PASS(metrics)
         else:
             return test.UNCLEAR("Not tested. No resources found.")
 
@@ -668,6 +668,7 @@ class IS0501Test(GenericTest):
 
         if len(self.receivers) > 0:
             warn = ""
+            self.is05_utils.pop_activation_metrics()
             for receiver in self.is05_utils.sampled_list(self.receivers):
                 valid, response = self.is05_utils.check_activation("receiver", receiver,
                                                                    self.is05_utils.check_perform_relative_activation,
@@ -677,10 +678,11 @@ class IS0501Test(GenericTest):
                         warn = response
                 else:
                     return test.FAIL(response)
+            metrics = self.is05_utils.pop_activation_metrics()
             if warn:
-                return test.WARNING(warn)
+                return test.WARNING("{} {}".format(warn, metrics))
             else:
-                return test.PASS()
+                return test.PASS(metrics)
         else:
             return test.UNCLEAR("Not tested. No resources found.")
 
@@ -689,6 +691,7 @@ class IS0501Test(GenericTest):
 
         if len(self.senders) > 0:
             warn = ""
+            self.is05_utils.pop_activation_metrics()
             for sender in self.is05_utils.sampled_list(self.senders):
                 valid, response = self.is05_utils.check_activation("sender", sender,
                                                                    self.is05_utils.check_perform_absolute_activation,
@@ -704,10 +707,11 @@ class IS0501Test(GenericTest):
                                              .format(sender, response2))
                 else:
                     return test.FAIL(response)
+            metrics = self.is05_utils.pop_activation_metrics()
             if warn:
-                return test.WARNING(warn)
+                return test.WARNING("{} {}".format(warn, metrics))
             else:
-                return test.PASS()
+                return test.PASS(metrics)
         else:
             return test.UNCLEAR("Not tested. No resources found.")
 
@@ -716,6 +720,7 @@ class IS0501Test(GenericTest):
 
         if len(self.receivers) > 0:
             warn = ""
+            self.is05_utils.pop_activation_metrics()
             for receiver in self.is05_utils.sampled_list(self.receivers):
                 valid, response = self.is05_utils.check_activation("receiver", receiver,
                                                                    self.is05_utils.check_perform_absolute_activation,
@@ -725,10 +730,11 @@ class IS0501Test(GenericTest):
                         warn = response
                 else:
                     return test.FAIL(response)
+            metrics = self.is05_utils.pop_activation_metrics()
             if warn:
-                return test.WARNING(warn)
+                return test.WARNING("{} {}".format(warn, metrics))
             else:
-                return test.PASS()
+                return test.PASS(metrics)
         else:
             return test.UNCLEAR("Not tested. No resources found.")
 
@@ -904,7 +910,7 @@ class IS0501Test(GenericTest):
                 return test.UNCLEAR("Not tested. No resources found.")
 
     def test_41(self, test):
-        """SDP transport files pass SDPoker tests"""
+        """SDP transport files pass SDP conformance tests"""
 
         rtp_senders = []
         dup_senders = []
@@ -924,87 +930,30 @@ class IS0501Test(GenericTest):
         if len(rtp_senders) == 0:
             return test.UNCLEAR("Not tested. No resources found.")
 
-        # Check SDPoker version
-        sdpoker_min_version = "0.2.0"
-        try:
-            cmd_string = "sdpoker --version"
-            output = subprocess.check_output(cmd_string, stderr=subprocess.STDOUT, shell=True)
-            running_ver = output.decode("utf-8").split(".")
-            expected_ver = sdpoker_min_version.split(".")
-            if (running_ver[0] < expected_ver[0] or
-                    (running_ver[0] == expected_ver[0] and running_ver[1] < expected_ver[1]) or
-                    (running_ver[0] == expected_ver[0] and running_ver[1] == expected_ver[1] and
-                        running_ver[2] < expected_ver[2])):
-                return test.FAIL("SDPoker version is too old. Please update to version {}".format(sdpoker_min_version))
-        except (subprocess.CalledProcessError, IndexError):
-            return test.DISABLED("SDPoker may be unavailable on this system. Please see the README for "
-                                 "installation instructions.")
-
-        # First pass to check for errors
         access_error = False
+        sdp_warnings = []
+        for sender in rtp_senders:
+            path = "single/senders/{}/transportfile".format(sender)
+            url = self.url + path
+            valid, response = self.do_request("GET", url)
+            if valid and response.status_code == 200:
+                errors, warnings = SDPUtils.check_sdp(response.text, duplicate=sender in dup_senders, shaping=True)
+                if len(errors) > 0:
+                    return test.FAIL("SDP errors for Sender {} transport file: {}".format(sender, "; ".join(errors)))
+                if len(warnings) > 0:
+                    sdp_warnings.append("Sender {}: {}".format(sender, "; ".join(warnings)))
+            elif valid and response.status_code == 404:
+                access_error = True
+            else:
+                return test.FAIL("Unexpected response from Connection API "
+                                 "downloading SDP file for Sender {}: {}".format(sender, response))
 
-        sdp_files = {}
-        try:
-            # Download SDP files
-            for sender in rtp_senders:
-                path = "single/senders/{}/transportfile".format(sender)
-                url = self.url + path
-                valid, response = self.do_request("GET", url)
-                if valid and response.status_code == 200:
-                    file, temp_path = tempfile.mkstemp()
-                    for chunk in response.iter_content(chunk_size=128):
-                        os.write(file, chunk)
-                    os.close(file)
-                    sdp_files[sender] = temp_path
-                elif valid and response.status_code == 404:
-                    access_error = True
-                else:
-                    return test.FAIL("Unexpected response from Connection API "
-                                     "downloading SDP file for Sender {}: {}".format(sender, response))
+        if access_error:
+            return test.UNCLEAR("One or more of the tested transport files returned a 404 HTTP code. Please "
+                                "ensure 'master_enable' is set to true for all Senders and re-test.")
 
-            for sender in sdp_files:
-                dup_params = ""
-                if sender in dup_senders:
-                    dup_params = " --duplicate true"
-                try:
-                    cmd_string = "sdpoker --shaping true{} {}".format(dup_params, sdp_files[sender])
-                    output = subprocess.check_output(cmd_string, stderr=subprocess.STDOUT, shell=True)
-                    decoded_output = output.decode("utf-8")
-                    if "Error" in decoded_output:
-                        # This case exits with a zero error code so can't be handled in the exception
-                        # These usually start with "{ StatusCodeError:" or "Error:"
-                        return test.FAIL("SDPoker error for Sender {} transport file: {}"
-                                         .format(sender, decoded_output))
-                except subprocess.CalledProcessError as e:
-                    output = str(e.output, "utf-8")
-                    return test.FAIL("SDPoker error for Sender {} transport file: {}".format(sender, output))
-
-            # Second pass to check for warnings
-            for sender in sdp_files:
-                dup_params = ""
-                if sender in dup_senders:
-                    dup_params = " --duplicate true"
-                try:
-                    cmd_string = "sdpoker --shaping true --whitespace true --should true " \
-                                "--checkEndings true{} {}".format(dup_params, sdp_files[sender])
-                    output = subprocess.check_output(cmd_string, stderr=subprocess.STDOUT, shell=True)
-                    decoded_output = output.decode("utf-8")
-                    if "Error" in decoded_output:
-                        # This case exits with a zero error code so can't be handled in the exception
-                        # These usually start with "{ StatusCodeError:" or "Error:"
-                        return test.FAIL("SDPoker error for Sender {} transport file: {}"
-                                         .format(sender, decoded_output))
-                except subprocess.CalledProcessError as e:
-                    output = str(e.output, "utf-8")
-                    return test.WARNING("SDPoker warning for Sender {} transport file: {}".format(sender, output))
-
-            if access_error:
-                return test.UNCLEAR("One or more of the tested transport files returned a 404 HTTP code. Please "
-                                    "ensure 'master_enable' is set to true for all Senders and re-test.")
-
-        finally:
-            for sender in sdp_files:
-                os.remove(sdp_files[sender])
+        if len(sdp_warnings) > 0:
+            return test.WARNING("SDP warnings for transport files of {}".format(", ".join(sdp_warnings)))
 
         return test.PASS()
 
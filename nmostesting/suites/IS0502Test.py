@@ -22,6 +22,7 @@ from jinja2 import Template
 
 from ..GenericTest import GenericTest
 from ..IS05Utils import IS05Utils
+from .. import SDPUtils
 from .. import Config as CONFIG
 from ..GenericTest import NMOSTestException
 from ..TestHelper import compare_json, get_default_ip
@@ -43,7 +44,7 @@ class IS0502Test(GenericTest):
         self.node_url = self.apis[NODE_API_KEY]["url"]
         self.connection_url = self.apis[CONN_API_KEY]["url"]
         self.is05_resources = {"senders": [], "receivers": [], "_requested": [], "transport_types": {},
-                               "transport_files": {}}
+                               "transport_files": {}, "sdp_files": {}}
         self.is04_resources = {"senders": [], "receivers": [], "_requested": [], "sources": [], "flows": []}
         self.is05_utils = IS05Utils(self.connection_url)
 
@@ -100,6 +101,11 @@ class IS0502Test(GenericTest):
                 if resource_type == "senders":
                     transport_file = self.is05_utils.get_transportfile(resource_id)
                     self.is05_resources["transport_files"][resource_id] = transport_file
+                    # Parse each SDP file once, for use by all the tests which compare it with IS-04
+                    if transport_file is not None:
+                        self.is05_resources["sdp_files"][resource_id] = SDPUtils.parse_sdp(transport_file)
+                    else:
+                        self.is05_resources["sdp_files"][resource_id] = None
             self.is05_resources["_requested"].append(resource_type)
         except json.JSONDecodeError:
             return False, "Non-JSON response returned from Node API"
@@ -660,73 +666,67 @@ class IS0502Test(GenericTest):
                 flow = flow_map[resource["flow_id"]]
                 source = source_map[flow["source_id"]]
 
-                is05_transport_file = self.is05_resources["transport_files"][resource["id"]]
-                if is05_transport_file is None:
+                sdp_file = self.is05_resources["sdp_files"][resource["id"]]
+                if sdp_file is None:
                     return test.FAIL("Unable to download transportfile for Sender {}".format(resource["id"]))
 
-                payload_type = self.rtp_ptype(is05_transport_file)
-                if not payload_type:
+                if not sdp_file.payload_type:
                     return test.FAIL("Unable to locate payload type from rtpmap in SDP file for Sender {}"
                                      .format(resource["id"]))
 
-                for sdp_line in is05_transport_file.split("\n"):
-                    sdp_line = sdp_line.replace("\r", "")
-                    if sdp_line.startswith(r"a=rtpmap:"):
-                        # Perform a coarse check first
-                        rtpmap = re.search(r"^a=rtpmap:\d+ {}/.+$".format(flow["media_type"].split("/")[1]),
-                                           sdp_line)
-                        if not rtpmap:
-                            return test.FAIL(r"a=rtpmap does not match Flow media type {} for Sender {}"
-                                             .format(flow["media_type"], resource["id"]))
-
-                        if source["format"] == "urn:x-nmos:format:video":
-                            rtpmap = re.search(r"^a=rtpmap:\d+ {}/90000$".format(flow["media_type"].split("/")[1]),
-                                               sdp_line)
-                            if not rtpmap:
-                                return test.FAIL("a=rtpmap clock rate does not match expected rate for Flow media "
-                                                 "type {} and Sender {}".format(flow["media_type"], resource["id"]))
-                        elif source["format"] == "urn:x-nmos:format:audio":
-                            rtpmap = re.search(r"^a=rtpmap:\d+ L(\d+)\/(\d+)(?:\/(\d+))?$", sdp_line)
-                            if re.search(r"^audio\/L\d+$", flow["media_type"]):
-                                if not rtpmap:
-                                    return test.FAIL("a=rtpmap does not match pattern expected for Flow media type {} "
-                                                     "for Sender {}".format(flow["media_type"], resource["id"]))
-                                bit_depth = int(rtpmap.group(1))
-                                sample_rate = int(rtpmap.group(2))
-                                channels = int(rtpmap.group(3)) if rtpmap.group(3) is not None else 1
-                                if len(source["channels"]) != channels:
-                                    return test.FAIL("Number of channels for Sender {} does not match its Source {}"
-                                                     .format(resource["id"], source["id"]))
-                                if flow["bit_depth"] != bit_depth:
-                                    return test.FAIL("Bit depth for Sender {} does not match its Flow {}"
-                                                     .format(resource["id"], flow["id"]))
-                                if flow["sample_rate"]["numerator"] != sample_rate:
-                                    return test.FAIL("Sample rate for Sender {} does not match its Flow {}"
-                                                     .format(resource["id"], flow["id"]))
-                                if flow["media_type"] != "audio/L{}".format(bit_depth):
-                                    return test.FAIL("Mismatch between bit depth and media_type for Flow {}"
-                                                     .format(flow["id"]))
-                            elif rtpmap:
-                                return test.FAIL("a=rtpmap specifies a different media_type to the Flow for Sender {}"
-                                                 .format(resource["id"]))
-                        elif source["format"] == "urn:x-nmos:format:data":
-                            rtpmap = re.search(r"^a=rtpmap:\d+ smpte291/90000$", sdp_line)
-                            if flow["media_type"] == "video/smpte291":
-                                if not rtpmap:
-                                    return test.FAIL("a=rtpmap does not match pattern expected for Flow media type {} "
-                                                     "and Sender {}".format(flow["media_type"], resource["id"]))
-                            elif rtpmap:
-                                return test.FAIL("a=rtpmap specifies a different media_type to the Flow for Sender {}"
-                                                 .format(resource["id"]))
-                        elif source["format"] == "urn:x-nmos:format:mux":
-                            rtpmap = re.search(r"^a=rtpmap:\d+ SMPTE2022-6/27000000$", sdp_line)
-                            if flow["media_type"] == "video/SMPTE2022-6":
-                                if not rtpmap:
-                                    return test.FAIL("a=rtpmap does not match pattern expected for Flow media type {} "
-                                                     "and Sender {}".format(flow["media_type"], resource["id"]))
-                            elif rtpmap:
-                                return test.FAIL("a=rtpmap specifies a different media_type to the Flow for Sender {}"
-                                                 .format(resource["id"]))
+                media_subtype = flow["media_type"].split("/")[1]
+                for rtpmap in [rtpmap for media in sdp_file.media for rtpmap in media.rtpmaps.values()]:
+                    # Perform a coarse check first
+                    if rtpmap.encoding != media_subtype:
+                        return test.FAIL(r"a=rtpmap does not match Flow media type {} for Sender {}"
+                                         .format(flow["media_type"], resource["id"]))
+
+                    if source["format"] == "urn:x-nmos:format:video":
+                        if rtpmap.clock_rate != 90000 or rtpmap.parameters is not None:
+                            return test.FAIL("a=rtpmap clock rate does not match expected rate for Flow media "
+                                             "type {} and Sender {}".format(flow["media_type"], resource["id"]))
+                    elif source["format"] == "urn:x-nmos:format:audio":
+                        pcm = re.match(r"^L(\d+)$", rtpmap.encoding) and \
+                            (rtpmap.parameters is None or rtpmap.parameters.isdigit())
+                        if re.search(r"^audio\/L\d+$", flow["media_type"]):
+                            if not pcm:
+                                return test.FAIL("a=rtpmap does not match pattern expected for Flow media type {} "
+                                                 "for Sender {}".format(flow["media_type"], resource["id"]))
+                            bit_depth = int(rtpmap.encoding[1:])
+                            channels = int(rtpmap.parameters) if rtpmap.parameters is not None else 1
+                            if len(source["channels"]) != channels:
+                                return test.FAIL("Number of channels for Sender {} does not match its Source {}"
+                                                 .format(resource["id"], source["id"]))
+                            if flow["bit_depth"] != bit_depth:
+                                return test.FAIL("Bit depth for Sender {} does not match its Flow {}"
+                                                 .format(resource["id"], flow["id"]))
+                            if flow["sample_rate"]["numerator"] != rtpmap.clock_rate:
+                                return test.FAIL("Sample rate for Sender {} does not match its Flow {}"
+                                                 .format(resource["id"], flow["id"]))
+                            if flow["media_type"] != "audio/L{}".format(bit_depth):
+                                return test.FAIL("Mismatch between bit depth and media_type for Flow {}"
+                                                 .format(flow["id"]))
+                        elif pcm:
+                            return test.FAIL("a=rtpmap specifies a different media_type to the Flow for Sender {}"
+                                             .format(resource["id"]))
+                    elif source["format"] == "urn:x-nmos:format:data":
+                        expected = rtpmap[1:] == ("smpte291", 90000, None)
+                        if flow["media_type"] == "video/smpte291":
+                            if not expected:
+                                return test.FAIL("a=rtpmap does not match pattern expected for Flow media type {} "
+                                                 "and Sender {}".format(flow["media_type"], resource["id"]))
+                        elif expected:
+                            return test.FAIL("a=rtpmap specifies a different media_type to the Flow for Sender {}"
+                                             .format(resource["id"]))
+                    elif source["format"] == "urn:x-nmos:format:mux":
+                        expected = rtpmap[1:] == ("SMPTE2022-6", 27000000, None)
+                        if flow["media_type"] == "video/SMPTE2022-6":
+                            if not expected:
+                                return test.FAIL("a=rtpmap does not match pattern expected for Flow media type {} "
+                                                 "and Sender {}".format(flow["media_type"], resource["id"]))
+                        elif expected:
+                            return test.FAIL("a=rtpmap specifies a different media_type to the Flow for Sender {}"
+                                             .format(resource["id"]))
         except KeyError as ex:
             return test.FAIL("Expected attribute not found in IS-04 resource: {}".format(ex))
 
@@ -762,23 +762,21 @@ class IS0502Test(GenericTest):
                 flow = flow_map[resource["flow_id"]]
                 source = source_map[flow["source_id"]]
 
-                is05_transport_file = self.is05_resources["transport_files"][resource["id"]]
-                if is05_transport_file is None:
+                sdp_file = self.is05_resources["sdp_files"][resource["id"]]
+                if sdp_file is None:
                     return test.FAIL("Unable to download transportfile for Sender {}".format(resource["id"]))
 
-                payload_type = self.rtp_ptype(is05_transport_file)
+                payload_type = sdp_file.payload_type
                 if not payload_type:
                     return test.FAIL("Unable to locate payload type from rtpmap in SDP file for Sender {}"
                                      .format(resource["id"]))
 
-                for sdp_line in is05_transport_file.split("\n"):
-                    sdp_line = sdp_line.replace("\r", "")
-                    fmtp = re.search(r"^a=fmtp:{} (.+)$".format(payload_type), sdp_line)
-                    if fmtp and source["format"] == "urn:x-nmos:format:video":
-                        for param in fmtp.group(1).split(";"):
-                            param_components = param.strip().split("=")
-                            if param_components[0] == "sampling":  # ref: RFC4175 and ST.2110-20
-                                sampling_format = param_components[1].split("-")
+                for media in sdp_file.media:
+                    fmtp = media.fmtps.get(payload_type)
+                    if fmtp is not None and source["format"] == "urn:x-nmos:format:video":
+                        for name, value in fmtp.items():
+                            if name == "sampling":  # ref: RFC4175 and ST.2110-20
+                                sampling_format = value.split("-")
                                 components = sampling_format[0]
                                 if components in ["YCbCr", "ICtCp", "RGB"]:
                                     if len(flow["components"]) != 3:
@@ -809,83 +807,81 @@ class IS0502Test(GenericTest):
                                             return test.FAIL("Video Flow {} components do not match the expected "
                                                              "dimensions for Sender sampling {}"
                                                              .format(flow["id"], sampling))
-                            elif param_components[0] == "width":  # ref: RFC4175
-                                if flow["frame_width"] != int(param_components[1]):
+                            elif name == "width":  # ref: RFC4175
+                                if flow["frame_width"] != int(value):
                                     return test.FAIL("Width for Sender {} does not match its Flow {}"
                                                      .format(resource["id"], flow["id"]))
-                            elif param_components[0] == "height":  # ref: RFC4175
-                                if flow["frame_height"] != int(param_components[1]):
+                            elif name == "height":  # ref: RFC4175
+                                if flow["frame_height"] != int(value):
                                     return test.FAIL("Height for Sender {} does not match its Flow {}"
                                                      .format(resource["id"], flow["id"]))
-                            elif param_components[0] == "depth":  # ref: RFC4175
+                            elif name == "depth":  # ref: RFC4175
                                 for component in flow["components"]:
-                                    if component["bit_depth"] != int(param_components[1]):
+                                    if component["bit_depth"] != int(value):
                                         return test.FAIL("Bit depth for Sender {} does not match its Flow {}"
                                                          .format(resource["id"], flow["id"]))
-                            elif param_components[0] == "colorimetry":  # ref: RFC4175 and ST.2110-20
-                                if param_components[1].startswith("BT"):
+                            elif name == "colorimetry":  # ref: RFC4175 and ST.2110-20
+                                if value.startswith("BT"):
                                     # RFC4175 uses 'BT709-2', but ST.2110-20 uses 'BT709'
-                                    colorimetry_match = param_components[1].split("-")[0]
+                                    colorimetry_match = value.split("-")[0]
                                 else:
-                                    colorimetry_match = param_components[1]
+                                    colorimetry_match = value
                                 if flow["colorspace"] != colorimetry_match:
                                     return test.FAIL("Colorimetry for Sender {} does not match its Flow {}"
                                                      .format(resource["id"], flow["id"]))
-                            elif param_components[0] == "interlace":  # ref: RFC4175
+                            elif name == "interlace":  # ref: RFC4175
                                 if "interlace_mode" not in flow or flow["interlace_mode"] == "progressive":
                                     return test.FAIL("Interlace parameter for Sender {} does not match its Flow {}"
                                                      .format(resource["id"], flow["id"]))
-                                elif len(param_components) > 1:
+                                elif value is not None:
                                     return test.FAIL("Interlace parameter for Sender {} incorrectly includes an '='"
                                                      .format(resource["id"]))
-                            elif param_components[0] == "top-field-first":  # ref: RFC4175
+                            elif name == "top-field-first":  # ref: RFC4175
                                 if "interlace_mode" not in flow or flow["interlace_mode"] == "progressive":
                                     return test.FAIL("Top-field-first parameter for Sender {} does not match its Flow "
                                                      "{}".format(resource["id"], flow["id"]))
-                                elif len(param_components) > 1:
+                                elif value is not None:
                                     return test.FAIL("Top-field-first parameter for Sender {} incorrectly includes an "
                                                      "'='".format(resource["id"]))
-                            elif param_components[0] == "segmented":  # ref: ST.2110-20
+                            elif name == "segmented":  # ref: ST.2110-20
                                 if "interlace_mode" not in flow or flow["interlace_mode"] != "interlaced_psf":
                                     return test.FAIL("Segmented parameter for Sender {} does not match its Flow {}"
                                                      .format(resource["id"], flow["id"]))
-                                elif len(param_components) > 1:
+                                elif value is not None:
                                     return test.FAIL("Segmented parameter for Sender {} incorrectly includes an '='"
                                                      .format(resource["id"]))
-                            elif param_components[0] == "exactframerate":  # ref: ST.2110-20
+                            elif name == "exactframerate":  # ref: ST.2110-20
                                 if "grain_rate" not in source:
                                     return test.FAIL("No grain_rate found for Source {} associated with Sender {}"
                                                      .format(source["id"], resource["id"]))
                                 if "grain_rate" in flow:
-                                    flow_rate = self.exactframerate(flow["grain_rate"])
-                                    if param_components[1] != flow_rate:
+                                    flow_rate = SDPUtils.exactframerate(flow["grain_rate"])
+                                    if value != flow_rate:
                                         return test.FAIL("Exactframerate for Sender {} does not match its Flow {}"
                                                          .format(resource["id"], flow["id"]))
                                 else:
-                                    source_rate = self.exactframerate(source["grain_rate"])
-                                    if param_components[1] != source_rate:
+                                    source_rate = SDPUtils.exactframerate(source["grain_rate"])
+                                    if value != source_rate:
                                         return test.FAIL("Exactframerate for Sender {} does not match its Source {} "
                                                          "and is not overridden by the Flow"
                                                          .format(resource["id"], source["id"]))
-                            elif param_components[0] == "TCS":  # ref: ST.2110-20
-                                if "transfer_characteristic" not in flow and param_components[1] != "SDR":
+                            elif name == "TCS":  # ref: ST.2110-20
+                                if "transfer_characteristic" not in flow and value != "SDR":
                                     return test.FAIL("Transfer characteristic is missing from Flow attributes")
                                 elif "transfer_characteristic" in flow and \
-                                        flow["transfer_characteristic"] != param_components[1]:
+                                        flow["transfer_characteristic"] != value:
                                     return test.FAIL("TCS parameter for Sender {} does not match its Flow {}"
                                                      .format(resource["id"], flow["id"]))
-                    elif fmtp and flow["media_type"].startswith("audio/L"):
-                        for param in fmtp.group(1).split(";"):
-                            param_components = param.strip().split("=")
-                            if param_components[0] == "channel-order":  # ref: ST.2110-30
-                                if self.channel_order(source["channels"]) != param_components[1]:
+                    elif fmtp is not None and flow["media_type"].startswith("audio/L"):
+                        for name, value in fmtp.items():
+                            if name == "channel-order":  # ref: ST.2110-30
+                                if SDPUtils.channel_order(source["channels"]) != value:
                                     return test.FAIL("Channel-order parameter for Sender {} does not match its Source "
                                                      "{}".format(resource["id"], source["id"]))
-                    elif fmtp and flow["media_type"] == "video/smpte291":
-                        for param in fmtp.group(1).split(";"):
-                            param_components = param.strip().split("=")
-                            if param_components[0] == "DID_SDID":  # ref: RFC8331
-                                did, sdid = param_components[1].strip("{").rstrip("}").split(",")
+                    elif fmtp is not None and flow["media_type"] == "video/smpte291":
+                        for name, value in fmtp.items():
+                            if name == "DID_SDID":  # ref: RFC8331
+                                did, sdid = value.strip("{").rstrip("}").split(",")
                                 if "DID_SDID" not in flow:
                                     return test.FAIL("No DID_SDID found for Flow {} associated with Sender {}"
                                                      .format(flow["id"], resource["id"]))
@@ -930,11 +926,11 @@ class IS0502Test(GenericTest):
 
             flow = flow_map[resource["flow_id"]]
 
-            is05_transport_file = self.is05_resources["transport_files"][resource["id"]]
-            if is05_transport_file is None:
+            sdp_file = self.is05_resources["sdp_files"][resource["id"]]
+            if sdp_file is None:
                 return test.FAIL("Unable to download transportfile for Sender {}".format(resource["id"]))
 
-            payload_type = self.rtp_ptype(is05_transport_file)
+            payload_type = sdp_file.payload_type
             if not payload_type:
                 return test.FAIL("Unable to locate payload type from rtpmap in SDP file for Sender {}"
                                  .format(resource["id"]))
@@ -945,24 +941,21 @@ class IS0502Test(GenericTest):
             sdp_tcs = False
             sdp_did_sdid = False
 
-            for sdp_line in is05_transport_file.split("\n"):
-                sdp_line = sdp_line.replace("\r", "")
-                fmtp = re.search(r"^a=fmtp:{} (.+)$".format(payload_type), sdp_line)
-                if fmtp and flow["format"] == "urn:x-nmos:format:video":
-                    for param in fmtp.group(1).split(";"):
-                        param_components = param.strip().split("=")
-                        if param_components[0] == "interlace":  # ref: RFC4175
+            for media in sdp_file.media:
+                fmtp = media.fmtps.get(payload_type)
+                if fmtp is not None and flow["format"] == "urn:x-nmos:format:video":
+                    for name, value in fmtp.items():
+                        if name == "interlace":  # ref: RFC4175
                             sdp_interlace = True
-                        elif param_components[0] == "top-field-first":  # ref: RFC4175
+                        elif name == "top-field-first":  # ref: RFC4175
                             sdp_chroma_first_field = True
-                        elif param_components[0] == "segmented":  # ref: ST.2110-20
+                        elif name == "segmented":  # ref: ST.2110-20
                             sdp_segmented = True
-                        elif param_components[0] == "TCS":  # ref: ST.2110-20
+                        elif name == "TCS":  # ref: ST.2110-20
                             sdp_tcs = True
-                elif fmtp and flow["media_type"] == "video/smpte291":
-                    for param in fmtp.group(1).split(";"):
-                        param_components = param.strip().split("=")
-                        if param_components[0] == "DID_SDID":  # ref: RFC8331
+                elif fmtp is not None and flow["media_type"] == "video/smpte291":
+                    for name, value in fmtp.items():
+                        if name == "DID_SDID":  # ref: RFC8331
                             sdp_did_sdid = True
 
             if "DID_SDID" in flow and not sdp_did_sdid:
@@ -978,7 +971,7 @@ class IS0502Test(GenericTest):
                 return test.FAIL("Flow for Sender {} indicates video's transfer characteristic, but this is missing "
                                  "from its SDP file".format(resource["id"]))
 
-            # Technically the following is just SDP validation, so could move to sdpoker
+            # Technically the following is just SDP validation, so could move to SDPUtils
             if (sdp_chroma_first_field or sdp_segmented) and not sdp_interlace:
                 return test.FAIL("SDP file for Sender {} indicates top-field-first or segmented, but doesn't indicate "
                                  "interlace".format(resource["id"]))
@@ -1026,31 +1019,27 @@ class IS0502Test(GenericTest):
             flow = flow_map[resource["flow_id"]]
             source = source_map[flow["source_id"]]
 
-            is05_transport_file = self.is05_resources["transport_files"][resource["id"]]
-            if is05_transport_file is None:
+            sdp_file = self.is05_resources["sdp_files"][resource["id"]]
+            if sdp_file is None:
                 return test.FAIL("Unable to download transportfile for Sender {}".format(resource["id"]))
 
             found_refclk = False
             interface_bindings = deepcopy(resource["interface_bindings"])
-            for sdp_line in is05_transport_file.split("\n"):
-                sdp_line = sdp_line.replace("\r", "")
-                ts_refclk = re.search(r"^a=ts-refclk:(.+)$", sdp_line)
-                if not ts_refclk:
-                    continue
+            for ts_refclk in sdp_file.ts_refclks:
                 found_refclk = True
                 if source["clock_name"] is None:
                     return test.FAIL("SDP file includes ts-refclk but Source {} does not indicate a clock_name"
                                      .format(source["id"]))
 
                 is04_clock = clock_map[source["clock_name"]]
-                if is04_clock["ref_type"] == "internal" and ts_refclk.group(1).startswith("ptp="):
+                if is04_clock["ref_type"] == "internal" and ts_refclk.startswith("ptp="):
                     return test.FAIL("IS-04 Source indicates 'internal' clock but SDP file indicates 'ptp' for Sender "
                                      "{}".format(resource["id"]))
                 elif is04_clock["ref_type"] == "ptp":
-                    if not ts_refclk.group(1).startswith("ptp="):
+                    if not ts_refclk.startswith("ptp="):
                         return test.FAIL("IS-04 Source indicates 'ptp' clock but SDP file indicates '{}' for Sender "
-                                         "{}".format(ts_refclk.group(1), resource["id"]))
-                    ptp_data = ts_refclk.group(1).strip("ptp=").split(":")
+                                         "{}".format(ts_refclk, resource["id"]))
+                    ptp_data = ts_refclk[len("ptp="):].split(":")
                     if is04_clock["version"] != ptp_data[0]:
                         return test.FAIL("IS-04 Source PTP version {} does not match ts-refclk PTP version {} for "
                                          "Sender {}".format(is04_clock["version"], ptp_data[0], resource["id"]))
@@ -1061,12 +1050,12 @@ class IS0502Test(GenericTest):
                         return test.FAIL("IS-04 Source PTP clock traceability does not match ts-refclk for Sender {}"
                                          .format(resource["id"]))
 
-                if ts_refclk.group(1).startswith("localmac="):
+                if ts_refclk.startswith("localmac="):
                     try:
                         # This assumes that ts-refclk isn't specified globally, but this shouldn't be the case when
                         # localmac is used given each RTP sender is likely to use a different interface
                         api_mac = interface_map[interface_bindings[0]]["port_id"]
-                        sdp_mac = ts_refclk.group(1).strip("localmac=").lower()
+                        sdp_mac = ts_refclk[len("localmac="):].lower()
                         if api_mac != sdp_mac:
                             return test.FAIL("IS-04 interface_binding MAC does not match SDP ts-refclk localmac for "
                                              "Sender {}".format(resource["id"]))
@@ -1197,50 +1186,6 @@ class IS0502Test(GenericTest):
         else:
             return test.UNCLEAR("No RTP Receivers found with an accepted 'media_type' we can currently test")
 
-    def exactframerate(self, grain_rate):
-        """Format an NMOS grain rate like the SDP video format-specific parameter 'exactframerate'"""
-        d = grain_rate.get("denominator", 1)
-        if d == 1:
-            return "{}".format(grain_rate.get("numerator"))
-        else:
-            return "{}/{}".format(grain_rate.get("numerator"), d)
-
-    def rtp_ptype(self, sdp_file):
-        """Extract the payload type from an SDP file string"""
-        payload_type = None
-        for sdp_line in sdp_file.split("\n"):
-            sdp_line = sdp_line.replace("\r", "")
-            try:
-                payload_type = int(re.search(r"^a=rtpmap:(\d+) ", sdp_line).group(1))
-            except Exception:
-                pass
-        return payload_type
-
-    def channel_order(self, channels):
-        """Create an ST.2110-30 'channel-order' format-specific parameter value from an NMOS audio source 'channels'"""
-        # first, straightforward comma-separated channel symbols (or "?" if omitted)
-        symbols = ",".join([_["symbol"] if "symbol" in _ else "?" for _ in channels])
-
-        # second, replace all ST.2110-30 defined groups with their grouping symbol
-        GROUPS = [
-            ["L,R,C,LFE,Lss,Rss,Lrs,Rrs", "71"],
-            ["L,R,C,LFE,Ls,Rs", "51"],
-            ["Lt,Rt", "LtRt"],
-            ["L,R", "ST"],
-            ["M1,M2", "DM"],
-            ["M1", "M"]
-        ]
-        for G in GROUPS:
-            symbols = symbols.replace(G[0], G[1])
-
-        # third, replace all other channel symbols with 'U'
-        groups = ",".join([_ if _ in [G[1] for G in GROUPS] else "U" for _ in symbols.split(",")])
-
-        # finally, replace all sequences of 'U' with the required undefined grouping symbol
-        # and format as per ST.2110-30
-        return "SMPTE2110.({})" \
-               .format(re.sub(r"U(,U)*", lambda us: "U{:02d}".format(int((len(us.group())+1)/2)), groups))
-
     def do_test_node_api_v1_2(self, test):
         """
         Precondition check of the API version.
@@ -19,7 +19,7 @@ from collections import namedtuple
 from enum import Enum, auto
 
 from .. import Config as CONFIG
-from ..GenericTest import GenericTest, NMOSTestException
+from ..GenericTest import GenericTest, NMOSTestException, test_tags
 from ..IS04Utils import IS04Utils
 from ..IS05Utils import IS05Utils
 from ..IS07Utils import IS07Utils
@@ -214,6 +214,7 @@ class IS0702Test(GenericTest):
         else:
             return test.UNCLEAR("Not tested. No resources found.")
 
+    @test_tags("websocket")
     def test_03(self, test):
         """WebSocket senders on the same device have the same connection_uri and connection_authorization parameters"""
 
@@ -275,6 +276,7 @@ class IS0702Test(GenericTest):
         else:
             return test.UNCLEAR("Not tested. No resources found.")
 
+    @test_tags("websocket", "slow")
     def test_04(self, test):
         """WebSocket connections lifecycle tests"""
 
@@ -429,6 +431,7 @@ class IS0702Test(GenericTest):
         else:
             return test.UNCLEAR("Not tested. No resources found.")
 
+    @test_tags("websocket", "slow")
     def test_05(self, test):
         """WebSocket state messages tests"""
 
@@ -495,6 +498,7 @@ class IS0702Test(GenericTest):
         else:
             return test.UNCLEAR("Not tested. No resources found.")
 
+    @test_tags("mqtt")
     def test_06(self, test):
         """MQTT messages tests for each MQTT sender"""
 
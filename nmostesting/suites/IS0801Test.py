@@ -12,7 +12,6 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import time
 import copy
 
 from ..GenericTest import GenericTest, NMOSTestException
@@ -25,6 +24,7 @@ from .is08.outputs import getOutputList
 from .is08.active import Active
 from .is08.io import IO
 from .is08.testConfig import globalConfig
+from .. import Config as CONFIG
 
 
 MAPPING_API_KEY = "channelmapping"
@@ -89,17 +89,17 @@ class IS0801Test(GenericTest):
         """Relative offset activations can be called on the API"""
         globalConfig.test = test
 
-        self.check_delayed_activation(SCHEDULED_RELATIVE_ACTIVATION)
+        metrics = self.check_delayed_activation(SCHEDULED_RELATIVE_ACTIVATION)
 
-        return test.PASS()
+        return test.PASS(metrics)
 
     def test_04(self, test):
         """Absolute offset activations can be called on the API"""
         globalConfig.test = test
 
-        self.check_delayed_activation(SCHEDULED_ABSOLUTE_ACTIVATION)
+        metrics = self.check_delayed_activation(SCHEDULED_ABSOLUTE_ACTIVATION)
 
-        return test.PASS()
+        return test.PASS(metrics)
 
     def test_05(self, test):
         """Activations can be deleted once created"""
@@ -117,11 +117,9 @@ class IS0801Test(GenericTest):
         try:
             activation.fireActivation()
         except NMOSTestException as e:
-            time.sleep(2)
+            IS05Utils.sleep_until_TAI(self.get_activation_target(activation))
             raise e
 
-        time.sleep(1)
-
         activation.delete()
 
         return test.PASS()
@@ -424,14 +422,37 @@ class IS0801Test(GenericTest):
         try:
             activation.fireActivation()
         except NMOSTestException as e:
-            time.sleep(3)
+            # Allow any activation which was scheduled to complete before the next test
+            IS05Utils.sleep_until_TAI(self.get_activation_target(activation) + CONFIG.API_PROCESSING_TIMEOUT)
             raise e
+        activationTarget = self.get_activation_target(activation)
 
         pendingState = active.buildJSONObject()
         if not compare_json(preActivationState, pendingState):
             res = globalConfig.test.FAIL("Scheduled Activation completed immediately")
             raise NMOSTestException(res)
 
-        time.sleep(3)
+        # Poll from the time the activation is due, rather than waiting for the worst case
+        for late in IS05Utils.poll_TAI_deadline(activationTarget, CONFIG.API_PROCESSING_TIMEOUT):
+            try:
+                active.assertActionsCompleted(activation.getActions())
+                break
+            except NMOSTestException:
+                if late >= CONFIG.API_PROCESSING_TIMEOUT:
+                    raise
 
-        active.assertActionsCompleted(activation.getActions())
+        metrics = "Scheduled activation latency: {:.3f}s".format(late)
+        try:
+            activationTime = IS05Utils.TAI_to_seconds(active.buildJSONObject()['activation']['activation_time'])
+            metrics += ", activation_time skew: {:+.3f}s".format(activationTime - activationTarget)
+        except (KeyError, TypeError, AttributeError, ValueError):
+            pass
+        return metrics
+
+    def get_activation_target(self, activation):
+        """Get the TAI time in seconds at which a scheduled activation which has just been fired is due"""
+        if activation.type == SCHEDULED_ABSOLUTE_ACTIVATION:
+            return IS05Utils.TAI_to_seconds(activation.activationTimestamp)
+        else:
+            # Relative activations are scheduled from when the API received the request, no later than now
+            return IS05Utils.get_TAI_seconds() + IS05Utils.TAI_to_seconds(activation.activationTimestamp)
@@ -14,11 +14,12 @@
 
 import time
 import socket
-from zeroconf_monkey import ServiceInfo, Zeroconf
+from dnslib import QTYPE
+from zeroconf_monkey import ServiceInfo
 
 from .. import Config as CONFIG
-from ..MdnsListener import MdnsListener
-from ..GenericTest import GenericTest
+from ..MdnsManager import MDNS_MANAGER
+from ..GenericTest import GenericTest, test_tags
 from ..TestHelper import get_default_ip
 
 NODE_API_KEY = "node"
@@ -42,19 +43,31 @@ class IS0902Test(GenericTest):
         self.system_invalid_data = None
         self.zc = None
         self.zc_listener = None
+        self.dns_start_time = None
 
     def set_up_tests(self):
-        self.zc = Zeroconf()
-        self.zc_listener = MdnsListener(self.zc)
+        self.zc = MDNS_MANAGER.open()
+        self.zc_listener = MDNS_MANAGER.get_listener()
         if self.dns_server:
+            self.dns_start_time = time.time()
             self.dns_server.load_zone(self.apis[SYSTEM_API_KEY]["version"], self.protocol, self.authorization,
                                       "test_data/IS0902/dns_records.zone", CONFIG.PORT_BASE+300)
+            print(" * Waiting for up to {} seconds for a DNS query before executing tests"
+                  .format(CONFIG.DNS_SD_ADVERT_TIMEOUT))
+            self.dns_server.wait_for_query(
+                QTYPE.PTR,
+                ["_nmos-system._tcp.{}.".format(CONFIG.DNS_DOMAIN)],
+                CONFIG.DNS_SD_ADVERT_TIMEOUT,
+                since=self.dns_start_time
+            )
 
     def tear_down_tests(self):
         if self.zc:
             self.zc.close()
             self.zc = None
         if self.dns_server:
+            # Attach a summary of the DNS queries made by each client during the tests to the unicast DNS-SD test
+            self.attach_dns_metrics(self.dns_server, "test_02", self.dns_start_time)
             self.dns_server.reset()
 
     def _system_mdns_info(self, port, priority=0, api_ver=None, api_proto=None, api_auth=None, ip=None):
@@ -156,6 +169,7 @@ class IS0902Test(GenericTest):
         if len(self.system_invalid_data.requests) > 0:
             self.system_primary_data.requests.update(self.system_invalid_data.requests)
 
+    @test_tags("dns-sd")
     def test_01(self, test):
         """Node can discover System API via multicast DNS"""
 
@@ -170,6 +184,7 @@ class IS0902Test(GenericTest):
 
         return test.FAIL("Node did not attempt to contact the advertised System API.")
 
+    @test_tags("dns-sd")
     def test_01_01(self, test):
         """Node does not attempt to contact an unsuitable System API"""
 
@@ -184,6 +199,7 @@ class IS0902Test(GenericTest):
 
         return test.PASS()
 
+    @test_tags("dns-sd")
     def test_02(self, test):
         """Node can discover System API via unicast DNS"""
 
@@ -198,6 +214,7 @@ class IS0902Test(GenericTest):
 
         return test.FAIL("Node did not attempt to contact the advertised System API.")
 
+    @test_tags("dns-sd")
     def test_02_01(self, test):
         """Node does not attempt to contact an unsuitable System API"""
 
@@ -231,6 +248,7 @@ class IS0902Test(GenericTest):
 
         return test.PASS()
 
+    @test_tags("dns-sd")
     def test_04(self, test):
         """Node correctly selects a System API based on advertised priorities"""
 
@@ -15,14 +15,13 @@
 import json
 import socket
 import requests
-from time import sleep
 from urllib.parse import parse_qs
 from OpenSSL import crypto
 
-from ..GenericTest import GenericTest, NMOSTestException, NMOSInitException
+from ..GenericTest import GenericTest, NMOSTestException, NMOSInitException, test_tags
 from .. import Config as CONFIG
-from zeroconf_monkey import ServiceBrowser, Zeroconf
-from ..MdnsListener import MdnsListener
+from ..MdnsListener import service_at
+from ..MdnsManager import MDNS_MANAGER
 
 AUTH_API_KEY = 'auth'
 GRANT_SCOPES = ['is-04', 'is-05']
@@ -59,8 +58,8 @@ class IS1001Test(GenericTest):
         self.auth_codes = []
         self.clients = []  # List of all registered clients for deleting during clean-up
 
-        self.zc = Zeroconf()
-        self.zc_listener = MdnsListener(self.zc)
+        self.zc = MDNS_MANAGER.open()
+        self.zc_listener = MDNS_MANAGER.get_listener()
 
     def set_up_tests(self):
         """Print reminder to Add User to Authorization Server"""
@@ -189,9 +188,10 @@ class IS1001Test(GenericTest):
         if CONFIG.DNS_SD_MODE != "multicast":
             return test.DISABLED("This test cannot be performed when DNS_SD_MODE is not 'multicast'")
 
-        ServiceBrowser(self.zc, service_type, self.zc_listener)
-        sleep(CONFIG.DNS_SD_BROWSE_TIMEOUT)
-        serv_list = self.zc_listener.get_service_list()
+        self.zc.browse(service_type)
+        self.zc_listener.wait_for_service(service_type, service_at(api["ip"], api["port"]),
+                                          CONFIG.DNS_SD_BROWSE_TIMEOUT)
+        serv_list = self.zc_listener.get_service_list(service_type)
         for service in serv_list:
             port = service.port
             if port != api["port"]:
@@ -227,6 +227,7 @@ class IS1001Test(GenericTest):
                 return test.WARNING("Authorization Server SHOULD NOT be advertised by mDNS based DNS-SD")
         return test.PASS()
 
+    @test_tags("dns-sd")
     def test_01(self, test):
         """Registration API advertises correctly via mDNS"""
 
@@ -0,0 +1,70 @@
+#!/usr/bin/python
+
+# Copyright (C) 2021 Advanced Media Workflow Association
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+# Allow the testing tool's modules to be imported when run from this directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from nmostesting.TestResult import Test  # noqa: E402
+
+
+def test_named(count):
+    """Create tests with explicit names, as for the test_ methods of each suite"""
+    return [Test("Named test", "test_{}".format(index)).PASS() for index in range(count)]
+
+
+def test_unnamed(count):
+    """Create tests named after the calling function, as for many of the automatically generated tests"""
+    return [Test("Unnamed test").PASS() for _ in range(count)]
+
+
+def format_timestamps(results):
+    for result in results:
+        result.output()
+
+
+def benchmark(function, *args):
+    start = time.perf_counter()
+    value = function(*args)
+    return time.perf_counter() - start, value
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=100000, help="Number of results to create")
+    args = parser.parse_args()
+
+    print("{:<40} {:>10} {:>14}".format("Operation", "Time (s)", "Per result (us)"))
+
+    named_time, results = benchmark(test_named, args.count)
+    unnamed_time, results = benchmark(test_unnamed, args.count)
+    output_time, _ = benchmark(format_timestamps, results)
+    for name, duration in [("Create named tests and results", named_time),
+                           ("Create unnamed tests and results", unnamed_time),
+                           ("Format results for output", output_time)]:
+        print("{:<40} {:>10.3f} {:>14.2f}".format(name, duration, duration * 1e6 / args.count))
+
+    del results
+    tracemalloc.start()
+    results = test_named(args.count)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("Memory per result: {:.0f} bytes".format(size / args.count))
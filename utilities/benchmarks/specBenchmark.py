@@ -0,0 +1,67 @@
+#!/usr/bin/python
+
+# Copyright (C) 2021 Advanced Media Workflow Association
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import os
+import sys
+import time
+
+# Allow the testing tool's modules to be imported when run from this directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from nmostesting import Config as CONFIG  # noqa: E402
+from nmostesting import Specification as SpecificationModule  # noqa: E402
+from nmostesting import TestHelper  # noqa: E402
+from nmostesting.Specification import Specification  # noqa: E402
+
+
+def benchmark_raml(raml_path, repeats):
+    """Time parsing a RAML file from cold, and resolving all of its schemas"""
+    parse_times = []
+    resolve_times = []
+    for _ in range(repeats):
+        TestHelper.clear_schema_cache()
+        # Clear the RAML which was fixed up by a previous repeat, so that every parse is from cold
+        SpecificationModule._fixed_raml.clear()
+        start = time.perf_counter()
+        spec = Specification(raml_path)
+        parse_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        spec.resolve_all_schemas()
+        resolve_times.append(time.perf_counter() - start)
+    return min(parse_times), min(resolve_times), len(spec.resolved_schemas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cache", default=os.path.join(os.path.dirname(__file__), "..", "..", CONFIG.CACHE_PATH),
+                        help="Path to the testing tool's specification cache")
+    parser.add_argument("--repeats", type=int, default=3, help="Number of times to parse each RAML file")
+    args = parser.parse_args()
+
+    print("{:<30} {:>10} {:>12} {:>8}".format("API", "Parse (s)", "Resolve (s)", "Schemas"))
+    for spec_key, spec in CONFIG.SPECIFICATIONS.items():
+        for api_key, api in spec["apis"].items():
+            if "raml" not in api:
+                continue
+            raml_path = os.path.join(args.cache, spec_key, "APIs", api["raml"])
+            if not os.path.exists(raml_path):
+                print(" * Skipping {}, not found in the specification cache".format(raml_path))
+                continue
+            parse_time, resolve_time, schema_count = benchmark_raml(raml_path, args.repeats)
+            print("{:<30} {:>10.3f} {:>12.3f} {:>8}".format(spec_key + " " + api_key, parse_time, resolve_time,
+                                                            schema_count))
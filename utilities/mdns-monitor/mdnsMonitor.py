@@ -14,86 +14,219 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import time
-import os
-import queue
-
-from zeroconf_monkey import ServiceBrowser, Zeroconf
+import argparse
+import datetime
+import ipaddress
+import json
+import sys
+
+from concurrent.futures import ThreadPoolExecutor
+from zeroconf_monkey import ServiceBrowser, ServiceStateChange, Zeroconf
 from socket import inet_ntoa
-from threading import Thread
+from threading import Event, Lock
 
 MONITOR_TYPES = ["_nmos-registration._tcp", "_nmos-register._tcp", "_nmos-query._tcp", "_nmos-system._tcp"]
-IP_WHITELIST = ["172.29.80.195", "172.29.80.196"]
 
+COUNTERS = ["adds", "updates", "removals", "resolutions", "failures"]
+
+
+def timestamp():
+    return datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def decode(value):
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return value
 
-class Listener:
-    def __init__(self):
-        self.services = {}
-        self._resolve_queue = queue.Queue()
-
-    def add_service(self, zeroconf, srv_type, name):
-        self._resolve_queue.put((srv_type, name, zeroconf))
-        resolveThread = Thread(target=self._resolve_service_details)
-        resolveThread.daemon = True
-        resolveThread.start()
-
-    def _resolve_service_details(self):
-        parameters = self._resolve_queue.get()
-        srv_type = parameters[0]
-        name = parameters[1]
-        zeroconf = parameters[2]
-        info = zeroconf.get_service_info(srv_type, name)
-        self._update_record(srv_type, name, info)
-        self._resolve_queue.task_done()
-
-    def _update_record(self, srv_type, name, info):
-        try:
-            self.services[srv_type][name] = info
-        except KeyError:
-            self.services[srv_type] = {}
-            self.services[srv_type][name] = info
-
-    def remove_service(self, zeroconf, srv_type, name):
-        try:
-            self.services[srv_type].pop(name, None)
-        except KeyError:
-            pass
-
-    def print_services(self):
-        os.system("clear")
-        for srv_type in self.services:
-            print("Unexpected services of type '{}'".format(srv_type))
-            for name in sorted(self.services[srv_type]):
-                info = self.services[srv_type][name]
-                if info:
-                    address = inet_ntoa(info.address)
-                    if address not in IP_WHITELIST:
-                        self._print_entry(name, info)
-                else:
-                    self._print_entry(name)
-            print("")
-
-    def _print_entry(self, name, info=None):
-        print(" - {}".format(name))
-        if info is not None:
-            address = inet_ntoa(info.address)
-            print("     Address: {}, Port: {}, TXT: {}".format(address, info.port, info.properties))
-        else:
-            print("     Unresolvable")
 
+def local_type(srv_type):
+    """Qualify a service type such as '_nmos-query._tcp', '_nmos-query._tcp.local' or '_nmos-query._tcp.local.'
+    with the '.local.' domain"""
+    srv_type = srv_type.rstrip(".")
+    if srv_type.endswith(".local"):
+        srv_type = srv_type[:-len(".local")]
+    return srv_type + ".local."
 
-zeroconf = Zeroconf()
-listener = Listener()
 
-for srv_type in MONITOR_TYPES:
-    browser = ServiceBrowser(zeroconf, srv_type + ".local.", listener)
+class AllowList:
+    """IP addresses and networks whose advertisements are expected, and therefore not reported"""
 
-try:
-    while True:
-        listener.print_services()
-        time.sleep(1)
-except KeyboardInterrupt:
-    pass
-finally:
-    print("* Shutting down, please wait...")
-    zeroconf.close()
+    def __init__(self, entries):
+        self.networks = [ipaddress.ip_network(entry, strict=False) for entry in entries]
+
+    def allows(self, addresses):
+        return len(addresses) > 0 and all(any(ipaddress.ip_address(address) in network
+                                              for network in self.networks) for address in addresses)
+
+
+class Monitor:
+    """Maintains a table of the unexpected services, and emits a JSON line for each change to it"""
+
+    def __init__(self, allow_list, output, workers):
+        self.allow_list = allow_list
+        self.output = output
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.lock = Lock()
+        # Reported services by (type, name), and the keys of those services by address
+        self.services = {}
+        self.by_address = {}
+        # Resolutions in progress by (type, name), and whether another has been requested since each one started
+        self.resolving = {}
+        self.counters = {}
+
+    def on_service_state_change(self, zeroconf, service_type, name, state_change):
+        key = (service_type, name)
+        if state_change is ServiceStateChange.Removed:
+            with self.lock:
+                self._count(service_type, "removals")
+                self._remove(key)
+            return
+        with self.lock:
+            if key in self.resolving:
+                self.resolving[key] = True
+                return
+            self.resolving[key] = False
+        self.pool.submit(self._resolve, zeroconf, key)
+
+    def _resolve(self, zeroconf, key):
+        while True:
+            try:
+                info = zeroconf.get_service_info(key[0], key[1])
+            except Exception:
+                info = None
+            with self.lock:
+                self._update(key, info)
+                if not self.resolving[key]:
+                    del self.resolving[key]
+                    return
+                self.resolving[key] = False
+
+    def _count(self, service_type, counter):
+        counters = self.counters.setdefault(service_type, dict.fromkeys(COUNTERS, 0))
+        counters[counter] += 1
+
+    def _update(self, key, info):
+        self._count(key[0], "resolutions")
+        if info is not None:
+            record = {
+                "addresses": [inet_ntoa(address) for address in info.addresses if len(address) == 4],
+                "port": info.port,
+                "server": info.server,
+                "txt": {decode(name): decode(value) for name, value in info.properties.items()}
+            }
+            if self.allow_list.allows(record["addresses"]):
+                # The service may previously have been advertised from an unexpected address
+                self._remove(key)
+                return
+        elif key in self.services:
+            # Keep the record of a known service, as a failed resolution may just be a timeout
+            self._count(key[0], "failures")
+            return
+        else:
+            self._count(key[0], "failures")
+            record = {"unresolvable": True}
+
+        previous = self.services.get(key)
+        if previous == record:
+            return
+        if previous is not None:
+            self._unindex(key, previous)
+        self.services[key] = record
+        for address in record.get("addresses", []):
+            self.by_address.setdefault(address, set()).add(key)
+        self._count(key[0], "adds" if previous is None else "updates")
+        self._emit(dict({"event": "add" if previous is None else "update", "type": key[0], "name": key[1]},
+                        **record))
+
+    def _remove(self, key):
+        record = self.services.pop(key, None)
+        if record is not None:
+            self._unindex(key, record)
+            self._emit({"event": "remove", "type": key[0], "name": key[1]})
+
+    def _unindex(self, key, record):
+        for address in record.get("addresses", []):
+            keys = self.by_address.get(address)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.by_address[address]
+
+    def _emit(self, event):
+        self.output.write(json.dumps(dict({"time": timestamp()}, **event)) + "\n")
+        self.output.flush()
+
+    def emit_statistics(self, interval):
+        """Emit the number of unexpected services and the rate of changes of each type since the last call"""
+        with self.lock:
+            current = {}
+            for service_type, _ in self.services:
+                current[service_type] = current.get(service_type, 0) + 1
+            for service_type in sorted(set(current) | set(self.counters)):
+                counters = self.counters.get(service_type, dict.fromkeys(COUNTERS, 0))
+                event = {"event": "stats", "type": service_type, "services": current.get(service_type, 0),
+                         "addresses": len([address for address, keys in self.by_address.items()
+                                           if any(key[0] == service_type for key in keys)]),
+                         "interval": interval}
+                for counter, count in counters.items():
+                    event["{}_per_s".format(counter)] = round(count / interval, 3)
+                self._emit(event)
+            self.counters = {}
+
+    def close(self):
+        self.pool.shutdown(wait=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monitor for unexpected mDNS advertisements, emitting each change "
+                                                 "as a line of JSON")
+    parser.add_argument("--type", action="append", dest="types", metavar="SERVICE_TYPE",
+                        help="Service type to monitor, which may be repeated (default: {})"
+                        .format(", ".join(MONITOR_TYPES)))
+    parser.add_argument("--allow", action="append", default=[], metavar="ADDRESS",
+                        help="IP address or network (e.g. 192.168.1.0/24) whose advertisements are expected, "
+                             "which may be repeated")
+    parser.add_argument("--allow-file", metavar="FILE",
+                        help="File listing IP addresses or networks whose advertisements are expected, one per line")
+    parser.add_argument("--workers", type=int, default=8, help="Number of threads used to resolve services")
+    parser.add_argument("--stats-interval", type=float, default=60,
+                        help="Number of seconds between statistics for each service type, or 0 to disable them")
+    parser.add_argument("--output", help="File to append the JSON lines to (default: standard output)")
+    args = parser.parse_args()
+
+    allow = list(args.allow)
+    if args.allow_file:
+        with open(args.allow_file) as allow_file:
+            for line in allow_file:
+                line = line.split("#")[0].strip()
+                if line:
+                    allow.append(line)
+    try:
+        allow_list = AllowList(allow)
+    except ValueError as e:
+        parser.error(str(e))
+
+    output = open(args.output, "a") if args.output else sys.stdout
+    monitor = Monitor(allow_list, output, args.workers)
+
+    zeroconf = Zeroconf()
+    service_types = [local_type(srv_type) for srv_type in args.types or MONITOR_TYPES]
+    ServiceBrowser(zeroconf, service_types, handlers=[monitor.on_service_state_change])
+
+    stopped = Event()
+    try:
+        while not stopped.wait(args.stats_interval if args.stats_interval > 0 else None):
+            monitor.emit_statistics(args.stats_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("* Shutting down, please wait...", file=sys.stderr)
+        zeroconf.close()
+        monitor.close()
+        if args.output:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
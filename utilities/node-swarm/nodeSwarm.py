@@ -0,0 +1,73 @@
+#!/usr/bin/python
+
+# Copyright (C) 2021 Advanced Media Workflow Association
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+# Allow the testing tool's modules to be imported when run from this directory
+ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, ROOT_PATH)
+
+from nmostesting import Config as CONFIG  # noqa: E402
+from nmostesting.mocks.Swarm import Swarm  # noqa: E402
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--registration-url", required=True,
+                        help="Registration API base URL, e.g. http://<ip>:<port>/x-nmos/registration/v1.3/")
+    parser.add_argument("--nodes", type=int, default=1000, help="Number of virtual Nodes to simulate")
+    parser.add_argument("--port-base", type=int, default=CONFIG.PORT_BASE + 1000,
+                        help="Port of the first virtual Node's API. Each further Node uses the next port")
+    parser.add_argument("--host", default=None,
+                        help="Address advertised for the virtual Nodes' APIs (defaults to this machine's address)")
+    parser.add_argument("--jitter", type=float, default=0.1,
+                        help="Fraction of the heartbeat interval by which each heartbeat may be brought forward")
+    parser.add_argument("--workers", type=int, default=50,
+                        help="Maximum number of concurrent Registration API requests")
+    parser.add_argument("--duration", type=int, default=0,
+                        help="Number of seconds to run for. By default, runs until interrupted")
+    parser.add_argument("--report-interval", type=int, default=10,
+                        help="Number of seconds between reports of the swarm's counters")
+    args = parser.parse_args()
+
+    # The testing tool's test data is referenced relative to its root directory
+    os.chdir(ROOT_PATH)
+
+    swarm = Swarm(args.registration_url, args.nodes, args.port_base, args.host, args.jitter, args.workers)
+    try:
+        swarm.start()
+    except OSError as e:
+        print(" * ERROR: Unable to serve the virtual Node APIs: {}".format(e))
+        sys.exit(1)
+
+    print(" * Simulating {} virtual Nodes on ports {}-{}".format(args.nodes, args.port_base,
+                                                                 args.port_base + args.nodes - 1))
+    start = time.time()
+    try:
+        while args.duration <= 0 or time.time() - start < args.duration:
+            time.sleep(args.report_interval if args.duration <= 0
+                       else max(min(args.report_interval, args.duration - (time.time() - start)), 0))
+            print(json.dumps(swarm.get_counters()))
+    except KeyboardInterrupt:
+        pass
+
+    print(" * Removing the virtual Nodes from the registry")
+    swarm.stop()
+    print(json.dumps(swarm.get_counters()))
@@ -1,5 +1,3 @@
 #!/bin/bash
-for filename in ~/Downloads/nmos-test-results/*.json; do
-    printf "$filename\n"
-    python3 resultsImporter.py --json "$filename" --sheet "$1"
-done
+# All the results files are imported together, with one batch update per worksheet
+python3 resultsImporter.py --json ~/Downloads/nmos-test-results/*.json --sheet "$1"
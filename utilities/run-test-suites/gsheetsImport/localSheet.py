@@ -0,0 +1,147 @@
+# Copyright (C) 2019 Advanced Media Workflow Association
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+
+import gspread
+
+# Size of the grid of a new Google Sheets worksheet
+DEFAULT_ROWS = 1000
+DEFAULT_COLS = 26
+
+
+class LocalWorksheet(object):
+    """An in-memory stand-in for a gspread Worksheet, supporting the calls made by the results importer"""
+
+    def __init__(self, spreadsheet, sheet_id, title, values=None, row_count=DEFAULT_ROWS, col_count=DEFAULT_COLS):
+        self.spreadsheet = spreadsheet
+        self.id = sheet_id
+        self.title = title
+        self.row_count = max(row_count, len(values or []))
+        self.col_count = max([col_count] + [len(row) for row in values or []])
+        self.values = [list(row) for row in values or []]
+
+    def get_all_values(self):
+        self.spreadsheet.calls += 1
+        return self.populated_values()
+
+    def populated_values(self):
+        """Get the values of all cells, trimmed to the populated rows and columns like gspread"""
+        rows = list(self.values)
+        while rows and not any(rows[-1]):
+            rows.pop()
+        width = 0
+        for row in rows:
+            populated = [col for col, value in enumerate(row) if value]
+            if populated:
+                width = max(width, populated[-1] + 1)
+        return [row[:width] + [""] * (width - len(row)) for row in rows]
+
+    def set_value(self, row, col, value):
+        """Set a cell value, with 0-indexed row and column"""
+        if row >= self.row_count or col >= self.col_count:
+            raise gspread.exceptions.GSpreadException("Range exceeds grid limits of worksheet {}".format(self.title))
+        while len(self.values) <= row:
+            self.values.append([])
+        cells = self.values[row]
+        cells.extend([""] * (col + 1 - len(cells)))
+        cells[col] = value
+
+    def update_cells(self, cell_list, value_input_option="RAW"):
+        self.spreadsheet.calls += 1
+        for cell in cell_list:
+            self.set_value(cell.row - 1, cell.col - 1, cell.value)
+
+    def append_rows(self, values, value_input_option="RAW", insert_data_option=None, table_range=None):
+        self.spreadsheet.calls += 1
+        start = len(self.populated_values())
+        if start + len(values) > self.row_count:
+            self.row_count = start + len(values)
+        for offset, row in enumerate(values):
+            self.col_count = max(self.col_count, len(row))
+            for col, value in enumerate(row):
+                self.set_value(start + offset, col, value)
+
+
+class LocalSpreadsheet(object):
+    """An in-memory stand-in for a gspread Spreadsheet, which may be loaded from and saved to a JSON file
+    of the form {"worksheet title": [[cell values of first row], ...], ...}.
+    Formulas are stored as entered, rather than evaluated. Each call which would be a Google Sheets API request
+    is counted in `calls`"""
+
+    def __init__(self, filename=None, titles=None):
+        self.filename = filename
+        self.calls = 0
+        self._worksheets = []
+        data = {}
+        if filename and os.path.exists(filename):
+            with open(filename) as json_file:
+                data = json.load(json_file)
+        for title in titles or []:
+            data.setdefault(title, [])
+        for title, values in data.items():
+            self._worksheets.append(LocalWorksheet(self, len(self._worksheets), title, values))
+
+    def worksheets(self):
+        self.calls += 1
+        return list(self._worksheets)
+
+    def worksheet(self, title):
+        self.calls += 1
+        try:
+            return next(worksheet for worksheet in self._worksheets if worksheet.title == title)
+        except StopIteration:
+            raise gspread.exceptions.WorksheetNotFound(title)
+
+    def batch_update(self, body):
+        """Apply the subset of batchUpdate requests used by the results importer"""
+        self.calls += 1
+        for request in body["requests"]:
+            if "insertDimension" in request:
+                spec = request["insertDimension"]["range"]
+                worksheet = self._worksheets[spec["sheetId"]]
+                count = spec["endIndex"] - spec["startIndex"]
+                if spec["dimension"] == "ROWS":
+                    worksheet.values.extend([] for _ in range(spec["startIndex"] - len(worksheet.values)))
+                    worksheet.values[spec["startIndex"]:spec["startIndex"]] = [[] for _ in range(count)]
+                    worksheet.row_count += count
+                else:
+                    for row in worksheet.values:
+                        row[spec["startIndex"]:spec["startIndex"]] = [""] * count
+                    worksheet.col_count += count
+            elif "appendDimension" in request:
+                spec = request["appendDimension"]
+                worksheet = self._worksheets[spec["sheetId"]]
+                if spec["dimension"] == "ROWS":
+                    worksheet.row_count += spec["length"]
+                else:
+                    worksheet.col_count += spec["length"]
+            elif "updateCells" in request:
+                spec = request["updateCells"]
+                worksheet = self._worksheets[spec["start"]["sheetId"]]
+                for row_offset, row in enumerate(spec["rows"]):
+                    for col_offset, cell in enumerate(row["values"]):
+                        value = cell["userEnteredValue"]
+                        worksheet.set_value(spec["start"]["rowIndex"] + row_offset,
+                                            spec["start"]["columnIndex"] + col_offset,
+                                            value.get("formulaValue", value.get("stringValue")))
+            else:
+                raise NotImplementedError("Unsupported batch_update request: {}".format(list(request)))
+
+    def save(self):
+        if self.filename:
+            with open(self.filename, "w") as json_file:
+                json.dump({worksheet.title: worksheet.populated_values() for worksheet in self._worksheets},
+                          json_file, indent=2)
@@ -21,8 +21,14 @@ import json
 import sys
 import copy
 
+from collections import OrderedDict
 from oauth2client.service_account import ServiceAccountCredentials
 
+try:
+    from .localSheet import LocalSpreadsheet
+except ImportError:
+    from localSheet import LocalSpreadsheet
+
 SCOPES = ['https://spreadsheets.google.com/feeds',
           'https://www.googleapis.com/auth/drive']
 
@@ -52,10 +58,12 @@ def ranges_equal(first, second):
     return True
 
 
+def cell_data(value):
+    return {"userEnteredValue": ({"formulaValue": value} if value.startswith("=") else {"stringValue": value})}
+
+
 def insert_row(worksheet, data, row):
-    data_values = [{
-            "userEnteredValue": ({"formulaValue": x} if x.startswith("=") else {"stringValue": x})
-        } for x in data]
+    data_values = [cell_data(x) for x in data]
     worksheet.spreadsheet.batch_update({
         'requests': [{
             'insertDimension': {
@@ -90,10 +98,10 @@ def append_row(worksheet, data):
                           table_range="A1")
 
 
-def gsheets_import(test_results, worksheet, filename, start_col=1, insert=False):
-    """Upload results data to spreadsheet"""
+def prepare_import(test_results, worksheet_data, filename, start_col=1):
+    """Compute the header cells and row of results for a results file, given the current worksheet values.
+    Returns the original header cells, the updated header cells and the row of results"""
 
-    worksheet_data = worksheet.get_all_values()
     populated_rows = len(worksheet_data)
     # Columns before start_col reserved for manually entered details
     start_col = max(1, start_col)
@@ -178,6 +186,16 @@ def gsheets_import(test_results, worksheet, filename, start_col=1, insert=False)
             cell_list_names.append(gspread.Cell(1, col, result["name"]))
             cell_list_results.append(cell_contents)
 
+    return original_cell_list_names, cell_list_names, cell_list_results
+
+
+def gsheets_import(test_results, worksheet, filename, start_col=1, insert=False):
+    """Upload results data to spreadsheet"""
+
+    worksheet_data = worksheet.get_all_values()
+    original_cell_list_names, cell_list_names, cell_list_results = prepare_import(test_results, worksheet_data,
+                                                                                  filename, start_col)
+
     if not ranges_equal(original_cell_list_names, cell_list_names):
         worksheet.update_cells(cell_list_names)
     if insert:
@@ -186,34 +204,153 @@ def gsheets_import(test_results, worksheet, filename, start_col=1, insert=False)
         append_row(worksheet, cell_list_results)
 
 
+def update_cells_request(worksheet, row, col, values):
+    return {
+        'updateCells': {
+            'start': {
+                'sheetId': worksheet.id,
+                'rowIndex': row,
+                'columnIndex': col
+            },
+            'rows': [{
+                "values": [cell_data(x) for x in row_values]
+            } for row_values in values],
+            'fields': 'userEnteredValue'
+        }
+    }
+
+
+def append_dimension_request(worksheet, dimension, length):
+    return {
+        'appendDimension': {
+            'sheetId': worksheet.id,
+            'dimension': dimension,
+            'length': length
+        }
+    }
+
+
+class BatchImporter(object):
+    """Accumulates results files for many suites and DUTs, and uploads all the results for each worksheet
+    with a single spreadsheet batch_update"""
+
+    def __init__(self, spreadsheet, start_col=1, insert=False):
+        self.spreadsheet = spreadsheet
+        self.start_col = start_col
+        self.insert = insert
+        self.pending = OrderedDict()
+
+    def add(self, test_results, filename):
+        """Queue a results file for upload to the worksheet named after its suite"""
+        self.pending.setdefault(test_results["suite"], []).append((test_results, filename))
+
+    def missing_worksheets(self):
+        """Get the names of any worksheets required by the queued results which don't exist"""
+        titles = set(worksheet.title for worksheet in self.spreadsheet.worksheets())
+        return [title for title in self.pending if title not in titles]
+
+    def get_requests(self, worksheet, results):
+        """Compute the header edits and new rows for a worksheet locally, returning the batch_update requests"""
+        worksheet_data = worksheet.get_all_values()
+
+        # Each results file may add test names to the header, which subsequent files must take into account
+        header_data = worksheet_data[:1]
+        rows = []
+        for test_results, filename in results:
+            _, cell_list_names, cell_list_results = prepare_import(test_results, header_data, filename,
+                                                                   self.start_col)
+            header_data = [[cell.value for cell in cell_list_names]]
+            rows.append(cell_list_results)
+
+        requests = []
+        original_header = worksheet_data[0] if worksheet_data else []
+        header = header_data[0]
+        if len(header) > worksheet.col_count:
+            requests.append(append_dimension_request(worksheet, 'COLUMNS', len(header) - worksheet.col_count))
+
+        # Only rewrite the runs of header cells which have changed
+        changed = [col for col, value in enumerate(header)
+                   if col >= len(original_header) or original_header[col] != value]
+        while changed:
+            run_length = 1
+            while run_length < len(changed) and changed[run_length] == changed[0] + run_length:
+                run_length += 1
+            requests.append(update_cells_request(worksheet, 0, changed[0],
+                                                 [header[changed[0]:changed[0] + run_length]]))
+            changed = changed[run_length:]
+
+        if self.insert:
+            # Results inserted one at a time would end up with the most recent at the top
+            rows.reverse()
+            requests.append({
+                'insertDimension': {
+                    'range': {
+                        'sheetId': worksheet.id,
+                        'dimension': 'ROWS',
+                        'startIndex': 1,
+                        'endIndex': 1 + len(rows)
+                    },
+                    'inheritFromBefore': False
+                }
+            })
+            requests.append(update_cells_request(worksheet, 1, 0, rows))
+        else:
+            start_row = max(1, len(worksheet_data))
+            if start_row + len(rows) > worksheet.row_count:
+                requests.append(append_dimension_request(worksheet, 'ROWS',
+                                                         start_row + len(rows) - worksheet.row_count))
+            requests.append(update_cells_request(worksheet, start_row, 0, rows))
+        return requests
+
+    def flush(self):
+        """Upload all the queued results, with one batch_update per worksheet"""
+        worksheets = {worksheet.title: worksheet for worksheet in self.spreadsheet.worksheets()}
+        for title, results in self.pending.items():
+            if title not in worksheets:
+                print(" * ERROR: Worksheet {} not found".format(title))
+                continue
+            self.spreadsheet.batch_update({'requests': self.get_requests(worksheets[title], results)})
+        self.pending = OrderedDict()
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--json", required=True, nargs="+", help="json test results filename(s) to import")
-    parser.add_argument("--sheet", required=True, help="spreadsheet url")
+    parser.add_argument("--sheet", help="spreadsheet url")
+    parser.add_argument("--local", help="json file to use as a local stand-in for the spreadsheet")
     parser.add_argument("--credentials", default="credentials.json", help="credentials filename")
     parser.add_argument("--start_col", default="1", type=int, help="reserve some columns for manually entered details")
     parser.add_argument("--insert", action="store_true", help="insert new results at the top rather than the bottom")
     args = parser.parse_args()
 
-    credentials = ServiceAccountCredentials.from_json_keyfile_name(args.credentials, SCOPES)
-    gcloud = gspread.authorize(credentials)
+    if args.local:
+        spreadsheet = LocalSpreadsheet(args.local)
+    elif args.sheet:
+        credentials = ServiceAccountCredentials.from_json_keyfile_name(args.credentials, SCOPES)
+        gcloud = gspread.authorize(credentials)
 
-    spreadsheet = gcloud.open_by_url(args.sheet)
+        spreadsheet = gcloud.open_by_url(args.sheet)
+    else:
+        parser.error("one of --sheet or --local is required")
 
-    worksheets = spreadsheet.worksheets()
+    importer = BatchImporter(spreadsheet, args.start_col, args.insert)
 
     for json_file_name in args.json:
         with open(json_file_name) as json_file:
             test_results = json.load(json_file)
 
-        try:
-            worksheet = next(x for x in worksheets if x.title == test_results["suite"])
-        except StopIteration:
-            print(" * ERROR: Worksheet {} not found".format(test_results["suite"]))
+        importer.add(test_results, json_file_name)
+
+    missing = importer.missing_worksheets()
+    if missing:
+        for title in missing:
+            print(" * ERROR: Worksheet {} not found".format(title))
             # could add_worksheet?
-            sys.exit(1)
+        sys.exit(1)
 
-        gsheets_import(test_results, worksheet, json_file_name, args.start_col, args.insert)
+    importer.flush()
+    if args.local:
+        spreadsheet.save()
 
 
 if __name__ == '__main__':
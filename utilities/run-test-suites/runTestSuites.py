@@ -23,7 +23,7 @@ from pathlib import Path
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 
-from gsheetsImport.resultsImporter import gsheets_import
+from gsheetsImport.resultsImporter import BatchImporter
 
 
 SCOPES = ['https://spreadsheets.google.com/feeds',
@@ -245,29 +245,32 @@ def save_test_results_to_file(results, name, folder):
         json.dump(results, outfile)
 
 
-def upload_test_results(results, name, sheet, credentials):
-    """Upload the test results to the the google sheet"""
+def open_results_sheet(sheet, credentials):
+    """Open the google sheet, returning an importer to which test results can be added"""
 
     if not sheet:
-        return
-    if not results:
-        print('ERROR: No results specified')
-        return
+        return None
 
     credentials = ServiceAccountCredentials.from_json_keyfile_name(credentials, SCOPES)
     gcloud = gspread.authorize(credentials)
 
     spreadsheet = gcloud.open_by_url(sheet)
 
-    try:
-        worksheet = spreadsheet.worksheet(results["suite"])
-    except gspread.exceptions.WorksheetNotFound:
-        print(" * ERROR: Worksheet {} not found".format(results["suite"]))
+    return BatchImporter(spreadsheet)
+
+
+def upload_test_results(results, name, importer):
+    """Queue the test results for upload to the google sheet"""
+
+    if not importer:
+        return
+    if not results:
+        print('ERROR: No results specified')
         return
 
     filename = "{}_{}_{}.json".format(name, results.get('suite'), results.get('timestamp'))
 
-    gsheets_import(results, worksheet, filename)
+    importer.add(results, filename)
 
 
 def run_all_tests(testSuiteUrl,
@@ -286,36 +289,42 @@ def run_all_tests(testSuiteUrl,
     is05Data = get_highest_version(is05Data)
     is08Data = get_highest_version(is08Data)
 
+    # Results for all the suites are uploaded together at the end, to avoid exceeding the Google Sheets API quotas
+    importer = open_results_sheet(resultsSheet, credentials)
+
     if is04NodeData:
         results = is_04_01_test(testSuiteUrl, is04NodeData['ip'], is04NodeData['port'], is04NodeData['version'],
                                 is04NodeData['test-start-delay'])
         save_test_results_to_file(results, deviceName, resultsFolder)
-        upload_test_results(results, deviceName, resultsSheet, credentials)
+        upload_test_results(results, deviceName, importer)
     if is05Data:
         results = is_05_01_test(testSuiteUrl, is05Data['ip'], is05Data['port'], is05Data['version'])
         save_test_results_to_file(results, deviceName, resultsFolder)
-        upload_test_results(results, deviceName, resultsSheet, credentials)
+        upload_test_results(results, deviceName, importer)
     if is04NodeData and is05Data:
         results = is_05_02_test(testSuiteUrl, is04NodeData['ip'], is04NodeData['port'], is04NodeData['version'],
                                 is05Data['ip'], is05Data['port'], is05Data['version'])
         save_test_results_to_file(results, deviceName, resultsFolder)
-        upload_test_results(results, deviceName, resultsSheet, credentials)
+        upload_test_results(results, deviceName, importer)
     if is08Data:
         results = is_08_01_test(testSuiteUrl, is08Data['ip'], is08Data['port'], is08Data['version'],
                                 is08Data.get('selector'))
         save_test_results_to_file(results, deviceName, resultsFolder)
-        upload_test_results(results, deviceName, resultsSheet, credentials)
+        upload_test_results(results, deviceName, importer)
     if is04NodeData and is08Data:
         results = is_08_02_test(testSuiteUrl, is04NodeData['ip'], is04NodeData['port'], is04NodeData['version'],
                                 is08Data['ip'], is08Data['port'], is08Data['version'], is08Data.get('selector'))
         save_test_results_to_file(results, deviceName, resultsFolder)
-        upload_test_results(results, deviceName, resultsSheet, credentials)
+        upload_test_results(results, deviceName, importer)
     if is04RegistryData:
         results = is_04_02_test(testSuiteUrl, is04RegistryData['ip'], is04RegistryData['reg-port'],
                                 is04RegistryData['reg-version'], is04RegistryData['ip'],
                                 is04RegistryData['query-port'], is04RegistryData['query-version'],)
         save_test_results_to_file(results, deviceName, resultsFolder)
-        upload_test_results(results, deviceName, resultsSheet, credentials)
+        upload_test_results(results, deviceName, importer)
+
+    if importer:
+        importer.flush()
 
 
 def print_nmos_api_data(api_name, data):
@@ -16,69 +16,185 @@
 
 import argparse
 import requests
-import os
-import json
-
-parser = argparse.ArgumentParser()
-parser.add_argument("--ip", required=True)
-parser.add_argument("--port", type=int, required=True)
-parser.add_argument("--version", default="v1.2")
-args = parser.parse_args()
-
-if os.path.exists("uuids.json"):
-    print(" * Found existing UUIDs file. Comparing with Node")
-    first_run = False
-else:
-    print(" * No existing UUIDs file found. Fetching fresh from Node")
-    first_run = True
-
-fetched_uuids = {"self": None, "devices": [], "sources": [], "flows": [],
-                 "senders": [], "receivers": []}
-
-num_uuids = 0
-
-for path in fetched_uuids.keys():
-    try:
-        url = "http://{}:{}/x-nmos/node/{}/{}".format(args.ip, args.port, args.version, path)
-        response = requests.get(url, timeout=1)
-        if path == "self":
-            print("Host: {}".format(response.json()["description"]))
-            fetched_uuids[path] = response.json()["id"]
-            num_uuids = num_uuids + 1
-        else:
-            for resource in response.json():
-                fetched_uuids[path].append(resource["id"])
-                num_uuids = num_uuids + 1
-    except Exception:
-        print(" * ERROR: Unable to fetch data from {}".format(url))
-
-if first_run:
-    fetched_uuids['count'] = num_uuids
-    print("{} UUIDs found in Node".format(fetched_uuids['count']))
-    with open("uuids.json", "w") as json_file:
-        json.dump(fetched_uuids, json_file)
-else:
-    test_result = True
-    with open("uuids.json", "r") as json_file:
-        previous_uuids = json.load(json_file)
-
-    for path in fetched_uuids.keys():
-        if path == "self":
-            if fetched_uuids[path] != previous_uuids[path]:
-                print("* Current Node ID '{}' does not match previous Node ID '{}'"
-                      .format(fetched_uuids[path], previous_uuids[path]))
-                test_result = False
-        else:
-            if sorted(fetched_uuids[path]) != sorted(previous_uuids[path]):
-                print("* Current {} '{}' do not match previous {} '{}'"
-                      .format(path.capitalize(), sorted(fetched_uuids[path]),
-                              path.capitalize(), sorted(previous_uuids[path])))
-                test_result = False
-
-    print("{} UUIDs previously found in Node".format(previous_uuids['count']))
-    print("{} UUIDs found in Node".format(num_uuids))
-
-    if test_result is True:
+import sqlite3
+import sys
+import time
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+
+PATHS = ["self", "devices", "sources", "flows", "senders", "receivers"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    node TEXT NOT NULL,
+    description TEXT,
+    complete INTEGER NOT NULL,
+    PRIMARY KEY (node, run_id)
+);
+CREATE TABLE IF NOT EXISTS uuids (
+    run_id INTEGER NOT NULL,
+    node TEXT NOT NULL,
+    path TEXT NOT NULL,
+    uuid TEXT NOT NULL,
+    PRIMARY KEY (node, run_id, path, uuid)
+);
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check that NMOS IS-04 UUIDs persist over a reboot")
+    parser.add_argument("--ip", help="IP address or hostname of a single Node API")
+    parser.add_argument("--port", type=int, help="Port of a single Node API")
+    parser.add_argument("--node", action="append", default=[], metavar="HOST:PORT",
+                        help="Node API to check, which may be repeated")
+    parser.add_argument("--nodes", metavar="FILE",
+                        help="File listing Node APIs to check, one HOST:PORT per line")
+    parser.add_argument("--version", default="v1.2")
+    parser.add_argument("--database", default="uuids.db",
+                        help="SQLite database in which to store the snapshot from each run")
+    parser.add_argument("--baseline", type=int, metavar="RUN_ID",
+                        help="Run to compare with, rather than each Node's most recent complete snapshot")
+    parser.add_argument("--workers", type=int, default=32, help="Number of concurrent requests")
+    parser.add_argument("--timeout", type=float, default=1, help="Timeout for each request in seconds")
+    args = parser.parse_args()
+
+    nodes = list(args.node)
+    if args.ip is not None or args.port is not None:
+        if args.ip is None or args.port is None:
+            parser.error("--ip and --port must be used together")
+        nodes.append("{}:{}".format(args.ip, args.port))
+    if args.nodes:
+        with open(args.nodes, "r") as nodes_file:
+            for line in nodes_file:
+                line = line.split("#")[0].strip()
+                if line:
+                    nodes.append(line)
+    if not nodes:
+        parser.error("at least one Node must be specified using --ip and --port, --node or --nodes")
+    # Remove duplicates, preserving the order
+    args.nodes = list(dict.fromkeys(nodes))
+    return args
+
+
+def open_database(path):
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    return db
+
+
+def fetch(session, node, version, path, timeout):
+    """Fetch the UUIDs of one resource type from a Node API, returning (description, uuids)"""
+    url = "http://{}/x-nmos/node/{}/{}".format(node, version, path)
+    response = session.get(url, timeout=timeout)
+    response.raise_for_status()
+    if path == "self":
+        return response.json()["description"], [response.json()["id"]]
+    else:
+        return None, [resource["id"] for resource in response.json()]
+
+
+def get_baseline(db, node, run_id, baseline):
+    """Get the run to compare with for a Node, or None if there is no earlier snapshot"""
+    if baseline is not None:
+        row = db.execute("SELECT run_id FROM snapshots WHERE node = ? AND run_id = ?", (node, baseline)).fetchone()
+    else:
+        row = db.execute("SELECT MAX(run_id) FROM snapshots WHERE node = ? AND run_id < ? AND complete = 1",
+                         (node, run_id)).fetchone()
+    return row[0] if row is not None else None
+
+
+def get_differences(db, node, run_id, baseline):
+    """Yield (path, uuid, sign) for each UUID which was added ('+') or removed ('-') since the baseline run"""
+    query = """
+        SELECT path, uuid FROM uuids WHERE node = :node AND run_id = :a
+        EXCEPT
+        SELECT path, uuid FROM uuids WHERE node = :node AND run_id = :b
+        ORDER BY path, uuid
+    """
+    for path, uuid in db.execute(query, {"node": node, "a": baseline, "b": run_id}):
+        yield path, uuid, "-"
+    for path, uuid in db.execute(query, {"node": node, "a": run_id, "b": baseline}):
+        yield path, uuid, "+"
+
+
+def check_node(db, node, run_id, baseline, complete):
+    """Print the differences for a Node as soon as its snapshot is stored, returning whether it passed"""
+    previous = get_baseline(db, node, run_id, baseline)
+    count = db.execute("SELECT COUNT(*) FROM uuids WHERE node = ? AND run_id = ?", (node, run_id)).fetchone()[0]
+    if not complete:
+        print("{}: FAILED to fetch all resources ({} UUIDs found)".format(node, count))
+        return False
+    if previous is None:
+        if baseline is not None:
+            print("{}: FAILED as there is no snapshot in run {}".format(node, baseline))
+            return False
+        print("{}: {} UUIDs recorded".format(node, count))
+        return True
+
+    result = True
+    for path, uuid, sign in get_differences(db, node, run_id, previous):
+        print("{}: {} {} {}".format(node, sign, path, uuid))
+        result = False
+    previous_count = db.execute("SELECT COUNT(*) FROM uuids WHERE node = ? AND run_id = ?",
+                                (node, previous)).fetchone()[0]
+    print("{}: {} ({} UUIDs found, {} in run {})".format(node, "PASSED" if result else "FAILED", count,
+                                                         previous_count, previous))
+    return result
+
+
+def main():
+    args = parse_args()
+    db = open_database(args.database)
+    run_id = db.execute("INSERT INTO runs (started) VALUES (?)", (time.time(),)).lastrowid
+    db.commit()
+    print(" * Run {}: fetching UUIDs from {} Node(s)".format(run_id, len(args.nodes)))
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=len(args.nodes), pool_maxsize=args.workers)
+    session.mount("http://", adapter)
+
+    pending = {node: len(PATHS) for node in args.nodes}
+    complete = {node: True for node in args.nodes}
+    descriptions = {}
+    passed = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(fetch, session, node, args.version, path, args.timeout): (node, path)
+                   for node in args.nodes for path in PATHS}
+        for future in as_completed(futures):
+            node, path = futures[future]
+            try:
+                description, uuids = future.result()
+                if description is not None:
+                    descriptions[node] = description
+                db.executemany("INSERT OR IGNORE INTO uuids (run_id, node, path, uuid) VALUES (?, ?, ?, ?)",
+                               [(run_id, node, path, uuid) for uuid in uuids])
+            except Exception as e:
+                print("{}: ERROR: Unable to fetch {}: {}".format(node, path, e))
+                complete[node] = False
+
+            pending[node] -= 1
+            if pending[node] == 0:
+                db.execute("INSERT INTO snapshots (run_id, node, description, complete) VALUES (?, ?, ?, ?)",
+                           (run_id, node, descriptions.get(node), complete[node]))
+                db.commit()
+                if check_node(db, node, run_id, args.baseline, complete[node]):
+                    passed += 1
+                sys.stdout.flush()
+
+    db.close()
+    print(" * {} of {} Node(s) passed".format(passed, len(args.nodes)))
+    if passed == len(args.nodes):
         print(" * TEST PASSED")
     else:
         print(" * TEST FAILED")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()